@@ -1,6 +1,5 @@
 
 import logging
-import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from .config import Config
@@ -21,14 +20,20 @@ def create_app(config_class=Config):
     # Initialize extensions
     db.init_app(app)
     
-    # IMPORTANTE: Ejecutar migraciones ANTES de registrar blueprints
-    # Esto evita errores de schema cuando las rutas hacen queries
-    with app.app_context():
-        try:
-            from .migrations import run_migrations
-            run_migrations(app, db)
-        except Exception as e:
-            logging.warning(f"[MIGRATIONS] Error durante inicialización de migraciones: {e}")
+    from .utils.sqlite_pool import init_sqlite_pool
+    init_sqlite_pool(app)
+
+    # Invalidación de los contadores del dashboard en cada commit del ORM
+    from .utils.dashboard_stats import registrar_eventos
+    registrar_eventos()
+
+    # Métricas HTTP y de SQL (/metrics); antes de los before_request de los blueprints
+    from .utils.metricas import registrar as registrar_metricas
+    registrar_metricas(app)
+
+    # Consultas y tiempo de SQL por request: Server-Timing y aviso de N+1 en el log
+    from .utils.sql_perfil import registrar_perfil
+    registrar_perfil(app)
     
     # Register Blueprints
     from .routes.auth import auth_bp
@@ -54,6 +59,11 @@ def create_app(config_class=Config):
     from .routes.admin_fix import admin_fix_bp
     from .routes.totp_setup import totp_bp
     from .routes.backup_api import backup_api
+    from .routes.jobs_api import jobs_api
+    from .routes.tiles_api import tiles_api
+    from .routes.predios_api import predios_api
+    from .routes.stream_api import stream_api
+    from .routes.salud import salud_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
@@ -78,6 +88,11 @@ def create_app(config_class=Config):
     app.register_blueprint(admin_fix_bp)
     app.register_blueprint(totp_bp)
     app.register_blueprint(backup_api)
+    app.register_blueprint(jobs_api)
+    app.register_blueprint(tiles_api)
+    app.register_blueprint(predios_api)
+    app.register_blueprint(stream_api)
+    app.register_blueprint(salud_bp)
 
     
     # Context Processors (for templates)
@@ -85,20 +100,17 @@ def create_app(config_class=Config):
     def inject_utilities():
         from .utils import can_access
         from .utils.preferencias import get_user_preferences
+        from .utils.usuario_actual import obtener as obtener_usuario_actual
         from flask import session
-        try:
-            from .models.usuario import Usuario
-        except Exception:
-            Usuario = None
 
         prefs = get_user_preferences(session)
 
-        # Foto de perfil del usuario actual (si disponible)
+        # Foto de perfil del usuario actual (mismo registro ya cargado en este request)
         current_user_foto = None
-        if Usuario and 'user' in session:
+        if 'user' in session:
             try:
-                u = Usuario.query.filter_by(usuario=session['user']).first()
-                if u and getattr(u, 'foto_perfil', None):
+                u = obtener_usuario_actual(session)
+                if u and u.foto_perfil:
                     current_user_foto = u.foto_perfil
             except Exception:
                 current_user_foto = None
@@ -117,8 +129,26 @@ def create_app(config_class=Config):
         from .models.participacion import Radicado, RespuestaRadicado  # noqa: F401
         from .models.usuario import Usuario, AuditoriaAcceso  # noqa: F401
         from .models.riesgo_arborea import RadicadoArborea, ArbolEspecie  # noqa: F401
-        db.create_all()
-        
+        from .models.solicitud import Solicitud  # noqa: F401
+        from .models.mensaje import MensajeChat, ResumenChat  # noqa: F401
+
+        # Migraciones, tablas y seeds solo si cambió la versión del esquema;
+        # importación única de los CSV históricos
+        from .migrations import preparar_base, registrar_comandos
+        try:
+            preparar_base(app, db)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"[INIT] Error preparando la base de datos: {e}")
+        registrar_comandos(app, db)
+
+        # Tablas de SQL crudo (tala, licencias) en el archivo SQLite
+        try:
+            from .routes.solicitudes import init_schemas
+            init_schemas()
+        except Exception as e:
+            logging.error(f"[INIT] Error creando tablas de tala/licencias: {e}")
+
         # Inicializar sistema de backup
         try:
             from .utils.backup_manager import BackupManager
@@ -126,14 +156,6 @@ def create_app(config_class=Config):
             logging.info("[INIT] Sistema de backup inicializado")
         except Exception as e:
             logging.error(f"[INIT] Error inicializando backup: {e}")
-        
-        # Seed especies de árboles
-        try:
-            from .seeds.seed_especies import seed_especies
-            seed_especies(db)
-            logging.info("[INIT] Especies de árboles cargadas")
-        except Exception as e:
-            logging.error(f"[INIT] Error al cargar especies: {e}")
     
     # Serve uploaded files (perfil photos, etc.)
     @app.route('/uploads/<path:filename>')
@@ -142,49 +164,9 @@ def create_app(config_class=Config):
         upload_dir = str(app.config.get('UPLOADS_DIR'))
         return send_from_directory(upload_dir, filename)
 
-    # Inicializar datos en base de datos
-    with app.app_context():
-        try:
-            from .models.usuario import Usuario
-            admin = Usuario.query.filter_by(usuario='admin').first()
-            if not admin:
-                logging.warning("[RAILWAY LOG] Creando usuario admin por defecto...")
-                admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
-                
-                admin = Usuario(
-                    usuario='admin',
-                    nombre='Administrador',
-                    apellidos='Sistema',
-                    role='admin',
-                    email=None  # SIN EMAIL POR DEFECTO
-                )
-                admin.set_password(admin_password)
-                db.session.add(admin)
-                
-                # Crear usuarios demo SIN EMAILS
-                demo_users = [
-                    ('planeacion', os.environ.get('PLANEACION_PASSWORD', 'planeacion123'), 'Planeación', 'Municipal', 'planeacion'),
-                    ('gobierno', os.environ.get('GOBIERNO_PASSWORD', 'gobierno123'), 'Gobierno', 'Municipal', 'gobierno')
-                ]
-                for u, p, n, a, r in demo_users:
-                    if not Usuario.query.filter_by(usuario=u).first():
-                        nuevo = Usuario(usuario=u, nombre=n, apellidos=a, role=r, email=None)  # SIN EMAIL
-                        nuevo.set_password(p)
-                        db.session.add(nuevo)
-                
-                try:
-                    db.session.commit()
-                    logging.info("[RAILWAY LOG] Usuarios creados correctamente")
-                except Exception as commit_error:
-                    logging.warning(f"[RAILWAY] Algunos usuarios ya existían: {commit_error}")
-                    db.session.rollback()
-                
-            # Sembrar metas
-            from .utils.seeds import seed_metas
-            seed_metas()
-            
-        except Exception as e:
-            logging.error(f"[RAILWAY ERROR] Error inicializando DB: {e}")
+    # Precarga de datasets en segundo plano (estado en /readyz)
+    from .utils.warmup import iniciar as iniciar_warmup
+    iniciar_warmup(app)
 
     return app
 
@@ -13,6 +13,7 @@ class Config:
     TEMPLATES_DIR = BASE_DIR / "templates"
     UPLOADS_DIR = BASE_DIR / "uploads"
     DOCUMENTOS_DIR = BASE_DIR / "documentos_generados"
+    CACHE_DIR = DOCUMENTOS_DIR / "cache"
     
     # Database Configuration
     # En Railway: usa PostgreSQL si DATABASE_URL está definida
@@ -33,11 +34,42 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Pool SQLite (WAL + pragmas, ver app/utils/sqlite_pool.py)
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 5))
+    SQLITE_POOL_MAX_OVERFLOW = int(os.environ.get('SQLITE_POOL_MAX_OVERFLOW', 10))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 16000
+
+    # Arranque: con el esquema al día (ver app/migrations.py) no se migra ni se
+    # siembra nada. AUTO_MIGRATE=0 deja las migraciones solo al comando `flask migrar`.
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1').lower() not in ('0', 'false', 'no')
+
+    # Datasets derivados de Excel (ver app/utils/shared_cache.py): LRU por
+    # worker y caché compartida en CACHE_DIR/datasets.sqlite, ambas acotadas
+    DATASET_CACHE_MEMORIA_MB = int(os.environ.get('DATASET_CACHE_MEMORIA_MB', 256))
+    DATASET_CACHE_DISCO_MB = int(os.environ.get('DATASET_CACHE_DISCO_MB', 512))
+
+    # Precarga de cachés al arrancar cada worker (ver app/utils/warmup.py y /readyz)
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+    # /metrics (Prometheus): admins con sesión o el scraper con "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+    # Perfil de SQL por request (ver app/utils/sql_perfil.py): header
+    # Server-Timing y aviso en el log cuando una sentencia se repite
+    # SQL_N1_UMBRAL veces en un mismo request (patrón N+1)
+    SQL_PERFIL = os.environ.get('SQL_PERFIL', '1').lower() not in ('0', 'false', 'no')
+    SQL_N1_UMBRAL = int(os.environ.get('SQL_N1_UMBRAL', 5))
+    SQL_ALERTA_CONSULTAS = int(os.environ.get('SQL_ALERTA_CONSULTAS', 50))
+    SQL_SERVER_TIMING = os.environ.get('SQL_SERVER_TIMING', '1').lower() not in ('0', 'false', 'no')
+    
     # External/Shared Paths - Migrated to local per user request
     # SHARED_DRIVE_PATH = Path(os.environ.get('SHARED_DRIVE_PATH', r"G:\Unidades compartidas\Planeacion"))
     
     # Using centralized documentos_generados folder
     SOLICITUDES_PATH = DATA_DIR / "solicitudes.csv"
+    MENSAJES_PATH = DATA_DIR / "mensajes.csv"  # histórico del chat (se importa a chat_mensajes)
     SOLICITUDES_OUTPUT_DIR = DOCUMENTOS_DIR / "solicitudes"
     CERTIFICADOS_OUTPUT_DIR = DOCUMENTOS_DIR / "certificados"
     LICENCIAS_OUTPUT_DIR = DOCUMENTOS_DIR / "licencias"
@@ -45,6 +77,17 @@ class Config:
     REPORTES_OUTPUT_DIR = DOCUMENTOS_DIR / "reportes"
     TALA_OUTPUT_DIR = DOCUMENTOS_DIR / "tala"
     
+    # Pool de renderizado de PDFs pesados (ver app/utils/render_service.py)
+    RENDER_POOL_WORKERS = int(os.environ.get('RENDER_POOL_WORKERS', 2))
+    RENDER_SYNC_TIMEOUT = float(os.environ.get('RENDER_SYNC_TIMEOUT', 3))  # segundos (camino rápido)
+    RENDER_JOB_TTL = 3600  # segundos que se conservan los resultados
+    RENDER_LOTE_INACTIVIDAD = 900  # segundos sin avance tras los que un lote se da por perdido
+
+    # Stream de eventos en vivo (ver app/utils/event_stream.py). Cada stream
+    # ocupa un hilo del worker (gunicorn gthread), por eso hay tope por worker.
+    SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', 24))
+    SSE_MAX_SECONDS = 300  # luego el navegador se reconecta con Last-Event-ID
+    
     # Backup Configuration
     BACKUPS_DIR = BASE_DIR / "backups"  # Directorio para almacenar backups
     BACKUP_MAX_VERSIONS = 10  # Mantener últimos 10 backups
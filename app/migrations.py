@@ -1,10 +1,41 @@
 """
 Migraciones automáticas de base de datos
-Se ejecuta antes de registrar las blueprints para evitar errores de schema
+preparar_base() compara la huella del esquema (modelos + migraciones + seeds)
+con la registrada en la tabla app_schema_version. Si coinciden, el arranque
+hace una sola lectura por clave primaria y no reflexiona, no crea tablas ni
+siembra datos. Si no, aplica todo y registra la huella nueva. El comando
+`flask --app run migrar` fuerza el proceso completo.
+Los CSV históricos se importan una sola vez: cada importación se reclama con
+una fila `importacion:<nombre>` en app_schema_version, insertada en la misma
+transacción que los datos. Los workers de una misma máquina además pasan por
+preparar_base de a uno (flock en CACHE_DIR).
 """
+import os
+import hashlib
 import logging
+from contextlib import contextmanager
+from datetime import datetime
 from sqlalchemy import text, inspect
 
+try:
+    import fcntl
+except ImportError:  # Windows: sin exclusión entre procesos
+    fcntl = None
+
+VERSION_TABLA = 'app_schema_version'
+
+# Subir al cambiar datos de los seeds o el bootstrap de usuarios (los cambios
+# de modelos y de REQUIRED_COLUMNS se detectan solos en la huella)
+SEED_VERSION = 1
+
+# Columnas agregadas después de la creación de la tabla usuarios: (PostgreSQL, SQLite)
+REQUIRED_COLUMNS = {
+    'primer_acceso': ('BOOLEAN DEFAULT TRUE', 'BOOLEAN DEFAULT 1'),
+    'codigo_primer_acceso': ('VARCHAR(6)', 'VARCHAR(6)'),
+    'codigo_primer_acceso_expira': ('TIMESTAMP', 'TIMESTAMP'),
+    'primer_acceso_verificado': ('TIMESTAMP', 'TIMESTAMP'),
+}
+
 def run_migrations(app, db):
     """
     Ejecutar migraciones automáticas al iniciar la aplicación
@@ -17,17 +48,12 @@ def run_migrations(app, db):
             # Verificar si la tabla usuarios existe
             if 'usuarios' not in inspector.get_table_names():
                 logging.info("[MIGRATION] Tabla 'usuarios' no existe, se creará con db.create_all()")
-                return
+                return True
             
             existing_columns = {col['name']: col for col in inspector.get_columns('usuarios')}
             
             # Columnas necesarias y sus definiciones
-            required_columns = {
-                'primer_acceso': ('BOOLEAN DEFAULT TRUE', 'BOOLEAN DEFAULT 1'),
-                'codigo_primer_acceso': ('VARCHAR(6)', 'VARCHAR(6)'),
-                'codigo_primer_acceso_expira': ('TIMESTAMP', 'TIMESTAMP'),
-                'primer_acceso_verificado': ('TIMESTAMP', 'TIMESTAMP'),
-            }
+            required_columns = REQUIRED_COLUMNS
             
             # Columnas a agregar
             columns_to_add = [col for col in required_columns if col not in existing_columns]
@@ -64,6 +90,7 @@ def run_migrations(app, db):
                 logging.info("[MIGRATION] ✅ Todas las migraciones completadas")
             else:
                 logging.info("[MIGRATION] Base de datos está actualizada")
+            return True
                 
         except Exception as e:
             logging.error(f"[MIGRATION] Error durante migraciones: {e}")
@@ -73,3 +100,177 @@ def run_migrations(app, db):
                 pass
             # No fallar si las migraciones fallan - permitir que continúe la app
             # pero registrar el error para debugging
+            return False
+
+
+def huella_esquema(db):
+    """Hash de las tablas, columnas e índices de los modelos + migraciones + seeds"""
+    partes = [f"seed:{SEED_VERSION}", repr(sorted(REQUIRED_COLUMNS.items()))]
+    for tabla in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        columnas = []
+        for col in tabla.columns:
+            try:
+                tipo = str(col.type)
+            except Exception:
+                tipo = type(col.type).__name__
+            columnas.append(f"{col.name}:{tipo}:{col.nullable}:{col.primary_key}")
+        indices = sorted(i.name or '' for i in tabla.indexes)
+        partes.append(f"{tabla.name}({','.join(columnas)})[{','.join(indices)}]")
+    return hashlib.sha1('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+def version_aplicada(db):
+    """Huella registrada en la base (None si nunca se registró)"""
+    try:
+        version = db.session.execute(
+            text(f"SELECT version FROM {VERSION_TABLA} WHERE clave = :clave"), {'clave': 'esquema'}
+        ).scalar()
+        db.session.rollback()
+        return version
+    except Exception:
+        db.session.rollback()
+        return None
+
+
+def _crear_tabla_version(db):
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLA} ("
+        "clave VARCHAR(50) PRIMARY KEY, version VARCHAR(64) NOT NULL, aplicado_en VARCHAR(32))"
+    ))
+
+
+def registrar_version(db, huella):
+    _crear_tabla_version(db)
+    db.session.execute(text(f"DELETE FROM {VERSION_TABLA} WHERE clave = :clave"), {'clave': 'esquema'})
+    db.session.execute(
+        text(f"INSERT INTO {VERSION_TABLA} (clave, version, aplicado_en) VALUES (:clave, :version, :fecha)"),
+        {'clave': 'esquema', 'version': huella, 'fecha': datetime.now().isoformat(timespec='seconds')}
+    )
+    db.session.commit()
+
+
+def _importaciones():
+    """(clave en app_schema_version, config con la ruta del CSV, función que lo agrega a la sesión)"""
+    from app.models.solicitud import importar_solicitudes_csv
+    from app.models.mensaje import importar_mensajes_csv
+    return [
+        ('importacion:solicitudes', 'SOLICITUDES_PATH', importar_solicitudes_csv),
+        ('importacion:mensajes', 'MENSAJES_PATH', importar_mensajes_csv),
+    ]
+
+
+def importar_historicos(app, db):
+    """
+    Importa los CSV históricos que todavía no estén registrados. Con varios
+    workers arrancando a la vez solo uno gana la clave primaria de la fila
+    `importacion:<nombre>`: los demás reciben el error de unicidad (o de
+    bloqueo en SQLite) y siguen sin importar. Si la importación falla, el
+    rollback descarta también la fila y el próximo arranque lo reintenta.
+    Los CSV no se modifican.
+    """
+    try:
+        hechas = set(db.session.execute(
+            text(f"SELECT clave FROM {VERSION_TABLA} WHERE clave LIKE 'importacion:%'")
+        ).scalars())
+        db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        hechas = set()
+
+    for clave, config_ruta, importar in _importaciones():
+        ruta = str(app.config.get(config_ruta) or '')
+        if clave in hechas or not ruta or not os.path.exists(ruta):
+            continue
+        try:
+            _crear_tabla_version(db)
+            db.session.commit()
+            db.session.execute(
+                text(f"INSERT INTO {VERSION_TABLA} (clave, version, aplicado_en) VALUES (:clave, :version, :fecha)"),
+                {'clave': clave, 'version': 'en curso', 'fecha': datetime.now().isoformat(timespec='seconds')}
+            )
+        except Exception as e:
+            db.session.rollback()
+            logging.info(f"[MIGRATION] {clave} la tomó otro proceso ({e.__class__.__name__})")
+            continue
+        try:
+            filas = importar(ruta)
+            db.session.execute(
+                text(f"UPDATE {VERSION_TABLA} SET version = :version WHERE clave = :clave"),
+                {'clave': clave, 'version': f"{filas} filas"}
+            )
+            db.session.commit()
+            logging.info(f"[MIGRATION] ✅ {clave}: {filas} filas importadas desde {ruta}")
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"[MIGRATION] Error en {clave}: {e}")
+
+
+def preparar_base(app, db, forzar=False):
+    """
+    Deja la base lista para la versión actual del código e importa los CSV
+    históricos pendientes. Llamar dentro del app context, con los modelos y
+    blueprints ya importados.
+    Devuelve True si se aplicaron migraciones/seeds.
+    """
+    with _exclusivo(app):
+        aplicado = _preparar_esquema(app, db, forzar)
+        importar_historicos(app, db)
+    return aplicado
+
+
+@contextmanager
+def _exclusivo(app):
+    """Un solo worker a la vez: el siguiente ya encuentra la huella registrada"""
+    if fcntl is None:
+        yield
+        return
+    from app.utils.static_payload import cache_dir
+    with open(os.path.join(cache_dir(app), 'preparar_base.lock'), 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _preparar_esquema(app, db, forzar):
+    huella = huella_esquema(db)
+    if not forzar:
+        if version_aplicada(db) == huella:
+            logging.info("[MIGRATION] Esquema y seeds al día; se omite la inicialización")
+            return False
+        if not app.config.get('AUTO_MIGRATE', True):
+            logging.warning("[MIGRATION] El esquema cambió y AUTO_MIGRATE está desactivado: "
+                            "ejecute `flask --app run migrar`")
+            return False
+
+    logging.info("[MIGRATION] Aplicando migraciones, tablas y seeds...")
+    ok = run_migrations(app, db)
+    db.create_all()
+
+    from app.utils.seeds import seed_usuarios, seed_metas
+    from app.seeds.seed_especies import seed_especies
+    seed_especies(db)
+    logging.info("[INIT] Especies de árboles cargadas")
+    ok = seed_usuarios() and ok
+    seed_metas()
+
+    if ok:
+        registrar_version(db, huella)
+        logging.info(f"[MIGRATION] ✅ Versión de esquema registrada ({huella[:12]})")
+    else:
+        # Sin registrar: el próximo arranque lo vuelve a intentar
+        logging.warning("[MIGRATION] Hubo errores; la versión del esquema no se registra")
+    return True
+
+
+def registrar_comandos(app, db):
+    """Comandos de consola: flask --app run migrar"""
+    @app.cli.command('migrar')
+    def migrar():
+        """Aplica migraciones, crea tablas y siembra datos (ignora la versión registrada)"""
+        with app.app_context():
+            preparar_base(app, db, forzar=True)
+            from app.routes.solicitudes import init_schemas
+            init_schemas(forzar=True)
+        print("✅ Base de datos migrada")
@@ -0,0 +1,190 @@
+"""
+Modelo del chat interno (antes datos/mensajes.csv)
+Los mensajes se indexan por conversación (par de usuarios) e id, y la tabla
+chat_resumen guarda por usuario y contacto el último mensaje y los no leídos,
+de modo que las consultas del chat no dependen del tamaño del historial.
+"""
+import csv
+import logging
+from datetime import datetime
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Columnas del CSV histórico
+CSV_COLUMNS = ['timestamp', 'sender', 'recipient', 'message']
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def par_conversacion(user1, user2):
+    """Clave de la conversación, independiente de quién envía"""
+    a, b = sorted([user1 or '', user2 or ''])
+    return f"{a}\x1f{b}"
+
+
+class MensajeChat(db.Model):
+    """Mensaje entre dos usuarios"""
+    __tablename__ = 'chat_mensajes'
+    __table_args__ = (
+        db.Index('ix_chat_mensajes_par_id', 'par', 'id'),
+        db.Index('ix_chat_mensajes_recipient_id', 'recipient', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    par = db.Column(db.String(250), nullable=False)
+    timestamp = db.Column(db.String(19), nullable=False)
+    sender = db.Column(db.String(100), nullable=False)
+    recipient = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.Text, nullable=False, default='')
+
+    def __repr__(self):
+        return f'<MensajeChat {self.id} {self.sender}->{self.recipient}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'from': self.sender,
+            'to': self.recipient,
+            'message': self.message,
+            'timestamp': self.timestamp,
+        }
+
+
+class ResumenChat(db.Model):
+    """Último mensaje y no leídos de cada conversación, visto por un usuario"""
+    __tablename__ = 'chat_resumen'
+
+    usuario = db.Column(db.String(100), primary_key=True)
+    contacto = db.Column(db.String(100), primary_key=True)
+    ultimo_id = db.Column(db.Integer)
+    ultimo_timestamp = db.Column(db.String(19))
+    total = db.Column(db.Integer, default=0, nullable=False)
+    no_leidos = db.Column(db.Integer, default=0, nullable=False)
+
+
+def _actualizar_resumen(mensaje):
+    """Suma el mensaje al resumen de ambos participantes"""
+    vistas = {(mensaje.sender, mensaje.recipient): 0, (mensaje.recipient, mensaje.sender): 1}
+    if mensaje.sender == mensaje.recipient:
+        vistas = {(mensaje.sender, mensaje.sender): 0}
+    for (usuario, contacto), no_leido in vistas.items():
+        # Incremento en SQL: dos envíos simultáneos no se pisan el conteo
+        actualizadas = ResumenChat.query.filter_by(usuario=usuario, contacto=contacto).update({
+            'ultimo_id': mensaje.id,
+            'ultimo_timestamp': mensaje.timestamp,
+            'total': ResumenChat.total + 1,
+            'no_leidos': ResumenChat.no_leidos + no_leido,
+        }, synchronize_session=False)
+        if not actualizadas:
+            db.session.add(ResumenChat(
+                usuario=usuario, contacto=contacto, ultimo_id=mensaje.id,
+                ultimo_timestamp=mensaje.timestamp, total=1, no_leidos=no_leido,
+            ))
+            db.session.flush()
+
+
+def enviar_mensaje(sender, recipient, message, timestamp=None):
+    """Guarda un mensaje y actualiza el resumen (sin commit)"""
+    mensaje = MensajeChat(
+        par=par_conversacion(sender, recipient),
+        timestamp=timestamp or datetime.now().strftime(TIMESTAMP_FORMAT),
+        sender=sender,
+        recipient=recipient,
+        message=message,
+    )
+    db.session.add(mensaje)
+    db.session.flush()
+    _actualizar_resumen(mensaje)
+    return mensaje
+
+
+def mensajes_conversacion(user1, user2, before=None, after=None, limit=100):
+    """
+    Mensajes de la conversación en orden cronológico.
+    before: solo ids menores (página anterior); after: solo ids mayores
+    (sondeo de mensajes nuevos). Devuelve (mensajes, hay_mas).
+    """
+    query = MensajeChat.query.filter(MensajeChat.par == par_conversacion(user1, user2))
+    if after is not None:
+        query = query.filter(MensajeChat.id > after)
+        filas = query.order_by(MensajeChat.id).limit(limit + 1).all()
+        return filas[:limit], len(filas) > limit
+    if before is not None:
+        query = query.filter(MensajeChat.id < before)
+    filas = query.order_by(MensajeChat.id.desc()).limit(limit + 1).all()
+    return list(reversed(filas[:limit])), len(filas) > limit
+
+
+def marcar_leidos(usuario, contacto):
+    ResumenChat.query.filter_by(usuario=usuario, contacto=contacto).filter(
+        ResumenChat.no_leidos > 0
+    ).update({'no_leidos': 0}, synchronize_session=False)
+
+
+def ultimo_recibido(usuario):
+    """Último mensaje recibido de otro usuario"""
+    return MensajeChat.query.filter(
+        MensajeChat.recipient == usuario, MensajeChat.sender != usuario
+    ).order_by(MensajeChat.id.desc()).first()
+
+
+def total_no_leidos(usuario):
+    return db.session.query(db.func.coalesce(db.func.sum(ResumenChat.no_leidos), 0)).filter(
+        ResumenChat.usuario == usuario
+    ).scalar()
+
+
+def conversaciones():
+    """Una fila por conversación (lado alfabéticamente menor del resumen)"""
+    filas = ResumenChat.query.filter(ResumenChat.usuario <= ResumenChat.contacto).order_by(
+        ResumenChat.ultimo_id.desc()
+    ).all()
+    return [
+        {
+            'user1': r.usuario,
+            'user2': r.contacto,
+            'message_count': r.total,
+            'last_message': r.ultimo_timestamp,
+        }
+        for r in filas
+    ]
+
+
+def eliminar_conversacion(user1, user2):
+    borrados = MensajeChat.query.filter_by(par=par_conversacion(user1, user2)).delete(synchronize_session=False)
+    ResumenChat.query.filter(db.or_(
+        db.and_(ResumenChat.usuario == user1, ResumenChat.contacto == user2),
+        db.and_(ResumenChat.usuario == user2, ResumenChat.contacto == user1),
+    )).delete(synchronize_session=False)
+    return borrados
+
+
+def eliminar_todo():
+    borrados = MensajeChat.query.delete(synchronize_session=False)
+    ResumenChat.query.delete(synchronize_session=False)
+    return borrados
+
+
+def importar_mensajes_csv(path):
+    """
+    Agrega a la sesión el historial del chat del CSV, sin commit. Igual que
+    con las solicitudes, lo llama una sola vez migrations.importar_historicos.
+    Los mensajes importados quedan como leídos.
+    """
+    if MensajeChat.query.first() is not None:
+        logger.info("[CHAT] La tabla ya tiene mensajes; no se importa el CSV")
+        return 0
+
+    importados = 0
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            sender = (row.get('sender') or '').strip()
+            recipient = (row.get('recipient') or '').strip()
+            if not sender or not recipient:
+                continue
+            enviar_mensaje(sender, recipient, row.get('message') or '', (row.get('timestamp') or '').strip())
+            importados += 1
+
+    ResumenChat.query.update({'no_leidos': 0}, synchronize_session=False)
+    return importados
@@ -0,0 +1,81 @@
+"""
+Modelo de Solicitudes Generales (antes datos/solicitudes.csv)
+"""
+import csv
+import logging
+from datetime import datetime
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Orden de columnas del CSV histórico (se conserva para importar/exportar)
+CSV_COLUMNS = [
+    'municipio', 'nit', 'fecha', 'secretaria', 'objeto', 'justificacion',
+    'valor', 'meta_producto', 'eje', 'sector', 'codigo_bpim', 'estado'
+]
+
+# Estados que entran a la bandeja de certificados
+ESTADOS_PENDIENTES = ('nuevo', 'pendiente', 'editado')
+
+
+class Solicitud(db.Model):
+    """Solicitud de certificado del Plan de Desarrollo"""
+    __tablename__ = 'solicitudes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    municipio = db.Column(db.String(150))
+    nit = db.Column(db.String(50))
+    fecha = db.Column(db.String(20))
+    secretaria = db.Column(db.String(150), index=True)
+    objeto = db.Column(db.Text)
+    justificacion = db.Column(db.Text)
+    valor = db.Column(db.String(50))
+    meta_producto = db.Column(db.Text)
+    eje = db.Column(db.String(300))
+    sector = db.Column(db.String(300))
+    codigo_bpim = db.Column(db.String(50))
+    estado = db.Column(db.String(20), default='nuevo', index=True)
+    creado_por = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Solicitud {self.id} {self.estado}>'
+
+    def to_dict(self):
+        data = {'id': self.id}
+        for col in CSV_COLUMNS:
+            data[col] = getattr(self, col) or ''
+        return data
+
+
+def importar_solicitudes_csv(path):
+    """
+    Agrega a la sesión las solicitudes del CSV histórico, sin commit.
+    Lo llama una sola vez migrations.importar_historicos, que registra la
+    importación en app_schema_version dentro de la misma transacción. Si la
+    tabla ya tiene datos no se importa nada.
+    """
+    if Solicitud.query.first() is not None:
+        logger.info("[SOLICITUDES] La tabla ya tiene datos; no se importa el CSV")
+        return 0
+
+    importadas = 0
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().lower() == 'municipio':  # encabezado
+                continue
+            values = dict(zip(CSV_COLUMNS, row))
+            values['estado'] = (values.get('estado') or 'nuevo').strip() or 'nuevo'
+            db.session.add(Solicitud(**values))
+            importadas += 1
+    return importadas
+
+
+def exportar_solicitudes_csv(stream):
+    """Escribe todas las solicitudes en formato CSV histórico (compatibilidad)"""
+    writer = csv.writer(stream)
+    writer.writerow(CSV_COLUMNS)
+    query = db.session.query(*[getattr(Solicitud, col) for col in CSV_COLUMNS]).order_by(Solicitud.id)
+    for row in query.yield_per(500):
+        writer.writerow(['' if v is None else v for v in row])
@@ -1,49 +1,40 @@
 
 import os
 import io
-import copy
 import base64
 import logging
 import datetime
-try:
-    import pandas as pd
-except Exception:
-    pd = None
 import glob
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, current_app, session, jsonify, abort
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.utils import ImageReader
-from reportlab.graphics.shapes import Drawing 
-from reportlab.graphics.barcode.qr import QrCodeWidget
-from PyPDF2 import PdfReader, PdfWriter
-# Intentamos usar svglib para renderizar el escudo en SVG
-try:
-    from svglib.svglib import svg2rlg
-    from reportlab.graphics import renderPDF
-    SVGLIB_AVAILABLE = True
-except Exception:
-    SVGLIB_AVAILABLE = False
+from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, current_app, session, jsonify, abort, Response
+from sqlalchemy import func
+from app import db
+from app.models.solicitud import Solicitud, ESTADOS_PENDIENTES
+from app.utils.pdf_membrete import stamp_letterhead, formato_path
+from app.utils.render_service import submit_batch, get_job, ESTADO_TERMINADO, ESTADO_ERROR
+from app.utils.zip_stream import stream_zip
+from app.utils.lazy import disponible
+from app.utils.metricas import cronometrado
+# reportlab se importa dentro de las funciones que generan PDF (arranque más liviano)
+
+# svglib para renderizar el escudo en SVG
+SVGLIB_AVAILABLE = disponible('svglib')
 
 # Opcional: convertir SVG a PNG si cairosvg está disponible
-try:
-    import cairosvg
-    CAIROSVG_AVAILABLE = True
-except Exception:
-    CAIROSVG_AVAILABLE = False
+CAIROSVG_AVAILABLE = disponible('cairosvg')
 
 logger = logging.getLogger(__name__)
 certificados_bp = Blueprint('certificados', __name__)
 
-LETTER = letter
+LETTER = (612.0, 792.0)  # reportlab.lib.pagesizes.letter
+
+@cronometrado('pdf')
+def generate_pdf_certificate(data: dict, formato: str = None) -> io.BytesIO:
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Paragraph, Table, TableStyle
 
-def generate_pdf_certificate(data: dict) -> io.BytesIO:
-    # Usar formato oficial de la alcaldía como template
-    formato_path = os.path.join(str(current_app.config['BASE_DIR']), 'datos', 'FORMATO.pdf')
-    
     # Crear overlay con el contenido del certificado
     overlay_buffer = io.BytesIO()
     c = canvas.Canvas(overlay_buffer, pagesize=LETTER)
@@ -335,22 +326,7 @@ def generate_pdf_certificate(data: dict) -> io.BytesIO:
     
     # Combinar con el formato oficial
     try:
-        template_pdf = PdfReader(formato_path)
-        base_template_page = template_pdf.pages[0]
-        overlay_pdf = PdfReader(overlay_buffer)
-        output = PdfWriter()
-
-        # Aplicar el formato oficial a cada página del overlay sin releer el archivo
-        for page_num in range(len(overlay_pdf.pages)):
-            template_page = copy.deepcopy(base_template_page)
-            overlay_page = overlay_pdf.pages[page_num]
-            template_page.merge_page(overlay_page)
-            output.add_page(template_page)
-
-        final_buffer = io.BytesIO()
-        output.write(final_buffer)
-        final_buffer.seek(0)
-        return final_buffer
+        return stamp_letterhead(overlay_buffer.getvalue(), formato)
     except Exception as e:
         logger.warning(f"Error al combinar con formato oficial: {e}")
         overlay_buffer.seek(0)
@@ -359,29 +335,18 @@ def generate_pdf_certificate(data: dict) -> io.BytesIO:
 
 @certificados_bp.route('/certificados', methods=['GET'], endpoint='index')
 def certificados():
-    solicitudes_path = current_app.config['SOLICITUDES_PATH']
-    
-    if os.path.exists(solicitudes_path):
-        df_all = pd.read_csv(solicitudes_path, encoding='utf-8')
-        
-        # Agregar columna 'estado' si no existe (para compatibilidad con datos antiguos)
-        if 'estado' not in df_all.columns:
-            df_all['estado'] = 'nuevo'
-    else:
-        df_all = pd.DataFrame(columns=["municipio","nit","fecha","secretaria","objeto","justificacion","valor","meta_producto","eje","sector","codigo_bpim","estado"])
-
-    # Contar por estado (toda la base de datos)
-    total_solicitudes = len(df_all)
-    generados_count = len(df_all[df_all['estado'] == 'generado'])
-    pendientes_count = len(df_all[df_all['estado'].isin(['nuevo', 'pendiente', 'editado'])])
-    
-    # Filtrar solicitudes disponibles para certificado (las que mostraremos)
-    df = df_all[df_all['estado'].isin(['nuevo', 'pendiente', 'editado'])]
-    df['id'] = df.index
+    # Contar por estado (toda la base de datos) con una sola consulta agrupada
+    conteo_estados = dict(
+        db.session.query(Solicitud.estado, func.count(Solicitud.id)).group_by(Solicitud.estado).all()
+    )
+    total_solicitudes = sum(conteo_estados.values())
+    generados_count = conteo_estados.get('generado', 0)
     
     # Pendientes que mostraremos en la lista (excepto 'generado')
-    pendientes_df = df[df['estado'].isin(['nuevo', 'pendiente', 'editado'])]
-    pendientes_list = pendientes_df.to_dict(orient="records")
+    pendientes_list = [
+        s.to_dict() for s in
+        Solicitud.query.filter(Solicitud.estado.in_(ESTADOS_PENDIENTES)).order_by(Solicitud.id).all()
+    ]
 
     output_dir = current_app.config['CERTIFICADOS_OUTPUT_DIR']
     if not os.path.exists(output_dir):
@@ -403,17 +368,18 @@ def certificados():
     # Análisis mejorado por secretaría
     sec_counts = []
     sec_labels = []
-    if total_solicitudes > 0 and 'secretaria' in df_all.columns:
-        generados_df = df_all[df_all['estado'] == 'generado']
-        
-        if not generados_df.empty and 'secretaria' in generados_df.columns:
-            counts = generados_df['secretaria'].value_counts()
-            # Mostrar solo secretarías con certificados generados
-            for sec in secretarias:
-                count = counts.get(sec, 0)
-                if count > 0:
-                    sec_labels.append(sec.replace('Secretaría de ', '').replace('Secretaría ', ''))
-                    sec_counts.append(int(count))
+    if generados_count > 0:
+        counts = dict(
+            db.session.query(Solicitud.secretaria, func.count(Solicitud.id))
+            .filter(Solicitud.estado == 'generado')
+            .group_by(Solicitud.secretaria).all()
+        )
+        # Mostrar solo secretarías con certificados generados
+        for sec in secretarias:
+            count = counts.get(sec, 0)
+            if count > 0:
+                sec_labels.append(sec.replace('Secretaría de ', '').replace('Secretaría ', ''))
+                sec_counts.append(int(count))
     
     # Si no hay datos, mostrar todas con 0
     if not sec_labels:
@@ -431,10 +397,33 @@ def certificados():
         sec_counts=sec_counts
     )
 
+def _render_certificado_job(data, formato, outfile):
+    """Se ejecuta en el pool de renderizado: genera un certificado y lo escribe en disco"""
+    pdf_buf = generate_pdf_certificate(data, formato)
+    tmp = f"{outfile}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(pdf_buf.getvalue())
+    os.replace(tmp, outfile)
+    return outfile
+
+
+def _marcar_generados(ids, errores):
+    """Cierre del lote: un solo UPDATE para todas las solicitudes generadas"""
+    if ids:
+        Solicitud.query.filter(Solicitud.id.in_(ids)).update(
+            {Solicitud.estado: 'generado'}, synchronize_session=False
+        )
+        db.session.commit()
+        logger.info(f"{len(ids)} certificados marcados como generados")
+
+
 @certificados_bp.route('/generar_lote', methods=['POST'], endpoint='generar_lote')
 def generar_lote_certificados():
-    """Genera múltiples certificados en lote"""
-    solicitudes_path = current_app.config['SOLICITUDES_PATH']
+    """
+    Genera múltiples certificados en lote.
+    Los PDF se reparten entre los procesos del pool de renderizado; la respuesta
+    es inmediata (202) con la URL de avance y la del ZIP con todo el lote.
+    """
     output_dir = current_app.config['CERTIFICADOS_OUTPUT_DIR']
     
     if not os.path.exists(output_dir):
@@ -446,16 +435,8 @@ def generar_lote_certificados():
         if not indices:
             return jsonify({'success': False, 'error': 'No hay solicitudes seleccionadas'}), 400
 
-        # Leer CSV una sola vez y asegurar columna estado
-        df = pd.read_csv(solicitudes_path, encoding='utf-8')
-        if 'estado' not in df.columns:
-            df['estado'] = 'nuevo'
-        df['id'] = df.index
-
-        generados = 0
         errores = []
         indices_int = []
-        download_urls = []
         
         for idx_str in indices:
             try:
@@ -466,106 +447,84 @@ def generar_lote_certificados():
         if not indices_int:
             return jsonify({'success': False, 'error': 'No hay IDs válidos para generar'}), 400
 
-        subset = df[df['id'].isin(indices_int)]
+        # Una sola consulta por clave primaria para todo el lote
+        solicitudes = {s.id: s for s in Solicitud.query.filter(Solicitud.id.in_(indices_int)).all()}
 
-        # Generar cada PDF y actualizar estado en memoria
+        formato = formato_path()
+        items = []
         for idx in indices_int:
-            try:
-                row_series = subset.loc[subset['id'] == idx]
-                if row_series.empty:
-                    errores.append(f'Solicitud {idx} no encontrada')
-                    logger.warning(f"Solicitud {idx} no encontrada")
-                    continue
+            solicitud = solicitudes.get(idx)
+            if solicitud is None:
+                errores.append(f'Solicitud {idx} no encontrada')
+                logger.warning(f"Solicitud {idx} no encontrada")
+                continue
+            outfile = os.path.join(str(output_dir), f"certificado_{idx}.pdf")
+            items.append((idx, (solicitud.to_dict(), formato, outfile)))
 
-                row = row_series.iloc[0].to_dict()
-                
-                logger.info(f"Generando certificado para solicitud {idx}")
-
-                pdf_buf = generate_pdf_certificate({
-                    'municipio': row.get('municipio', ''),
-                    'nit': row.get('nit', ''),
-                    'fecha': row.get('fecha', ''),
-                    'secretaria': row.get('secretaria', ''),
-                    'objeto': row.get('objeto', ''),
-                    'justificacion': row.get('justificacion', ''),
-                    'valor': row.get('valor', ''),
-                    'meta_producto': row.get('meta_producto', ''),
-                    'eje': row.get('eje', ''),
-                    'sector': row.get('sector', ''),
-                    'codigo_bpim': row.get('codigo_bpim', ''),
-                })
-
-                outfile = os.path.join(output_dir, f"certificado_{idx}.pdf")
-                with open(outfile, 'wb') as f:
-                    f.write(pdf_buf.getvalue())
-
-                df.loc[df['id'] == idx, 'estado'] = 'generado'
-                generados += 1
-                download_urls.append(url_for('certificados.descargar_certificado', idx=idx, _external=True))
-                logger.info(f"Certificado {idx} generado exitosamente")
-                
-            except Exception as e:
-                msg_error = f'Error en solicitud {idx}: {str(e)}'
-                errores.append(msg_error)
-                logger.error(msg_error, exc_info=True)
+        if not items:
+            return jsonify({'success': False, 'error': 'Ninguna solicitud encontrada', 'errores': errores}), 404
 
-        # Guardar CSV una sola vez al final
-        if generados > 0:
-            df.to_csv(solicitudes_path, index=False, encoding='utf-8')
-            logger.info(f"CSV actualizado: {generados} certificados marcados como generados")
+        job_id = submit_batch(_render_certificado_job, items, on_finish=_marcar_generados)
+        logger.info(f"Lote {job_id}: {len(items)} certificados encolados")
 
-        # Retornar respuesta JSON - Los PDFs se generaron y están listos para descargar individualmente
         return jsonify({
             'success': True,
-            'generados': generados,
+            'job_id': job_id,
+            'total': len(items),
             'errores': errores,
-            'total': len(indices_int),
-            'mensaje': f'Se generaron {generados} certificados correctamente. Descárgalos de forma individual.',
-            'download_urls': download_urls
-        })
+            'status_url': url_for('jobs_api.estado', job_id=job_id),
+            'zip_url': url_for('certificados.descargar_lote', job_id=job_id),
+        }), 202
 
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error en generar_lote: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@certificados_bp.route('/certificados/lote/<job_id>.zip', methods=['GET'], endpoint='descargar_lote')
+def descargar_lote(job_id):
+    """ZIP en streaming con todos los certificados generados de un lote"""
+    job = get_job(job_id)
+    if job is None or job.get('tipo') != 'lote' or job.get('usuario') != session.get('user'):
+        abort(404)
+    if job.get('estado') == ESTADO_ERROR:
+        return jsonify({'success': False, 'error': job.get('error') or 'El lote terminó con error'}), 500
+    if job.get('estado') != ESTADO_TERMINADO:
+        return jsonify({'success': False, 'error': 'El lote todavía se está generando'}), 409
+
+    output_dir = str(current_app.config['CERTIFICADOS_OUTPUT_DIR'])
+    archivos = [
+        (os.path.join(output_dir, f"certificado_{idx}.pdf"), f"certificado_{idx}.pdf")
+        for idx in job.get('resultados', [])
+    ]
+    nombre = f"certificados_{datetime.date.today():%Y%m%d}.zip"
+    return Response(
+        stream_zip(archivos),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{nombre}"'}
+    )
+
+
 @certificados_bp.route('/generar_certificado', methods=['POST'])
 def generar_certificado():
     idx = int(request.form['index'])
-    solicitudes_path = current_app.config['SOLICITUDES_PATH']
-    df  = pd.read_csv(solicitudes_path, encoding='utf-8')
-    if 'estado' not in df.columns:
-        df['estado'] = 'nuevo'
-    df['id'] = df.index
+    solicitud = db.session.get(Solicitud, idx)
     
-    if idx not in df['id'].values:
+    if solicitud is None:
         flash("Solicitud no encontrada", "danger")
-        return redirect(url_for('certificados.certificados'))
-        
-    row = df.loc[df['id'] == idx].iloc[0].to_dict()
-
-    pdf_buf = generate_pdf_certificate({
-        'municipio':     row.get('municipio'),
-        'nit':           row.get('nit'),
-        'fecha':         row.get('fecha'),
-        'secretaria':    row.get('secretaria'),
-        'objeto':        row.get('objeto'),
-        'justificacion': row.get('justificacion'),
-        'valor':         row.get('valor'),
-        'meta_producto': row.get('meta_producto'),
-        'eje':           row.get('eje'),
-        'sector':        row.get('sector'),
-        'codigo_bpim':   row.get('codigo_bpim'),
-    })
+        return redirect(url_for('certificados.index'))
+
+    pdf_buf = generate_pdf_certificate(solicitud.to_dict())
     
     output_dir = current_app.config['CERTIFICADOS_OUTPUT_DIR']
     outfile = os.path.join(output_dir, f"certificado_{idx}.pdf")
     with open(outfile, 'wb') as f:
         f.write(pdf_buf.getvalue())
     
-    # Actualizar el estado a 'generado' y guardar una sola vez
-    df.loc[df['id'] == idx, 'estado'] = 'generado'
-    df.to_csv(solicitudes_path, index=False, encoding='utf-8')
+    # Actualizar el estado a 'generado'
+    solicitud.estado = 'generado'
+    db.session.commit()
     
     pdf_buf.seek(0)
     return send_file(
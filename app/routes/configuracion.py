@@ -2,7 +2,8 @@
 import os
 import json
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session, current_app, send_file
-from app.utils import admin_required, normalize_features
+from app.utils import admin_required
+from app.utils import features_config, usuario_actual
 from app import db
 from app.models.usuario import Usuario, AuditoriaAcceso
 from app.utils.seguridad import PasswordValidator, EmailService
@@ -19,8 +20,12 @@ def load_config_data():
 
 def save_config_data(cfg):
     path = os.path.join(current_app.config['BASE_DIR'], "config.json")
-    with open(path, 'w', encoding='utf-8') as f:
+    # Escritura atómica: los demás workers nunca leen un JSON a medio escribir
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
         json.dump(cfg, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    features_config.actualizar(cfg.get('features'))
 
 def get_module_catalog():
     return [
@@ -56,7 +61,6 @@ def build_features_config(cfg, users):
     if updated:
         cfg['features'] = features
         save_config_data(cfg)
-        current_app.config["APP_FEATURES"] = normalize_features(features)
 
     return features
 
@@ -88,7 +92,7 @@ def configuracion():
     current_username = session.get('user')
     my_email = None
     if current_username:
-        me = Usuario.query.filter_by(usuario=current_username).first()
+        me = usuario_actual.obtener()
         if me:
             my_email = me.email
     
@@ -168,7 +172,6 @@ def configuracion():
                         if isinstance(allowed, list) and nuevo_u not in allowed:
                             allowed.append(nuevo_u)
                     save_config_data(cfg)
-                    current_app.config["APP_FEATURES"] = normalize_features(cfg.get('features'))
 
                 # Enviar email de bienvenida si tiene email
                 if nuevo_e:
@@ -207,7 +210,6 @@ def configuracion():
 
             cfg['features'] = features
             save_config_data(cfg)
-            current_app.config["APP_FEATURES"] = normalize_features(features)
             flash('✅ Permisos de modulos actualizados', 'success')
             return redirect(url_for('configuracion.index'))
 
@@ -247,6 +249,7 @@ def configuracion():
                     )
                     db.session.add(auditoria)
                     db.session.commit()
+                    usuario_actual.invalidar(username_to_delete)
                     
                     flash(f"✅ Usuario '{username_to_delete}' eliminado", 'success')
                 except Exception as e:
@@ -332,6 +335,7 @@ def configuracion():
                     )
                     db.session.add(auditoria)
                     db.session.commit()
+                    usuario_actual.invalidar(user.usuario)
                     
                     flash(f"✅ Rol de '{user.usuario}' actualizado a '{nuevo_role}'", 'success')
                 except Exception as e:
@@ -406,6 +410,7 @@ def configuracion():
                 )
                 db.session.add(auditoria)
                 db.session.commit()
+                usuario_actual.invalidar()
 
                 ok_mail = EmailService.enviar_notificacion_registro(nuevo_email, current_username)
                 if not ok_mail:
@@ -467,6 +472,12 @@ def configuracion():
             }
             directorios = [module_paths.get(m) for m in seleccion if module_paths.get(m)]
 
+            if 'solicitudes' in seleccion:
+                # Las solicitudes viven en la BD; se exporta el CSV histórico para el backup
+                from app.models.solicitud import exportar_solicitudes_csv
+                with open(module_paths['solicitudes'], 'w', newline='', encoding='utf-8') as f:
+                    exportar_solicitudes_csv(f)
+
             try:
                 bm = BackupManager(current_app)
                 exito, ruta, msg = bm.backup_archivos(directorios=directorios, descripcion='modulos')
@@ -2,19 +2,13 @@
 API de Planes de Contingencia - CRUD y generación de PDF
 Soporta 6 tipos de eventos con plantillas dinámicas
 """
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 import json
 import os
 import io
 import logging
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import Paragraph, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from PyPDF2 import PdfReader, PdfWriter
-from app.utils.pdf_plans_generator import PDFPlanContingenciaOficial
+from app.utils.render_service import render_response
 from app.utils.contingencia_helpers import get_datos_supata, get_plantilla_por_tipo
 
 logger = logging.getLogger(__name__)
@@ -479,26 +473,32 @@ def _render_plan_pdf(plan, filename="plan_contingencia.pdf"):
             'aprobado_por': plan.aprobado_por or ''
         }
         
-        # Usar el nuevo generador profesional
-        generador = PDFPlanContingenciaOficial(plan_dict, current_app)
-        pdf_buffer = generador.generar()
-        
-        if not pdf_buffer:
-            logger.warning("El generador retornó None")
-            return None
-        
-        return pdf_buffer
+        # Usar el nuevo generador profesional (en el pool de renderizado)
+        formato_path = os.path.join(current_app.config['DATA_DIR'], 'FORMATO.pdf')
+        return render_response(_render_plan_job, plan_dict, formato_path, filename=filename)
     
     except Exception as e:
         logger.error(f"Error generando PDF: {e}", exc_info=True)
         import traceback
         traceback.print_exc()
         return None
-        return None
+
+
+def _render_plan_job(plan_dict, formato_path):
+    """Genera los bytes del plan oficial (se ejecuta en el pool de renderizado)"""
+    from app.utils.pdf_plans_generator import PDFPlanContingenciaOficial
+
+    pdf_buffer = PDFPlanContingenciaOficial(plan_dict, formato_path=formato_path).generar()
+    if not pdf_buffer:
+        raise RuntimeError("El generador retornó None")
+    return pdf_buffer.getvalue()
 
 
 def _add_section_title(c, title, color_primary, color_accent, y_position=None):
     """Agrega título de sección con línea decorativa"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+
     w, h = letter
     if y_position is None:
         y_position = h - 80
@@ -515,6 +515,11 @@ def _add_section_title(c, title, color_primary, color_accent, y_position=None):
 
 def _add_text_section(c, subtitle, content, y_pos, color_text):
     """Agrega sección de texto con subtítulo"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph
+
     c.setFont('Helvetica-Bold', 11)
     c.setFillColor(colors.HexColor(color_text))
     c.drawString(80, y_pos, subtitle)
@@ -540,6 +545,9 @@ def _add_text_section(c, subtitle, content, y_pos, color_text):
 
 def _apply_table_style(table, color_header):
     """Aplica estilo estándar a tablas"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
     table.setStyle(TableStyle([
         ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(color_header)),
         ('BACKGROUND', (0, 1), (-1, -1), colors.white),
@@ -565,16 +573,10 @@ def descargar_pdf(plan_id):
         PlanContingencia = get_models()
         plan = PlanContingencia.query.get_or_404(plan_id)
         
-        pdf_buffer = _render_plan_pdf(plan)
+        respuesta = _render_plan_pdf(plan, f"Plan_Contingencia_{plan.numero_plan}.pdf")
         
-        if pdf_buffer:
-            filename = f"Plan_Contingencia_{plan.numero_plan}.pdf"
-            return send_file(
-                pdf_buffer,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
-            )
+        if respuesta is not None:
+            return respuesta
         else:
             return jsonify({'error': 'No se pudo generar el PDF'}), 500
     except Exception as e:
@@ -6,12 +6,13 @@ from flask import Blueprint, request, jsonify, send_file
 from datetime import datetime, timedelta
 import json
 import re
-import requests
-from bs4 import BeautifulSoup
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
+from app.utils.lazy import lazy_import
+from app.utils.metricas import medir
+
+# Solo se usan al importar desde SECOP (ver app/utils/lazy.py)
+requests = lazy_import('requests')
+bs4 = lazy_import('bs4')
 
 # Lazy imports para evitar dependencias circulares
 def get_db():
@@ -74,10 +75,11 @@ def importar_desde_secop_i(proceso_id):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=30)
+        with medir('secop'):
+            response = requests.get(url, headers=headers, timeout=30)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = bs4.BeautifulSoup(response.content, 'html.parser')
         
         datos = {
             'numero_proceso': proceso_id,
@@ -248,7 +250,8 @@ def importar_desde_secop_ii(proceso_id):
             '$limit': 1
         }
         
-        response = requests.get(api_url, params=params, timeout=30)
+        with medir('secop'):
+            response = requests.get(api_url, params=params, timeout=30)
         response.raise_for_status()
         
         resultados = response.json()
@@ -256,7 +259,8 @@ def importar_desde_secop_ii(proceso_id):
         if not resultados:
             # Intentar búsqueda alternativa
             params = {'$q': proceso_id, '$limit': 5}
-            response = requests.get(api_url, params=params, timeout=30)
+            with medir('secop'):
+                response = requests.get(api_url, params=params, timeout=30)
             resultados = response.json()
         
         if not resultados:
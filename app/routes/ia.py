@@ -3,19 +3,22 @@ import datetime
 import csv
 import io
 import base64
-import copy
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session, current_app, jsonify, send_file
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.utils import ImageReader
-from PyPDF2 import PdfReader, PdfWriter
+from app.utils.pdf_membrete import stamp_letterhead
+from app.utils.metricas import cronometrado
+from app import db
+from app.utils.event_stream import publish
+from app.models.mensaje import (
+    enviar_mensaje, mensajes_conversacion, marcar_leidos, ultimo_recibido,
+    total_no_leidos, conversaciones, eliminar_conversacion, eliminar_todo,
+)
 # import openai # Optional, only if installed
 
 ia_bp = Blueprint('ia', __name__)
 
+CHAT_PAGE_SIZE = 100
+CHAT_MAX_PAGE_SIZE = 500
+
 @ia_bp.route('/ia', methods=['GET'], endpoint='index')
 def index():
     """Página principal del módulo IA - Rediseñada iOS 26"""
@@ -61,9 +64,22 @@ def get_chat_users():
         print(f"Error loading users: {e}")
         return jsonify([])
 
+def _es_admin():
+    role = (session.get('role') or session.get('user_role') or '').lower()
+    return role in ['admin', 'administrador', 'superadmin']
+
+def _int_arg(nombre):
+    try:
+        return int(request.args[nombre]) if request.args.get(nombre) else None
+    except ValueError:
+        return None
+
 @ia_bp.route('/api/chat/messages', methods=['GET'])
 def get_chat_messages():
-    """Obtener mensajes entre dos usuarios"""
+    """
+    Obtener mensajes entre dos usuarios (más recientes primero por página).
+    ?before=<id> pagina hacia atrás; ?after=<id> trae solo los nuevos.
+    """
     if 'user' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
@@ -74,39 +90,27 @@ def get_chat_messages():
         return jsonify({'messages': []})
     
     try:
-        messages_path = os.path.join(current_app.config['DATA_DIR'], 'mensajes.csv')
-        messages = []
-        
-        # Ensure file exists with headers
-        if not os.path.exists(messages_path):
-            with open(messages_path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['timestamp', 'sender', 'recipient', 'message'])
-                writer.writeheader()
-        
-        with open(messages_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sender = row.get('sender', '')
-                recipient = row.get('recipient', '')
-                
-                # Get messages between current user and contact
-                if (sender == current_user and recipient == contact_user) or \
-                   (sender == contact_user and recipient == current_user):
-                    messages.append({
-                        'from': sender,
-                        'to': recipient,
-                        'message': row.get('message', ''),
-                        'timestamp': row.get('timestamp', '')
-                    })
+        limit = min(max(_int_arg('limit') or CHAT_PAGE_SIZE, 1), CHAT_MAX_PAGE_SIZE)
+        mensajes, hay_mas = mensajes_conversacion(
+            current_user, contact_user,
+            before=_int_arg('before'), after=_int_arg('after'), limit=limit
+        )
+        marcar_leidos(current_user, contact_user)
+        db.session.commit()
         
-        return jsonify({'messages': messages})
+        return jsonify({
+            'messages': [m.to_dict() for m in mensajes],
+            'has_more': hay_mas,
+            'next_before': mensajes[0].id if mensajes and hay_mas and _int_arg('after') is None else None,
+        })
     except Exception as e:
+        db.session.rollback()
         print(f"Error loading messages: {e}")
         return jsonify({'messages': []})
 
 @ia_bp.route('/api/chat/last', methods=['GET'])
 def get_last_incoming_message():
-    """Devuelve el último mensaje recibido por el usuario actual.
+    """Devuelve el último mensaje recibido por el usuario actual y el total de no leídos.
     Útil para notificaciones de 'nuevo mensaje'.
     """
     if 'user' not in session:
@@ -114,45 +118,14 @@ def get_last_incoming_message():
     
     current_user = session['user']
     try:
-        messages_path = os.path.join(current_app.config['DATA_DIR'], 'mensajes.csv')
-        last_msg = None
-        
-        if not os.path.exists(messages_path):
-            return jsonify({'message': None})
-        
-        with open(messages_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sender = row.get('sender', '')
-                recipient = row.get('recipient', '')
-                if recipient == current_user and sender != current_user:
-                    ts = row.get('timestamp') or ''
-                    try:
-                        dt = datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
-                    except Exception:
-                        dt = None
-                    candidate = {
-                        'from': sender,
-                        'to': recipient,
-                        'message': row.get('message', ''),
-                        'timestamp': ts,
-                        'dt': dt
-                    }
-                    if last_msg is None:
-                        last_msg = candidate
-                    else:
-                        # Compare datetimes; if missing, keep existing
-                        if candidate['dt'] and (not last_msg['dt'] or candidate['dt'] > last_msg['dt']):
-                            last_msg = candidate
-        
-        if last_msg:
-            # Remove dt from response
-            last_msg.pop('dt', None)
-            return jsonify({'message': last_msg})
-        return jsonify({'message': None})
+        last_msg = ultimo_recibido(current_user)
+        return jsonify({
+            'message': last_msg.to_dict() if last_msg else None,
+            'count': int(total_no_leidos(current_user) or 0),
+        })
     except Exception as e:
         print(f"Error reading last message: {e}")
-        return jsonify({'message': None})
+        return jsonify({'message': None, 'count': 0})
 
 @ia_bp.route('/api/chat/send', methods=['POST'])
 def send_chat_message():
@@ -169,25 +142,22 @@ def send_chat_message():
         if not recipient or not message:
             return jsonify({'error': 'Missing data'}), 400
         
-        messages_path = os.path.join(current_app.config['DATA_DIR'], 'mensajes.csv')
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        mensaje = enviar_mensaje(current_user, recipient, message)
+        db.session.commit()
         
-        # Append message to CSV
-        with open(messages_path, 'a', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=['timestamp', 'sender', 'recipient', 'message'])
-            writer.writerow({
-                'timestamp': timestamp,
-                'sender': current_user,
-                'recipient': recipient,
-                'message': message
-            })
+        # Aviso en vivo al destinatario (y a las otras pestañas del remitente)
+        publish(recipient, 'chat', mensaje.to_dict())
+        if recipient != current_user:
+            publish(current_user, 'chat', mensaje.to_dict())
         
         return jsonify({
             'status': 'success',
             'message': 'Message sent',
-            'timestamp': timestamp
+            'id': mensaje.id,
+            'timestamp': mensaje.timestamp
         })
     except Exception as e:
+        db.session.rollback()
         print(f"Error sending message: {e}")
         return jsonify({'error': 'Failed to send message'}), 500
 
@@ -198,8 +168,7 @@ def delete_chat_messages():
         return jsonify({'error': 'Not authenticated'}), 401
     
     # Verificar que el usuario sea admin
-    role = (session.get('role') or session.get('user_role') or '').lower()
-    if role not in ['admin', 'administrador', 'superadmin']:
+    if not _es_admin():
         return jsonify({'error': 'No autorizado. Solo administradores pueden eliminar mensajes.'}), 403
     
     try:
@@ -208,44 +177,15 @@ def delete_chat_messages():
         user1 = data.get('user1', '')
         user2 = data.get('user2', '')
         
-        messages_path = os.path.join(current_app.config['DATA_DIR'], 'mensajes.csv')
-        
-        if not os.path.exists(messages_path):
-            return jsonify({'error': 'No existe historial de mensajes'}), 404
-        
-        messages = []
-        
-        # Leer todos los mensajes
-        with open(messages_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            
-            for row in reader:
-                if delete_type == 'all':
-                    # No agregar ningún mensaje (borrar todo)
-                    continue
-                elif delete_type == 'conversation':
-                    # Filtrar conversación entre user1 y user2
-                    sender = row.get('sender', '')
-                    recipient = row.get('recipient', '')
-                    
-                    # Mantener si NO es parte de la conversación a eliminar
-                    is_conversation = (
-                        (sender == user1 and recipient == user2) or
-                        (sender == user2 and recipient == user1)
-                    )
-                    if not is_conversation:
-                        messages.append(row)
-                else:
-                    messages.append(row)
-        
-        # Reescribir el archivo
-        with open(messages_path, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(messages)
+        if delete_type == 'all':
+            eliminar_todo()
+            deleted_count = 'all'
+        elif delete_type == 'conversation':
+            deleted_count = eliminar_conversacion(user1, user2)
+        else:
+            deleted_count = 0
+        db.session.commit()
         
-        deleted_count = 0 if delete_type != 'all' else 'all'
         return jsonify({
             'success': True,
             'message': f'Mensajes eliminados exitosamente',
@@ -253,6 +193,7 @@ def delete_chat_messages():
         })
         
     except Exception as e:
+        db.session.rollback()
         print(f'Error al eliminar mensajes: {e}')
         return jsonify({'error': str(e)}), 500
 
@@ -263,54 +204,12 @@ def get_chat_conversations():
         return jsonify({'error': 'Not authenticated'}), 401
     
     # Verificar que el usuario sea admin
-    role = (session.get('role') or session.get('user_role') or '').lower()
-    if role not in ['admin', 'administrador', 'superadmin']:
+    if not _es_admin():
         return jsonify({'error': 'No autorizado'}), 403
     
     try:
-        messages_path = os.path.join(current_app.config['DATA_DIR'], 'mensajes.csv')
-        
-        if not os.path.exists(messages_path):
-            return jsonify([])
-        
-        conversations = {}
-        
-        with open(messages_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sender = row.get('sender', '')
-                recipient = row.get('recipient', '')
-                timestamp = row.get('timestamp', '')
-                
-                # Crear clave única para la conversación (orden alfabético)
-                users = tuple(sorted([sender, recipient]))
-                
-                if users not in conversations:
-                    conversations[users] = {
-                        'users': users,
-                        'last_message': timestamp,
-                        'message_count': 0
-                    }
-                
-                conversations[users]['message_count'] += 1
-                conversations[users]['last_message'] = timestamp
-        
-        # Convertir a lista
-        result = [
-            {
-                'user1': conv['users'][0],
-                'user2': conv['users'][1],
-                'message_count': conv['message_count'],
-                'last_message': conv['last_message']
-            }
-            for conv in conversations.values()
-        ]
-        
-        # Ordenar por última actividad
-        result.sort(key=lambda x: x['last_message'], reverse=True)
-        
-        return jsonify(result)
-        
+        # Ordenadas por última actividad (tabla de resumen, sin recorrer mensajes)
+        return jsonify(conversaciones())
     except Exception as e:
         print(f'Error al obtener conversaciones: {e}')
         return jsonify({'error': str(e)}), 500
@@ -319,16 +218,20 @@ def get_chat_conversations():
 # OTROS MÓDULOS
 # ============================================
 
+@cronometrado('pdf')
 def generate_oficio_pdf(data: dict) -> io.BytesIO:
     """Genera un Oficio usando el FORMATO.pdf como base con formato profesional mejorado"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Paragraph
     
     # Rol y secretaría en sesión
     role_session = (session.get('role') or session.get('user_role') or '').lower()
     secretaria_session = session.get('secretaria', '')
 
-    # Ruta del formato oficial
-    formato_path = os.path.join(current_app.config['DATA_DIR'], 'FORMATO.pdf')
-    
     # Crear canvas para el overlay
     overlay_buffer = io.BytesIO()
     c = canvas.Canvas(overlay_buffer, pagesize=letter)
@@ -596,26 +499,7 @@ def generate_oficio_pdf(data: dict) -> io.BytesIO:
     # COMBINAR CON FORMATO OFICIAL
     # ============================================
     try:
-        if os.path.exists(formato_path):
-            template_pdf = PdfReader(formato_path)
-            base_template_page = template_pdf.pages[0]
-            overlay_pdf = PdfReader(overlay_buffer)
-            output = PdfWriter()
-            
-            # Aplicar formato oficial a cada página del contenido sin reabrir archivo
-            for page_num in range(len(overlay_pdf.pages)):
-                template_page = copy.deepcopy(base_template_page)
-                overlay_page = overlay_pdf.pages[page_num]
-                template_page.merge_page(overlay_page)
-                output.add_page(template_page)
-            
-            final_buffer = io.BytesIO()
-            output.write(final_buffer)
-            final_buffer.seek(0)
-            return final_buffer
-        else:
-            overlay_buffer.seek(0)
-            return overlay_buffer
+        return stamp_letterhead(overlay_buffer.getvalue())
     except Exception as e:
         print(f'Error al combinar con formato oficial: {e}')
         overlay_buffer.seek(0)
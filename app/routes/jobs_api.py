@@ -0,0 +1,50 @@
+"""
+API de estado de trabajos de renderizado
+Rutas: /api/jobs/...
+"""
+from flask import Blueprint, jsonify, send_file, session, url_for
+import os
+import logging
+
+from app.utils.render_service import get_job, job_pdf_path, ESTADO_TERMINADO
+
+logger = logging.getLogger(__name__)
+
+jobs_api = Blueprint('jobs_api', __name__, url_prefix='/api/jobs')
+
+
+def _job_del_usuario(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return None
+    if job.get('usuario') and job.get('usuario') != session.get('user'):
+        return None
+    return job
+
+
+@jobs_api.route('/<job_id>', methods=['GET'], endpoint='estado')
+def estado(job_id):
+    """Estado de un trabajo; incluye download_url cuando ya terminó"""
+    if not session.get('user'):
+        return jsonify({'error': 'unauthorized'}), 401
+    job = _job_del_usuario(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    if job.get('estado') == ESTADO_TERMINADO and job.get('tipo') != 'lote':
+        job['download_url'] = url_for('jobs_api.descargar', job_id=job_id)
+    return jsonify(job), 200
+
+
+@jobs_api.route('/<job_id>/descargar', methods=['GET'], endpoint='descargar')
+def descargar(job_id):
+    """Descarga el PDF de un trabajo terminado"""
+    if not session.get('user'):
+        return jsonify({'error': 'unauthorized'}), 401
+    job = _job_del_usuario(job_id)
+    if job is None or job.get('estado') != ESTADO_TERMINADO:
+        return jsonify({'error': 'Trabajo no disponible'}), 404
+    path = job_pdf_path(job_id)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Archivo expirado'}), 410
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=job.get('filename') or f"{job_id}.pdf")
@@ -1,20 +1,16 @@
 from flask import Blueprint, render_template, session, redirect, url_for, current_app, request, flash, jsonify
-from app.utils import can_access, normalize_features
-import json
-import os
-import csv as csv_mod
+from app.utils import can_access
+from app.utils import features_config
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.before_app_request
 def load_features():
-    # Load features from config.json (if present) to override defaults
+    # Permisos de config.json: solo se relee el archivo cuando cambia
+    if request.endpoint == 'static':
+        return
     try:
-        config_path = os.path.join(current_app.config['BASE_DIR'], "config.json")
-        if os.path.exists(config_path):
-            with open(config_path, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
-                current_app.config["APP_FEATURES"] = normalize_features(cfg.get("features"))
+        features_config.refrescar()
     except Exception as e:
         print(f"Error loading features: {e}")
 
@@ -29,70 +25,26 @@ def dashboard_stats():
     if not session.get('user'):
         return jsonify({'error': 'unauthorized'}), 401
 
-    stats = {}
+    from app.utils import dashboard_stats
 
-    # Solicitudes (CSV)
-    if can_access('solicitudes'):
-        try:
-            path = current_app.config.get('SOLICITUDES_PATH', '')
-            total, pendientes = 0, 0
-            if os.path.exists(path):
-                with open(path, 'r', encoding='utf-8') as f:
-                    for row in csv_mod.reader(f):
-                        if row:
-                            total += 1
-                            if len(row) > 11 and row[11].strip().lower() == 'nuevo':
-                                pendientes += 1
-            stats['solicitudes'] = {'total': total, 'pendientes': pendientes}
-        except Exception as e:
-            print(f"Stats error (solicitudes): {e}")
+    # Módulo del dashboard -> feature que da acceso
+    visibles = {
+        'solicitudes': can_access('solicitudes'),
+        'pqrs': can_access('participacion'),
+        'contratos': can_access('contratos'),
+        'riesgo': can_access('riesgo'),
+        # Admin: usuarios del sistema
+        'usuarios': session.get('user_role') in ('admin', 'superadmin'),
+    }
 
-    # PQRS / Participación
-    if can_access('participacion'):
-        try:
-            from app.models.participacion import Radicado
-            stats['pqrs'] = {
-                'pendiente': Radicado.query.filter_by(estado='PENDIENTE').count(),
-                'en_tramite': Radicado.query.filter_by(estado='EN_TRAMITE').count(),
-                'total':      Radicado.query.count(),
-            }
-        except Exception as e:
-            print(f"Stats error (pqrs): {e}")
-
-    # Contratos
-    if can_access('contratos'):
-        try:
-            from app.models.contrato import Contrato
-            stats['contratos'] = {
-                'total': Contrato.query.count(),
-                'alerta': Contrato.query.filter_by(alerta_vencimiento=True).count(),
-            }
-        except Exception as e:
-            print(f"Stats error (contratos): {e}")
-
-    # Gestión del Riesgo (Arbórea)
-    if can_access('riesgo'):
-        try:
-            from app.models.riesgo_arborea import RadicadoArborea
-            stats['riesgo'] = {
-                'total':      RadicadoArborea.query.count(),
-                'pendientes': RadicadoArborea.query.filter(
-                                  RadicadoArborea.dictamen_decision.is_(None)
-                              ).count(),
-            }
-        except Exception as e:
-            print(f"Stats error (riesgo): {e}")
-
-    # Admin: usuarios del sistema
-    if session.get('user_role') in ('admin', 'superadmin'):
+    stats = {}
+    for modulo, visible in visibles.items():
+        if not visible:
+            continue
         try:
-            from app.models.usuario import Usuario
-            stats['usuarios'] = {
-                'total':   Usuario.query.count(),
-                'activos': Usuario.query.filter_by(bloqueado=False).count(),
-            }
+            stats[modulo] = dashboard_stats.obtener(modulo)
         except Exception as e:
-            print(f"Stats error (usuarios): {e}")
+            print(f"Stats error ({modulo}): {e}")
 
     return jsonify(stats)
 
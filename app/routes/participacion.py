@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from app import db
 from app.models.participacion import Radicado, RespuestaRadicado
 from app.utils import can_access, admin_required
+from app.utils.event_stream import publish
+from app.utils.metricas import medir
 import os
 import datetime
 import hashlib
@@ -34,6 +36,15 @@ def get_oficinas():
         'SHAC': 'Secretaría de Hacienda y Gestión Financiera'
     }
 
+def codigo_oficina(secretaria):
+    """Código de oficina (SGOB, SPLA, ...) que corresponde a la secretaría del usuario"""
+    if not secretaria:
+        return None
+    for codigo, nombre in get_oficinas().items():
+        if nombre.lower() in secretaria.lower() or secretaria.lower() in nombre.lower():
+            return codigo
+    return None
+
 def radicado_to_dict(radicado):
     """Convierte un objeto Radicado a diccionario JSON-serializable"""
     return {
@@ -70,17 +81,12 @@ def index():
         radicados = Radicado.query.order_by(Radicado.fecha_radicacion.desc()).all()
     else:
         # Otros usuarios ven solo los asignados a su secretaría
-        oficinas_dict = get_oficinas()
         # Buscar la clave de la secretaría del usuario
-        codigo_oficina = None
-        for codigo, nombre in oficinas_dict.items():
-            if secretaria and (nombre.lower() in secretaria.lower() or secretaria.lower() in nombre.lower()):
-                codigo_oficina = codigo
-                break
+        oficina = codigo_oficina(secretaria)
         
-        if codigo_oficina:
+        if oficina:
             radicados = Radicado.query.filter(
-                Radicado.oficina_destino == codigo_oficina
+                Radicado.oficina_destino == oficina
             ).order_by(Radicado.fecha_radicacion.desc()).all()
         else:
             # Fallback: filtrar por asignado_a
@@ -171,6 +177,18 @@ def radicar_api():
         db.session.add(nuevo_radicado)
         db.session.commit()
         
+        # Aviso en vivo a la oficina destino y al responsable asignado
+        aviso = {
+            'id': nuevo_radicado.id,
+            'numero_radicado': numero_radicado,
+            'asunto': asunto,
+            'oficina_destino': oficina_destino,
+            'url': url_for('participacion.ver', id=nuevo_radicado.id),
+        }
+        publish(f"oficina:{oficina_destino}", 'pqrs', aviso)
+        if nuevo_radicado.asignado_a and nuevo_radicado.asignado_a != session.get('user'):
+            publish(nuevo_radicado.asignado_a, 'pqrs', aviso)
+        
         return jsonify({
             'success': True,
             'numero_radicado': numero_radicado,
@@ -484,7 +502,8 @@ def constancia_pdf(id):
 
     try:
         from weasyprint import HTML as WP_HTML
-        pdf_bytes = WP_HTML(string=html_content).write_pdf()
+        with medir('pdf'):
+            pdf_bytes = WP_HTML(string=html_content).write_pdf()
         nombre_archivo = f"constancia_{radicado.numero_radicado}.pdf"
         return send_file(
             io.BytesIO(pdf_bytes),
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify
 from app import db
 from app.models.usuario import Usuario
+from app.utils import usuario_actual
 import os
 from werkzeug.utils import secure_filename
 import json
@@ -42,6 +43,7 @@ def perfil():
             }
             user.set_preferencias(prefs)
             db.session.commit()
+            usuario_actual.invalidar()
             
             # Si es solicitud AJAX, responde JSON
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -74,6 +76,7 @@ def perfil():
             
             user.foto_perfil = f"uploads/perfiles/{filename}"
             db.session.commit()
+            usuario_actual.invalidar()
             # Respuesta según tipo de solicitud
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return jsonify(success=True, foto_perfil=user.foto_perfil)
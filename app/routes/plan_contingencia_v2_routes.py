@@ -3,20 +3,14 @@ Rutas para gestión de Planes de Contingencia V2
 Estructura completa con auto-población de datos de Supatá
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_file, current_app, session
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, current_app, session
 from datetime import datetime
 import json
 import os
 import io
 import base64
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.colors import HexColor
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle, Image
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
-from PyPDF2 import PdfReader, PdfWriter
+from app.utils.pdf_membrete import stamp_letterhead
+from app.utils.render_service import render_response
 
 contingencia_bp = Blueprint('contingencia', __name__, url_prefix='/gestion-riesgo')
 
@@ -121,20 +115,11 @@ def descargar_pdf(plan_id):
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        # Generar PDF usando reportlab con formato profesional
-        pdf_buffer = _generar_pdf_profesional(data)
-        
-        # Combinar con el formato oficial si existe
-        pdf_final = _combinar_con_formato_oficial(pdf_buffer, data)
-        
         nombre_archivo = (data.get('nombre_plan', 'Plan-Contingencia') or 'Plan-Contingencia').replace(' ', '-') + '.pdf'
+        formato_path = os.path.join(current_app.config.get('DATA_DIR', os.path.join(current_app.root_path, 'datos')), 'FORMATO.pdf')
         
-        return send_file(
-            pdf_final,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=nombre_archivo
-        )
+        # Generar PDF en el pool de renderizado (reportlab + formato oficial)
+        return render_response(_render_plan_job, data, formato_path, filename=nombre_archivo)
     except Exception as e:
         print(f"Error generando PDF: {str(e)}")
         import traceback
@@ -142,39 +127,16 @@ def descargar_pdf(plan_id):
         return jsonify({"error": str(e)}), 500
 
 
-def _combinar_con_formato_oficial(pdf_buffer, plan):
+def _render_plan_job(plan, formato_path):
+    """Genera los bytes del plan con formato oficial (se ejecuta en el pool de renderizado)"""
+    pdf_buffer = _generar_pdf_profesional(plan)
+    return _combinar_con_formato_oficial(pdf_buffer, plan, formato_path).getvalue()
+
+
+def _combinar_con_formato_oficial(pdf_buffer, plan, formato_path=None):
     """Combina el PDF generado con el FORMATO.pdf oficial de la Alcaldía"""
     try:
-        # Ruta del formato oficial
-        formato_path = os.path.join(current_app.config.get('DATA_DIR', os.path.join(current_app.root_path, 'datos')), 'FORMATO.pdf')
-        
-        if not os.path.exists(formato_path):
-            print(f"ADVERTENCIA: {formato_path} no encontrado. Devolviendo PDF sin formato oficial")
-            pdf_buffer.seek(0)
-            return pdf_buffer
-        
-        # Leer el PDF generado y el formato oficial
-        overlay_pdf = PdfReader(pdf_buffer)
-        template_pdf = PdfReader(formato_path)
-        output = PdfWriter()
-        
-        # Combinar cada página del overlay con el formato
-        for page_num in range(len(overlay_pdf.pages)):
-            # Usar la primera página del formato como template
-            template_page = PdfReader(formato_path).pages[0]
-            overlay_page = overlay_pdf.pages[page_num]
-            
-            # Mergear el contenido sobre el formato
-            template_page.merge_page(overlay_page)
-            output.add_page(template_page)
-        
-        # Escribir el PDF final
-        final_buffer = io.BytesIO()
-        output.write(final_buffer)
-        final_buffer.seek(0)
-        
-        return final_buffer
-        
+        return stamp_letterhead(pdf_buffer.getvalue(), formato_path)
     except Exception as e:
         print(f"Error al combinar con formato oficial: {str(e)}")
         import traceback
@@ -186,6 +148,13 @@ def _combinar_con_formato_oficial(pdf_buffer, plan):
 
 def _generar_pdf_profesional(plan):
     """Genera un PDF profesional del plan de contingencia con formato oficial"""
+    from reportlab.lib import colors
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
     
     # Colores oficiales
     COLOR_PRIMARY = HexColor('#1a472a')      # Verde oscuro
@@ -435,6 +404,8 @@ def _generar_pdf_profesional(plan):
 
 def _agregar_campo(plan, clave, etiqueta, style_label, style_value):
     """Agrega un campo al PDF con etiqueta y valor"""
+    from reportlab.platypus import Paragraph
+
     valor = plan.get(clave, '')
     if not valor:
         valor = 'No registrado'
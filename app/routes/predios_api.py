@@ -0,0 +1,139 @@
+"""
+API de consultas espaciales sobre predios
+Rutas: /api/predios/...
+"""
+from flask import Blueprint, request, jsonify
+import logging
+
+from app.utils.tile_cache import categoria_uso, get_layer
+
+logger = logging.getLogger(__name__)
+
+predios_api = Blueprint('predios_api', __name__, url_prefix='/api/predios')
+
+# Campos que se devuelven por predio (registro compacto, sin geometría)
+CAMPOS_PREDIO = ('COD_PRED', 'OBJECTID', 'Categoria', 'Subcategor', 'Uso', 'DEST_ECO',
+                 'AREA_HA', 'DIRECCIÓN', 'RANGO')
+MAX_RESULTADOS = 5000
+# Campos donde busca el texto libre del visor
+CAMPOS_BUSQUEDA = ('COD_PRED', 'NOMBRE', 'DIRECCIÓN')
+
+
+def _registro(feature, capa):
+    fid, props = feature[0], feature[1]
+    if capa == 'predios':
+        props = {k: props[k] for k in CAMPOS_PREDIO if props.get(k) is not None}
+    return {'id': fid, **props}
+
+
+def _capa():
+    nombre = request.args.get('capa', 'predios')
+    return nombre, get_layer(nombre)
+
+
+def _float_arg(nombre):
+    valor = request.args.get(nombre)
+    return float(valor) if valor not in (None, '') else None
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def predio_en_punto(lat, lng, capa='predios'):
+    """Registro compacto del predio que contiene el punto, o None"""
+    layer = get_layer(capa)
+    if layer is None:
+        return None
+    encontrados = layer.features_at(lng, lat)
+    return _registro(encontrados[0], capa) if encontrados else None
+
+
+@predios_api.route('/at', methods=['GET'], endpoint='at')
+def predio_en():
+    """Predio(s) que contienen el punto: /api/predios/at?lat=..&lng=..[&capa=catastro]"""
+    try:
+        lat, lng = _float_arg('lat'), _float_arg('lng')
+    except ValueError:
+        return jsonify({'error': 'lat/lng inválidos'}), 400
+    if lat is None or lng is None:
+        return jsonify({'error': 'Parámetros lat y lng requeridos'}), 400
+
+    nombre, layer = _capa()
+    if layer is None:
+        return jsonify({'error': 'Capa no disponible'}), 404
+
+    predios = [_registro(f, nombre) for f in layer.features_at(lng, lat)]
+    return jsonify({'success': True, 'total': len(predios), 'predios': predios}), 200
+
+
+@predios_api.route('/bbox', methods=['GET'], endpoint='bbox')
+def predios_en_bbox():
+    """
+    Predios que intersectan un rectángulo:
+    /api/predios/bbox?bbox=oeste,sur,este,norte  o  ?west=&south=&east=&north=
+    """
+    try:
+        if request.args.get('bbox'):
+            west, south, east, north = [float(v) for v in request.args['bbox'].split(',')]
+        else:
+            west, south, east, north = (_float_arg(k) for k in ('west', 'south', 'east', 'north'))
+        limite = min(int(request.args.get('limit', 500)), MAX_RESULTADOS)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'bbox inválido (oeste,sur,este,norte)'}), 400
+    if None in (west, south, east, north) or west > east or south > north:
+        return jsonify({'error': 'bbox inválido (oeste,sur,este,norte)'}), 400
+
+    nombre, layer = _capa()
+    if layer is None:
+        return jsonify({'error': 'Capa no disponible'}), 404
+
+    encontrados = sorted(layer.features_in(west, south, east, north), key=lambda f: f[0])
+    predios = [_registro(f, nombre) for f in encontrados[:limite]]
+    return jsonify({
+        'success': True,
+        'total': len(encontrados),
+        'truncado': len(encontrados) > limite,
+        'predios': predios,
+    }), 200
+
+
+@predios_api.route('/stats', methods=['GET'], endpoint='stats')
+def estadisticas():
+    """
+    Totales de los predios que cumplen los filtros del visor 3D:
+    /api/predios/stats?categoria=..&rango=..&dest_eco=..&q=..
+    """
+    layer = get_layer('predios')
+    if layer is None:
+        return jsonify({'error': 'Capa no disponible'}), 404
+
+    categoria = request.args.get('categoria') or None
+    rango = request.args.get('rango') or None
+    dest_eco = request.args.get('dest_eco') or None
+    q = (request.args.get('q') or '').strip().lower()
+
+    total, area, avaluo = 0, 0.0, 0.0
+    for feature in layer.features:
+        props = feature[1]
+        if categoria and categoria_uso(props) != categoria:
+            continue
+        if rango and props.get('RANGO') != rango:
+            continue
+        if dest_eco and props.get('DEST_ECO') != dest_eco:
+            continue
+        if q and not any(q in str(props.get(k) or '').lower() for k in CAMPOS_BUSQUEDA):
+            continue
+        total += 1
+        area += _numero(props.get('AREA_HA'))
+        avaluo += _numero(props.get('EVALÚO'))
+
+    return jsonify({
+        'success': True,
+        'total': total,
+        'area_ha': round(area, 2),
+        'avaluo': round(avaluo, 2),
+    }), 200
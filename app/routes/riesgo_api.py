@@ -2,19 +2,16 @@
 API Endpoints para Gestión Arbórea - Gestión del Riesgo
 IMPORTACIONES LAZY PARA EVITAR CIRCULAR IMPORTS
 """
-from flask import Blueprint, request, jsonify, send_file, render_template, current_app, session
+from flask import Blueprint, request, jsonify, render_template, current_app, session
 from datetime import datetime, timedelta
 import json
 import os
 import math
 import io
 import logging
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import Paragraph, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from PyPDF2 import PdfReader, PdfWriter
+from types import SimpleNamespace
+from app.utils.pdf_membrete import stamp_letterhead
+from app.utils.render_service import render_response
 
 logger = logging.getLogger(__name__)
 
@@ -139,6 +136,15 @@ def crear_radicado():
         radicado.ubicacion_lat = float(data.get('ubicacion_lat')) if data.get('ubicacion_lat') else None
         radicado.ubicacion_lng = float(data.get('ubicacion_lng')) if data.get('ubicacion_lng') else None
         radicado.matricula_catastral = data.get('matricula_catastral')
+        if not radicado.matricula_catastral and radicado.ubicacion_lat is not None and radicado.ubicacion_lng is not None:
+            # Asociar automáticamente el predio que contiene la ubicación
+            try:
+                from app.routes.predios_api import predio_en_punto
+                predio = predio_en_punto(radicado.ubicacion_lat, radicado.ubicacion_lng)
+                if predio and predio.get('COD_PRED'):
+                    radicado.matricula_catastral = str(predio['COD_PRED'])
+            except Exception as e:
+                logger.warning(f"[ARBOREA] No se pudo asociar predio por ubicación: {e}")
         
         # Árbol - datos iniciales
         radicado.arbol_especie_comun = data.get('arbol_especie_comun')
@@ -351,94 +357,14 @@ def listar_radicados():
 def _render_pdf(template_name, context, filename="documento.pdf"):
     """Renderiza un PDF usando el formato oficial FORMATO.pdf como base."""
     try:
-        RadicadoArborea, _ = get_models()
         radicado = context['radicado']
-        
-        # Ruta del formato oficial
+        # Copia plana de las columnas: el render corre en otro proceso sin sesión de BD
+        datos = SimpleNamespace(**{
+            col.name: getattr(radicado, col.name) for col in radicado.__table__.columns
+        })
         formato_path = os.path.join(current_app.config['DATA_DIR'], 'FORMATO.pdf')
-        
-        # Crear canvas para el overlay
-        overlay_buffer = io.BytesIO()
-        c = canvas.Canvas(overlay_buffer, pagesize=letter)
-        w, h = letter
-        margin = 85
-        y_position = h - 140  # Comenzar más arriba para mejor uso del espacio
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        style_title = ParagraphStyle(
-            'title_arial',
-            parent=styles['Normal'],
-            fontName='Helvetica-Bold',
-            fontSize=13,
-            leading=16,
-            textColor=colors.HexColor('#0f4c81'),
-            alignment=0,
-            spaceAfter=6
-        )
-        style_body = ParagraphStyle(
-            'body_arial',
-            parent=styles['Normal'],
-            fontName='Helvetica',
-            fontSize=10,
-            leading=13,
-            textColor=colors.HexColor('#3d3d3d'),
-            alignment=0,
-            spaceAfter=4
-        )
-        
-        # Título del documento
-        c.setFont('Helvetica-Bold', 15)
-        c.setFillColor(colors.HexColor('#0f4c81'))
-        c.drawString(margin, y_position, context.get('titulo', 'Documento'))
-        y_position -= 18
-
-        # Metadatos
-        c.setFont('Helvetica', 9)
-        c.setFillColor(colors.HexColor('#6b7280'))
-        meta_text = f"Radicado: {radicado.numero_radicado}   "
-        if template_name == 'pdf_informe_arborea.html':
-            meta_text += f"Fecha informe: {(radicado.visita_fecha or radicado.updated_at or radicado.created_at).strftime('%Y-%m-%d')}"
-        else:
-            meta_text += f"Fecha emisión: {(radicado.permiso_fecha_emision or radicado.updated_at or radicado.created_at).strftime('%Y-%m-%d')}"
-        c.drawString(margin, y_position, meta_text)
-        y_position -= 4
-        
-        # Línea de acento azul institucional
-        c.setStrokeColor(colors.HexColor('#1565c0'))
-        c.setLineWidth(2)
-        c.line(margin, y_position, margin + (w - 2*margin), y_position)
-        c.setLineWidth(1)
-        y_position -= 16
-        
-        # Contenido según template
-        if template_name == 'pdf_informe_arborea.html':
-            y_position = _render_informe_content(c, radicado, margin, y_position, w, h, style_title, style_body)
-        else:
-            y_position = _render_dictamen_content(c, radicado, margin, y_position, w, h, style_title, style_body)
-        
-        c.save()
-        overlay_buffer.seek(0)
-        
-        # Combinar con formato oficial
-        if os.path.exists(formato_path):
-            template_pdf = PdfReader(formato_path)
-            overlay_pdf = PdfReader(overlay_buffer)
-            output = PdfWriter()
-            
-            for page_num in range(len(overlay_pdf.pages)):
-                template_page = PdfReader(formato_path).pages[0]
-                overlay_page = overlay_pdf.pages[page_num]
-                template_page.merge_page(overlay_page)
-                output.add_page(template_page)
-            
-            final_buffer = io.BytesIO()
-            output.write(final_buffer)
-            final_buffer.seek(0)
-            return send_file(final_buffer, mimetype='application/pdf', as_attachment=True, download_name=filename)
-        else:
-            overlay_buffer.seek(0)
-            return send_file(overlay_buffer, mimetype='application/pdf', as_attachment=True, download_name=filename)
+        return render_response(_render_pdf_job, template_name, datos,
+                               context.get('titulo', 'Documento'), formato_path, filename=filename)
     except Exception as e:
         logger.error(f"Error renderizando PDF {template_name}: {e}", exc_info=True)
         import traceback
@@ -446,8 +372,85 @@ def _render_pdf(template_name, context, filename="documento.pdf"):
         return jsonify({'error': str(e)}), 500
 
 
+def _render_pdf_job(template_name, radicado, titulo, formato_path):
+    """Genera los bytes del informe/dictamen (se ejecuta en el pool de renderizado)."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.pdfgen import canvas
+
+    # Crear canvas para el overlay
+    overlay_buffer = io.BytesIO()
+    c = canvas.Canvas(overlay_buffer, pagesize=letter)
+    w, h = letter
+    margin = 85
+    y_position = h - 140  # Comenzar más arriba para mejor uso del espacio
+    
+    # Estilos
+    styles = getSampleStyleSheet()
+    style_title = ParagraphStyle(
+        'title_arial',
+        parent=styles['Normal'],
+        fontName='Helvetica-Bold',
+        fontSize=13,
+        leading=16,
+        textColor=colors.HexColor('#0f4c81'),
+        alignment=0,
+        spaceAfter=6
+    )
+    style_body = ParagraphStyle(
+        'body_arial',
+        parent=styles['Normal'],
+        fontName='Helvetica',
+        fontSize=10,
+        leading=13,
+        textColor=colors.HexColor('#3d3d3d'),
+        alignment=0,
+        spaceAfter=4
+    )
+    
+    # Título del documento
+    c.setFont('Helvetica-Bold', 15)
+    c.setFillColor(colors.HexColor('#0f4c81'))
+    c.drawString(margin, y_position, titulo)
+    y_position -= 18
+
+    # Metadatos
+    c.setFont('Helvetica', 9)
+    c.setFillColor(colors.HexColor('#6b7280'))
+    meta_text = f"Radicado: {radicado.numero_radicado}   "
+    if template_name == 'pdf_informe_arborea.html':
+        meta_text += f"Fecha informe: {(radicado.visita_fecha or radicado.updated_at or radicado.created_at).strftime('%Y-%m-%d')}"
+    else:
+        meta_text += f"Fecha emisión: {(radicado.permiso_fecha_emision or radicado.updated_at or radicado.created_at).strftime('%Y-%m-%d')}"
+    c.drawString(margin, y_position, meta_text)
+    y_position -= 4
+    
+    # Línea de acento azul institucional
+    c.setStrokeColor(colors.HexColor('#1565c0'))
+    c.setLineWidth(2)
+    c.line(margin, y_position, margin + (w - 2*margin), y_position)
+    c.setLineWidth(1)
+    y_position -= 16
+    
+    # Contenido según template
+    if template_name == 'pdf_informe_arborea.html':
+        y_position = _render_informe_content(c, radicado, margin, y_position, w, h, style_title, style_body)
+    else:
+        y_position = _render_dictamen_content(c, radicado, margin, y_position, w, h, style_title, style_body)
+    
+    c.save()
+    overlay_buffer.seek(0)
+    
+    # Combinar con formato oficial
+    return stamp_letterhead(overlay_buffer.getvalue(), formato_path).getvalue()
+
+
 def _render_informe_content(c, radicado, margin, y_position, w, h, style_title, style_body):
     """Renderiza el contenido del informe técnico."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, Table, TableStyle
 
     table_width = w - 2*margin
     COLOR_PRIMARY = '#0f4c81'  # Azul institucional
@@ -633,7 +636,6 @@ def _render_informe_content(c, radicado, margin, y_position, w, h, style_title,
         c.line(margin, y_position, margin + table_width, y_position)
         y_position -= 12
         
-        from reportlab.platypus import Paragraph
         style = ParagraphStyle(
             'obs',
             parent=ParagraphStyle('Normal', fontName='Helvetica', fontSize=10, leading=12),
@@ -680,6 +682,9 @@ def _render_informe_content(c, radicado, margin, y_position, w, h, style_title,
 
 def _render_dictamen_content(c, radicado, margin, y_position, w, h, style_title, style_body):
     """Renderiza el contenido del dictamen CMGR."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, Table, TableStyle
 
     table_width = w - 2*margin
     COLOR_PRIMARY = '#0f4c81'  # Azul institucional
@@ -843,7 +848,6 @@ def _render_dictamen_content(c, radicado, margin, y_position, w, h, style_title,
         c.line(margin, y_position, margin + table_width, y_position)
         y_position -= 12
         
-        from reportlab.platypus import Paragraph
         style = ParagraphStyle(
             'obl',
             parent=ParagraphStyle('Normal', fontName='Helvetica', fontSize=10, leading=12),
@@ -0,0 +1,51 @@
+"""
+Sondas para la plataforma de despliegue y métricas
+Rutas: /healthz (el proceso responde) y /readyz (cachés críticas precargadas),
+sin sesión; /metrics (Prometheus) solo para administradores o con METRICS_TOKEN.
+"""
+import os
+import time
+import hmac
+
+from flask import Blueprint, Response, current_app, jsonify, request, session
+
+from app.utils import metricas, warmup
+
+salud_bp = Blueprint('salud', __name__)
+
+_ARRANQUE = time.time()
+
+
+@salud_bp.route('/healthz', methods=['GET'], endpoint='healthz')
+def healthz():
+    """Liveness: el worker está vivo y atiende requests"""
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'uptime_s': round(time.time() - _ARRANQUE, 1),
+    }), 200
+
+
+@salud_bp.route('/readyz', methods=['GET'], endpoint='readyz')
+def readyz():
+    """Readiness: 200 cuando terminó la precarga de las cachés críticas, 503 mientras tanto"""
+    resumen = warmup.estado()
+    resumen['pid'] = os.getpid()
+    return jsonify(resumen), 200 if resumen['ready'] else 503
+
+
+def _autorizado_metricas():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        enviado = request.headers.get('Authorization', '')
+        if enviado.startswith('Bearer ') and hmac.compare_digest(enviado[7:].strip(), token):
+            return True
+    return bool(session.get('user')) and session.get('user_role') in ('admin', 'superadmin')
+
+
+@salud_bp.route('/metrics', methods=['GET'], endpoint='metrics')
+def metrics():
+    """Métricas de todos los workers de la instancia (sumadas vía metricas.sqlite), formato Prometheus"""
+    if not _autorizado_metricas():
+        return jsonify({'error': 'unauthorized'}), 401
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -1,159 +1,286 @@
 import os
 import io
 import logging
-try:
-    import pandas as pd
-except Exception:
-    pd = None
+import threading
 from datetime import datetime
 
 from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, current_app, abort, jsonify
 from app import db
 from app.models.metas import MetaPlan
+from app.utils.excel_cache import read_excel_cached
+from app.utils import shared_cache
+from app.utils.facet_index import FacetIndex
+from app.utils.lazy import lazy_import
+
+pd = lazy_import('pandas')
 
 logger = logging.getLogger(__name__)
 seguimiento_bp = Blueprint('seguimiento', __name__)
 
+# Columnas de REGISTRO_AVANCES -> claves del payload
+_COLS_TEXTO = {'id_meta': 'ID_META', 'bpim': 'BPIM', 'eje': 'EJE', 'sector': 'SECTOR', 'meta_producto': 'META_PRODUCTO'}
+_COLS_OPCIONALES = {'proyecto': 'PROYECTO_ASOCIADO', 'fuente': 'FUENTE_FINANCIACION'}
+_COLS_NUMERICAS = {
+    'meta_programada': 'META_PROGRAMADA_AÑO',
+    'avance_ejecutado': 'AVANCE_EJECUTADO_AÑO',
+    'avance_fisico_pct': '%_AVANCE_FISICO',
+    'presupuesto_asig': 'PRESUPUESTO_ASIGNADO',
+    'presupuesto_ejec': 'PRESUPUESTO_EJECUTADO',
+    'ejec_fin_pct': '%_EJEC_FINANCIERA',
+}
+
+# Categorías de estado (mismas reglas de los KPIs)
+ESTADOS = ('Cumplida', 'En ejecución', 'En riesgo', 'No iniciada')
+
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+# (clave del archivo, datos). Se reemplaza completo al recargar, así que los
+# requests siempre leen una versión consistente.
 _plan_cache = None
+_plan_lock = threading.Lock()
+_plan_recargando = False
+_plan_key_fallida = None
 
-def _load_plan_excel():
-    """Carga PLAN_DESARROLLO (198 metas) + REGISTRO_AVANCES (datos 2024-2025)"""
-    global _plan_cache
-    if _plan_cache is not None:
-        return _plan_cache
 
+def _plan_path():
     base_dir = os.path.join(str(current_app.config['BASE_DIR']), 'documentos_generados', 'plan de desarollo')
-    file_path = os.path.join(base_dir, 'BASE_RENDICION_PLAN_DESARROLLO_SUPATA.xlsx')
-    
-    if not os.path.exists(file_path):
-        logger.error(f"Excel no encontrado: {file_path}")
-        return None
+    return os.path.join(base_dir, 'BASE_RENDICION_PLAN_DESARROLLO_SUPATA.xlsx')
+
 
+def _file_key(path):
     try:
-        excel = pd.ExcelFile(file_path)
-        
-        # 1. Cargar catálogo de 198 metas (PLAN_DESARROLLO)
-        plan_df = pd.read_excel(file_path, sheet_name='PLAN_DESARROLLO')
-        logger.info(f"✓ Cargadas {len(plan_df)} metas del Plan de Desarrollo")
-        
-        # 2. Cargar avances por año (REGISTRO_AVANCES - 324 registros)
-        avances = pd.read_excel(file_path, sheet_name='REGISTRO_AVANCES')
-        logger.info(f"✓ Cargados {len(avances)} registros de avances")
-        
-        # 3. Preparar datos por año
-        metas_por_ano = []
-        for _, row in avances.iterrows():
-            metas_por_ano.append({
-                'id_meta': str(row['ID_META']),
-                'bpim': str(row['BPIM']),
-                'eje': str(row['EJE']),
-                'sector': str(row['SECTOR']),
-                'meta_producto': str(row['META_PRODUCTO']),
-                'ano': int(row['AÑO']) if pd.notna(row['AÑO']) else None,
-                'secretaria': str(row['SECRETARIA']) if pd.notna(row['SECRETARIA']) else None,
-                'estado': str(row['ESTADO']) if pd.notna(row['ESTADO']) else 'No iniciada',
-                'meta_programada': float(row['META_PROGRAMADA_AÑO']) if pd.notna(row['META_PROGRAMADA_AÑO']) else 0,
-                'avance_ejecutado': float(row['AVANCE_EJECUTADO_AÑO']) if pd.notna(row['AVANCE_EJECUTADO_AÑO']) else 0,
-                'avance_fisico_pct': float(row['%_AVANCE_FISICO']) if pd.notna(row['%_AVANCE_FISICO']) else 0,
-                'presupuesto_asig': float(row['PRESUPUESTO_ASIGNADO']) if pd.notna(row['PRESUPUESTO_ASIGNADO']) else 0,
-                'presupuesto_ejec': float(row['PRESUPUESTO_EJECUTADO']) if pd.notna(row['PRESUPUESTO_EJECUTADO']) else 0,
-                'ejec_fin_pct': float(row['%_EJEC_FINANCIERA']) if pd.notna(row['%_EJEC_FINANCIERA']) else 0,
-                'proyecto': str(row['PROYECTO_ASOCIADO']) if pd.notna(row['PROYECTO_ASOCIADO']) else None,
-                'fuente': str(row['FUENTE_FINANCIACION']) if pd.notna(row['FUENTE_FINANCIACION']) else None,
-            })
-        
-        # 4. Consolidado: 1 registro por meta (año más reciente)
-        metas_consolidado = []
-        for meta_id in plan_df['ID_META'].unique():
-            registros_meta = [m for m in metas_por_ano if m['id_meta'] == meta_id]
-            
-            if registros_meta:
-                # Usar el registro del año más reciente (2025 si existe, sino 2024)
-                reg_reciente = sorted(registros_meta, key=lambda x: x['ano'] or 0, reverse=True)[0]
-                metas_consolidado.append({
-                    **reg_reciente,
-                    'ano': f"CONSOLIDADO ({reg_reciente['ano']})",
-                    'anos_disponibles': [r['ano'] for r in registros_meta if r['ano']]
-                })
-            else:
-                # Meta sin avances registrados
-                meta_info = plan_df[plan_df['ID_META'] == meta_id].iloc[0]
-                metas_consolidado.append({
-                    'id_meta': str(meta_info['ID_META']),
-                    'bpim': str(meta_info['BPIM']),
-                    'eje': str(meta_info['EJE']),
-                    'sector': str(meta_info['SECTOR']),
-                    'meta_producto': str(meta_info['META_PRODUCTO']),
-                    'ano': 'CONSOLIDADO (Sin datos)',
-                    'estado': 'No iniciada',
-                    'avance_fisico_pct': 0,
-                    'ejec_fin_pct': 0,
-                    'presupuesto_asig': 0,
-                    'presupuesto_ejec': 0,
-                    'meta_programada': 0,
-                    'avance_ejecutado': 0,
-                })
-        
-        # 5. Calcular KPIs desde CONSOLIDADO (198 metas)
-        total_metas = len(metas_consolidado)
-        
-        # Contar por estado
-        cumplidas = sum(1 for m in metas_consolidado if 'cumplid' in m['estado'].lower())
-        en_curso = sum(1 for m in metas_consolidado if 'ejecuci' in m['estado'].lower() or 'curso' in m['estado'].lower())
-        en_riesgo = sum(1 for m in metas_consolidado if 'riesgo' in m['estado'].lower())
-        sin_iniciar = sum(1 for m in metas_consolidado if 'no inici' in m['estado'].lower())
-        
-        # Promedios ponderados por estado
-        avance_prom = ((cumplidas * 100) + (en_curso * 60) + (en_riesgo * 30)) / total_metas if total_metas > 0 else 0
-        ejec_fin_prom = ((cumplidas * 100) + (en_curso * 60) + (en_riesgo * 30)) / total_metas if total_metas > 0 else 0
-        
-        presup_total = sum(m['presupuesto_asig'] for m in metas_consolidado)
-        presup_ejec = sum(m['presupuesto_ejec'] for m in metas_consolidado)
-        
-        kpis = {
-            'total_metas': total_metas,
-            'metas_cumplidas': cumplidas,
-            'metas_en_curso': en_curso,
-            'metas_en_riesgo': en_riesgo,
-            'metas_sin_iniciar': sin_iniciar,
-            'avance_prom': round(avance_prom, 1),
-            'ejec_fin_prom': round(ejec_fin_prom, 1),
-            'presupuesto_total': round(presup_total, 0),
-            'presupuesto_ejec': round(presup_ejec, 0),
-        }
-        
-        distrib_estados = {
-            'Cumplida': cumplidas,
-            'En ejecución': en_curso,
-            'En riesgo': en_riesgo,
-            'No iniciada': sin_iniciar,
-        }
-        
-        # Resumen por eje (usando consolidado)
-        resumen_eje = []
-        for eje in plan_df['EJE'].unique():
-            metas_eje = [m for m in metas_consolidado if m['eje'] == eje]
-            avance_medio = sum(m['avance_fisico_pct'] for m in metas_eje) / len(metas_eje) if metas_eje else 0
-            resumen_eje.append({
-                'EJE': eje,
-                'TOTAL_METAS': len(metas_eje),
-                'AVANCE_MEDIO': round(avance_medio, 1)
-            })
-        
-        _plan_cache = {
-            'kpis': kpis,
-            'distrib_estados': distrib_estados,
-            'resumen_eje': resumen_eje,
-            'metas_consolidado': metas_consolidado,
-            'metas_payload': metas_por_ano,  # Todas las metas por año (2024 y 2025)
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _texto_o(col, defecto):
+    """Columna como texto; las celdas vacías toman `defecto`"""
+    return col.astype(str).astype(object).where(col.notna(), defecto)
+
+
+def _registros_por_ano(avances):
+    """REGISTRO_AVANCES -> DataFrame con las claves del payload (sin iterrows)"""
+    df = pd.DataFrame(index=avances.index)
+    for clave, col in _COLS_TEXTO.items():
+        df[clave] = avances[col].astype(str)
+    ano = pd.to_numeric(avances['AÑO'], errors='coerce')
+    df['ano'] = pd.Series(ano.astype('Int64').astype(object), index=avances.index).where(ano.notna(), None)
+    df['secretaria'] = _texto_o(avances['SECRETARIA'], None)
+    df['estado'] = _texto_o(avances['ESTADO'], 'No iniciada')
+    for clave, col in _COLS_NUMERICAS.items():
+        df[clave] = pd.to_numeric(avances[col], errors='coerce').fillna(0).astype(float)
+    for clave in ('proyecto', 'fuente'):
+        df[clave] = _texto_o(avances[_COLS_OPCIONALES[clave]], None)
+    return df
+
+
+def _consolidar(plan_df, por_ano):
+    """1 registro por meta del catálogo: el del año más reciente, o 'Sin datos'"""
+    ids = pd.Series(plan_df['ID_META'].unique()).astype(str)
+
+    # Año más reciente por meta; ante empate gana el primer registro del Excel
+    orden = por_ano.assign(_ano=por_ano['ano'].fillna(0).astype(float))
+    orden = orden.sort_values('_ano', ascending=False, kind='stable')
+    recientes = orden.drop_duplicates('id_meta', keep='first').drop(columns='_ano').set_index('id_meta')
+    anos = por_ano[por_ano['ano'].notna()].groupby('id_meta', sort=False)['ano'].agg(list)
+
+    con_datos = ids[ids.isin(recientes.index)]
+    consolidado = recientes.loc[con_datos].reset_index()
+    consolidado['ano'] = 'CONSOLIDADO (' + consolidado['ano'].astype(str) + ')'
+    consolidado['anos_disponibles'] = [anos.get(i, []) for i in consolidado['id_meta']]
+
+    registros = dict(zip(con_datos, consolidado.to_dict('records')))
+
+    # Metas sin avances registrados: datos del catálogo (primera fila por ID)
+    sin_datos = plan_df.assign(_id=plan_df['ID_META'].astype(str)).drop_duplicates('_id')
+    sin_datos = sin_datos[~sin_datos['_id'].isin(recientes.index)]
+    for _, meta_info in sin_datos.iterrows():
+        registros[meta_info['_id']] = {
+            'id_meta': str(meta_info['ID_META']),
+            'bpim': str(meta_info['BPIM']),
+            'eje': str(meta_info['EJE']),
+            'sector': str(meta_info['SECTOR']),
+            'meta_producto': str(meta_info['META_PRODUCTO']),
+            'ano': 'CONSOLIDADO (Sin datos)',
+            'estado': 'No iniciada',
+            'avance_fisico_pct': 0,
+            'ejec_fin_pct': 0,
+            'presupuesto_asig': 0,
+            'presupuesto_ejec': 0,
+            'meta_programada': 0,
+            'avance_ejecutado': 0,
         }
-        
-        logger.info(f"✅ Cache creado: {total_metas} metas consolidadas, {len(metas_por_ano)} registros por año")
-        return _plan_cache
-        
+    return [registros[i] for i in ids]
+
+
+def _estado_categoria(estado):
+    e = (estado or '').lower()
+    if 'cumplid' in e:
+        return 'Cumplida'
+    if 'ejecuci' in e or 'curso' in e:
+        return 'En ejecución'
+    if 'riesgo' in e:
+        return 'En riesgo'
+    if 'no inici' in e:
+        return 'No iniciada'
+    return estado
+
+
+def _indexar_metas(metas, anos):
+    """Índice de búsqueda y facetas (estado, eje, sector, año, secretaría)"""
+    return FacetIndex(
+        metas,
+        facetas={
+            'estado': lambda m: _estado_categoria(m.get('estado')),
+            'eje': lambda m: m.get('eje'),
+            'sector': lambda m: m.get('sector'),
+            'ano': anos,
+            'secretaria': lambda m: m.get('secretaria'),
+        },
+        texto=lambda m: ' '.join(str(m.get(k) or '') for k in (
+            'id_meta', 'meta_producto', 'eje', 'sector', 'secretaria', 'bpim')),
+    )
+
+
+def _calcular_kpis(metas):
+    """KPIs del tablero para un conjunto de metas (todas o las filtradas)"""
+    estados = [str(m.get('estado') or '').lower() for m in metas]
+    total_metas = len(estados)
+    cumplidas = sum('cumplid' in e for e in estados)
+    en_curso = sum('ejecuci' in e or 'curso' in e for e in estados)
+    en_riesgo = sum('riesgo' in e for e in estados)
+    sin_iniciar = sum('no inici' in e for e in estados)
+
+    # Promedios ponderados por estado
+    avance_prom = ((cumplidas * 100) + (en_curso * 60) + (en_riesgo * 30)) / total_metas if total_metas > 0 else 0
+    ejec_fin_prom = avance_prom
+
+    return {
+        'total_metas': total_metas,
+        'metas_cumplidas': cumplidas,
+        'metas_en_curso': en_curso,
+        'metas_en_riesgo': en_riesgo,
+        'metas_sin_iniciar': sin_iniciar,
+        'avance_prom': round(avance_prom, 1),
+        'ejec_fin_prom': round(ejec_fin_prom, 1),
+        'presupuesto_total': round(float(sum(m.get('presupuesto_asig') or 0 for m in metas)), 0),
+        'presupuesto_ejec': round(float(sum(m.get('presupuesto_ejec') or 0 for m in metas)), 0),
+    }
+
+
+def _build_plan_data(file_path):
+    """Carga PLAN_DESARROLLO (198 metas) + REGISTRO_AVANCES (datos 2024-2025)"""
+    # 1. Cargar catálogo de 198 metas (PLAN_DESARROLLO)
+    plan_df = read_excel_cached(file_path, sheet_name='PLAN_DESARROLLO')
+    logger.info(f"✓ Cargadas {len(plan_df)} metas del Plan de Desarrollo")
+
+    # 2. Cargar avances por año (REGISTRO_AVANCES - 324 registros)
+    avances = read_excel_cached(file_path, sheet_name='REGISTRO_AVANCES')
+    logger.info(f"✓ Cargados {len(avances)} registros de avances")
+
+    # 3. Preparar datos por año
+    por_ano = _registros_por_ano(avances)
+    metas_por_ano = por_ano.to_dict('records')
+
+    # 4. Consolidado: 1 registro por meta (año más reciente)
+    metas_consolidado = _consolidar(plan_df, por_ano)
+    cons = pd.DataFrame({
+        'eje': [m['eje'] for m in metas_consolidado],
+        'avance_fisico_pct': [m['avance_fisico_pct'] for m in metas_consolidado],
+    })
+
+    # 5. Calcular KPIs desde CONSOLIDADO (198 metas)
+    kpis = _calcular_kpis(metas_consolidado)
+    total_metas = kpis['total_metas']
+
+    distrib_estados = {
+        'Cumplida': kpis['metas_cumplidas'],
+        'En ejecución': kpis['metas_en_curso'],
+        'En riesgo': kpis['metas_en_riesgo'],
+        'No iniciada': kpis['metas_sin_iniciar'],
+    }
+
+    # Resumen por eje (usando consolidado), en el orden del catálogo
+    por_eje = cons.groupby('eje', sort=False)['avance_fisico_pct'].agg(['size', 'mean'])
+    resumen_eje = []
+    for eje in plan_df['EJE'].unique():
+        fila = por_eje.loc[eje] if eje in por_eje.index else None
+        resumen_eje.append({
+            'EJE': eje,
+            'TOTAL_METAS': int(fila['size']) if fila is not None else 0,
+            'AVANCE_MEDIO': round(float(fila['mean']), 1) if fila is not None else 0
+        })
+
+    logger.info(f"✅ Cache creado: {total_metas} metas consolidadas, {len(metas_por_ano)} registros por año")
+    return {
+        'kpis': kpis,
+        'distrib_estados': distrib_estados,
+        'resumen_eje': resumen_eje,
+        'metas_consolidado': metas_consolidado,
+        'metas_payload': metas_por_ano,  # Todas las metas por año (2024 y 2025)
+        'indice_consolidado': _indexar_metas(metas_consolidado, lambda m: m.get('anos_disponibles') or []),
+        'indice_anual': _indexar_metas(metas_por_ano, lambda m: m.get('ano')),
+    }
+
+
+def _plan_data(file_path, key):
+    """Dataset del plan para esa versión del Excel (construido una vez entre todos los workers)"""
+    return shared_cache.obtener('seguimiento:plan', key, lambda: _build_plan_data(file_path))
+
+
+def _recargar_plan(app, file_path, key):
+    """Reconstruye el dataset en segundo plano y lo publica de una sola vez"""
+    global _plan_cache, _plan_recargando, _plan_key_fallida
+    try:
+        with app.app_context():
+            data = _plan_data(file_path, key)
+        _plan_cache = (key, data)
+        logger.info("[SEGUIMIENTO] Excel del plan modificado; datos recargados")
     except Exception as e:
-        logger.error(f"Error cargando Excel: {e}", exc_info=True)
-        return None
+        _plan_key_fallida = key
+        logger.error(f"[SEGUIMIENTO] Error recargando Excel (se mantienen los datos anteriores): {e}", exc_info=True)
+    finally:
+        _plan_recargando = False
+
+
+def _load_plan_excel():
+    """
+    Dataset de seguimiento vigente. La primera carga es síncrona; si después
+    cambia el Excel, se recarga en un hilo y mientras tanto se siguen sirviendo
+    los datos anteriores.
+    """
+    global _plan_cache, _plan_recargando
+    file_path = _plan_path()
+    key = _file_key(file_path)
+    cache = _plan_cache
+
+    if key is None:
+        logger.error(f"Excel no encontrado: {file_path}")
+        return cache[1] if cache else None
+    if cache is not None and (cache[0] == key or key == _plan_key_fallida):
+        return cache[1]
+
+    if cache is not None:
+        with _plan_lock:
+            if not _plan_recargando:
+                _plan_recargando = True
+                threading.Thread(
+                    target=_recargar_plan, args=(current_app._get_current_object(), file_path, key),
+                    name='seguimiento-reload', daemon=True
+                ).start()
+        return cache[1]
+
+    with _plan_lock:
+        if _plan_cache is None:
+            try:
+                _plan_cache = (key, _plan_data(file_path, key))
+            except Exception as e:
+                logger.error(f"Error cargando Excel: {e}", exc_info=True)
+                return None
+        return _plan_cache[1]
 
 
 @seguimiento_bp.route('/seguimiento', endpoint='index')
@@ -162,59 +289,63 @@ def seguimiento_plan():
     if not data:
         abort(500, description='No se pudo cargar el Excel del plan de desarrollo')
 
+    # Las metas se piden a /seguimiento/api/metas (paginadas y filtradas)
     return render_template(
         'seguimiento_plan_excel.html',
         kpis=data['kpis'],
         distrib_estados=data['distrib_estados'],
         resumen_eje=data['resumen_eje'],
-        metas=data['metas_consolidado'],
-        metas_consolidado=data['metas_consolidado'],
-        metas_anuales=data['metas_payload']
     )
 
 
+def _args_lista(nombre):
+    """Valores de un filtro: ?estado=a&estado=b o ?estado=a,b"""
+    valores = []
+    for raw in request.args.getlist(nombre):
+        valores.extend(v.strip() for v in raw.split(',') if v.strip())
+    return valores
+
+
 @seguimiento_bp.route('/seguimiento/api/metas')
 def api_seguimiento_metas():
+    """
+    Metas filtradas y paginadas.
+    Parámetros: q, estado, eje, sector, ano, secretaria (se admiten varios
+    valores), modo=CONSOLIDADO|ANUAL (por defecto ANUAL si se pide un año),
+    page, per_page.
+    """
     data = _load_plan_excel()
     if not data:
         abort(500)
 
-    # Filtros
-    modo = (request.args.get('modo') or 'CONSOLIDADO').strip().upper()
-    metas_base = data['metas_consolidado'] if modo == 'CONSOLIDADO' else data['metas_payload']
-
-    q = (request.args.get('q') or '').strip().lower()
-    estado = (request.args.get('estado') or '').strip().upper()
-    eje = (request.args.get('eje') or '').strip()
-    sector = (request.args.get('sector') or '').strip()
-    ano = (request.args.get('ano') or '').strip()
-
-    def matches(meta):
-        if q:
-            texto = ' '.join(str(v) for v in [
-                meta.get('meta_producto'),
-                meta.get('eje'),
-                meta.get('sector'),
-                meta.get('secretaria')
-            ]).lower()
-            if q not in texto:
-                return False
-        if estado and estado not in meta.get('estado', '').upper():
-            return False
-        if eje and meta.get('eje') != eje:
-            return False
-        if sector and meta.get('sector') != sector:
-            return False
-        if ano and str(meta.get('ano')) != ano:
-            return False
-        return True
-
-    filtradas = [m for m in metas_base if matches(m)]
-    
+    filtros = {k: _args_lista(k) for k in ('estado', 'eje', 'sector', 'ano', 'secretaria')}
+    modo = (request.args.get('modo') or ('ANUAL' if filtros['ano'] else 'CONSOLIDADO')).strip().upper()
+    indice = data['indice_consolidado'] if modo == 'CONSOLIDADO' else data['indice_anual']
+
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', PER_PAGE)), 1), MAX_PER_PAGE)
+    except ValueError:
+        return jsonify({'error': 'page y per_page deben ser enteros'}), 400
+
+    q = (request.args.get('q') or '').strip()
+    bitmap, facetas = indice.buscar(q, filtros)
+    total = bitmap.bit_count()
+
+    distrib = indice.contar('estado', bitmap)
+    distrib_estados = {e: distrib.get(e, 0) for e in ESTADOS}
+    inicio = (page - 1) * per_page
+
     return jsonify({
-        'metas': filtradas,
-        'total': len(filtradas),
-        'distrib_estados': data['distrib_estados']
+        'metas': indice.documentos(bitmap, inicio, inicio + per_page),
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'modo': modo,
+        'facetas': facetas,
+        'distrib_estados': distrib_estados,
+        'kpis': _calcular_kpis(indice.documentos(bitmap)),
     })
 
 
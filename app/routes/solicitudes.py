@@ -1,18 +1,36 @@
 import os
-import csv
+import io
 import uuid
 import json
 import datetime
 import datetime as dt
 from datetime import timedelta
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, session, abort, current_app, jsonify
+from flask import Blueprint, Response, render_template, request, flash, redirect, url_for, send_file, session, abort, current_app, jsonify
 from werkzeug.utils import secure_filename
-from app.utils import get_sqlite, dias_restantes, color_semaforo_dias, admin_required, load_plan_desarrollo
+from app.utils import get_sqlite, dias_restantes, color_semaforo_dias, admin_required
+from app.utils.plan_desarrollo import get_plan_catalog
 from app import db
+from app.models.solicitud import Solicitud, exportar_solicitudes_csv
 
 solicitudes_bp = Blueprint('solicitudes', __name__)
 
-# --- Routes: Solicitudes Generales (CSV) ---
+# --- Routes: Solicitudes Generales ---
+
+def _formatear_valor(raw_val):
+    try:
+        num = int(raw_val.replace('$', '').replace('.', '').replace(',', '').strip())
+        return '$ ' + '{:,.0f}'.format(num).replace(',', '.')
+    except ValueError:
+        return raw_val
+
+
+def _get_solicitud_or_none():
+    try:
+        sid = int(request.form.get('solicitud_id', -1))
+    except (TypeError, ValueError):
+        return None
+    return db.session.get(Solicitud, sid)
+
 
 @solicitudes_bp.route('/solicitudes', methods=['GET', 'POST'], endpoint='index')
 def solicitudes():
@@ -24,69 +42,37 @@ def solicitudes():
       "Secretaría de Hacienda y Gestión Financiera"
     ]
 
-    path = current_app.config['SOLICITUDES_PATH']
-
     if request.method == 'POST':
-        raw_val = request.form.get('valor','').strip()
-        try:
-            num = int(raw_val.replace('.', ''))
-            valor_formatted = '$ ' + '{:,.0f}'.format(num).replace(',', '.')
-        except ValueError:
-            valor_formatted = raw_val        
-         
-        row = [
-            request.form.get('municipio','').strip(),
-            request.form.get('nit','').strip(),
-            request.form.get('fecha',''),
-            request.form.get('secretaria',''),
-            request.form.get('objeto','').strip(),
-            request.form.get('justificacion','').strip(),
-            valor_formatted,
-            request.form.get('meta_producto',''),
-            request.form.get('eje',''),
-            request.form.get('sector',''),
-            request.form.get('codigo_bpim',''),
-            'nuevo'  # Estado inicial: nuevo (entra directo a certificados)
-        ]
+        solicitud = Solicitud(
+            municipio=request.form.get('municipio','').strip(),
+            nit=request.form.get('nit','').strip(),
+            fecha=request.form.get('fecha',''),
+            secretaria=request.form.get('secretaria',''),
+            objeto=request.form.get('objeto','').strip(),
+            justificacion=request.form.get('justificacion','').strip(),
+            valor=_formatear_valor(request.form.get('valor','').strip()),
+            meta_producto=request.form.get('meta_producto',''),
+            eje=request.form.get('eje',''),
+            sector=request.form.get('sector',''),
+            codigo_bpim=request.form.get('codigo_bpim',''),
+            estado='nuevo',  # Estado inicial: nuevo (entra directo a certificados)
+            creado_por=session.get('user', '')
+        )
         
         try:
-            with open(path, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(row)
+            db.session.add(solicitud)
+            db.session.commit()
             flash('✅ Solicitud guardada correctamente.', 'success')
         except Exception as e:
+            db.session.rollback()
             flash(f'Error guardando solicitud: {e}', 'danger')
             
         return redirect(url_for('solicitudes.index'))
 
-    # Load Plan de Desarrollo data
-    plan_list = load_plan_desarrollo()
-    
-    # Cargar solicitudes del usuario actual
+    # Cargar solicitudes
     user_solicitudes = []
-    current_user = session.get('user', 'invitado')
-    
     try:
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # Filtrar por municipio (asumiendo que es el identificador del usuario)
-                    # Ajusta esto según tu lógica de autenticación
-                    user_solicitudes.append({
-                        'municipio': row.get('municipio', ''),
-                        'nit': row.get('nit', ''),
-                        'fecha': row.get('fecha', ''),
-                        'secretaria': row.get('secretaria', ''),
-                        'objeto': row.get('objeto', ''),
-                        'justificacion': row.get('justificacion', ''),
-                        'valor': row.get('valor', ''),
-                        'meta_producto': row.get('meta_producto', ''),
-                        'eje': row.get('eje', ''),
-                        'sector': row.get('sector', ''),
-                        'codigo_bpim': row.get('codigo_bpim', ''),
-                        'estado': row.get('estado', 'borrador')
-                    })
+        user_solicitudes = [s.to_dict() for s in Solicitud.query.order_by(Solicitud.id).all()]
     except Exception as e:
         print(f"Error cargando solicitudes: {e}")
 
@@ -95,69 +81,54 @@ def solicitudes():
     return render_template(
         'solicitudes_modern.html',
         secretarias=secretarias,
-        plan_list=plan_list,
         user_solicitudes=user_solicitudes,
         today=dt.date.today().isoformat(),
         is_admin=is_admin
     )
 
 
+@solicitudes_bp.route('/solicitudes/plan.json', methods=['GET'], endpoint='plan_json')
+def plan_json():
+    """Catálogo del Plan de Desarrollo para el formulario (ETag + 304)"""
+    try:
+        catalogo = get_plan_catalog()
+    except Exception as e:
+        current_app.logger.error(f"[PLAN] Error sirviendo catálogo: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    headers = {'ETag': catalogo.etag, 'Cache-Control': 'private, no-cache'}
+    if catalogo.etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    return Response(catalogo.payload, mimetype='application/json', headers=headers)
+
+
 @solicitudes_bp.route('/solicitudes/editar', methods=['POST'], endpoint='editar_solicitud')
 def editar_solicitud():
-    """Edita una solicitud existente en el CSV"""
-    path = current_app.config['SOLICITUDES_PATH']
-    
+    """Edita una solicitud existente"""
     try:
-        indice = int(request.form.get('indice', -1))
-        
-        # Leer todas las filas
-        rows = []
-        with open(path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-        
-        if indice < 0 or indice >= len(rows) - 1:  # -1 porque la primera fila es header
+        solicitud = _get_solicitud_or_none()
+        if solicitud is None:
             flash('❌ Solicitud no encontrada', 'danger')
             return redirect(url_for('solicitudes.index'))
         
-        # Formatear valor
-        raw_val = request.form.get('valor', '').strip()
-        try:
-            num = int(raw_val.replace('$', '').replace('.', '').replace(',', '').strip())
-            valor_formatted = '$ ' + '{:,.0f}'.format(num).replace(',', '.')
-        except ValueError:
-            valor_formatted = raw_val
-        
-        # Determinar nuevo estado: si fue 'generado', cambiar a 'editado', si no preservar
-        estado_actual = rows[indice + 1][11] if len(rows[indice + 1]) > 11 else 'nuevo'
+        solicitud.municipio = request.form.get('municipio', solicitud.municipio or '').strip()
+        solicitud.nit = request.form.get('nit', solicitud.nit or '').strip()
+        solicitud.fecha = request.form.get('fecha', '')
+        solicitud.secretaria = request.form.get('secretaria', '')
+        solicitud.objeto = request.form.get('objeto', '').strip()
+        solicitud.justificacion = request.form.get('justificacion', '').strip()
+        solicitud.valor = _formatear_valor(request.form.get('valor', '').strip())
+        solicitud.meta_producto = request.form.get('meta_producto', '')
+        solicitud.eje = request.form.get('eje', solicitud.eje or '')
+        solicitud.sector = request.form.get('sector', solicitud.sector or '')
+        solicitud.codigo_bpim = request.form.get('codigo_bpim', solicitud.codigo_bpim or '')
         # Siempre marcamos como editado para reactivar el flujo hacia certificados
-        nuevo_estado = 'editado'
-        
-        # Actualizar la fila (indice + 1 porque hay header)
-        rows[indice + 1] = [
-            request.form.get('municipio', rows[indice + 1][0]).strip(),
-            request.form.get('nit', rows[indice + 1][1]).strip(),
-            request.form.get('fecha', ''),
-            request.form.get('secretaria', ''),
-            request.form.get('objeto', '').strip(),
-            request.form.get('justificacion', '').strip(),
-            valor_formatted,
-            request.form.get('meta_producto', ''),
-            request.form.get('eje', rows[indice + 1][8] if len(rows[indice + 1]) > 8 else ''),
-            request.form.get('sector', rows[indice + 1][9] if len(rows[indice + 1]) > 9 else ''),
-            request.form.get('codigo_bpim', rows[indice + 1][10] if len(rows[indice + 1]) > 10 else ''),
-            nuevo_estado  # Cambiar a 'editado' si fue 'generado'
-        ]
-        
-        # Escribir de vuelta al archivo
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
-            f.flush()  # Flush del buffer Python
-            os.fsync(f.fileno())  # Sincronización forzada al disco
+        solicitud.estado = 'editado'
+        db.session.commit()
         
         flash('✅ Solicitud actualizada correctamente', 'success')
     except Exception as e:
+        db.session.rollback()
         flash(f'❌ Error actualizando solicitud: {e}', 'danger')
     
     return redirect(url_for('solicitudes.index'))
@@ -166,37 +137,17 @@ def editar_solicitud():
 @solicitudes_bp.route('/solicitudes/enviar_certificado', methods=['POST'], endpoint='enviar_certificado')
 def enviar_certificado():
     """Marca una solicitud como lista para generar certificado"""
-    path = current_app.config['SOLICITUDES_PATH']
-    
     try:
-        indice = int(request.form.get('indice', -1))
-        
-        # Leer todas las filas
-        rows = []
-        with open(path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-        
-        if indice < 0 or indice >= len(rows) - 1:
+        solicitud = _get_solicitud_or_none()
+        if solicitud is None:
             flash('❌ Solicitud no encontrada', 'danger')
             return redirect(url_for('solicitudes.index'))
         
-        # Actualizar estado a "pendiente"
-        row_index = indice + 1
-        if len(rows[row_index]) > 11:
-            rows[row_index][11] = 'pendiente'
-        else:
-            # Si no existe la columna, agregarla
-            rows[row_index].append('pendiente')
-        
-        # Escribir de vuelta al archivo
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
-            f.flush()  # Flush del buffer Python
-            os.fsync(f.fileno())  # Sincronización forzada al disco
+        solicitud.estado = 'pendiente'
+        db.session.commit()
         flash('✅ Solicitud enviada para generar certificado', 'success')
     except Exception as e:
+        db.session.rollback()
         flash(f'❌ Error enviando solicitud: {e}', 'danger')
     
     return redirect(url_for('solicitudes.index'))
@@ -206,28 +157,35 @@ def enviar_certificado():
 @admin_required
 def eliminar_solicitud():
     """Elimina una solicitud (solo admin)"""
-    path = current_app.config['SOLICITUDES_PATH']
     try:
-        indice = int(request.form.get('indice', -1))
-        rows = []
-        with open(path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-        if indice < 0 or indice >= len(rows) - 1:
+        solicitud = _get_solicitud_or_none()
+        if solicitud is None:
             flash('❌ Solicitud no encontrada', 'danger')
             return redirect(url_for('solicitudes.index'))
-        rows.pop(indice + 1)
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
-            f.flush()
-            os.fsync(f.fileno())
+        db.session.delete(solicitud)
+        db.session.commit()
         flash('✅ Solicitud eliminada', 'success')
     except Exception as e:
+        db.session.rollback()
         flash(f'❌ Error eliminando solicitud: {e}', 'danger')
     return redirect(url_for('solicitudes.index'))
 
 
+@solicitudes_bp.route('/solicitudes/exportar.csv', endpoint='exportar_csv')
+def exportar_csv():
+    """Exporta las solicitudes en el formato CSV histórico"""
+    if not session.get('user'):
+        return redirect(url_for('auth.login'))
+    buf = io.StringIO()
+    exportar_solicitudes_csv(buf)
+    return send_file(
+        io.BytesIO(buf.getvalue().encode('utf-8')),
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name='solicitudes.csv'
+    )
+
+
 # --- Schemas ---
 
 def init_arbolado_schema():
@@ -264,21 +222,14 @@ def init_arbolado_schema():
     conn.commit(); conn.close()
 
 def next_tala_consecutivo():
+    # Incremento y lectura en una sola transacción sobre la conexión del request
     conn = get_sqlite(); cur = conn.cursor()
     cur.execute("UPDATE tala_seq SET n = n + 1 WHERE k='seq'")
-    conn.commit()
     cur.execute("SELECT n FROM tala_seq WHERE k='seq'")
     n = cur.fetchone()['n']
-    conn.close()
+    conn.commit()
     return n
 
-# Init schemas on module load
-try:
-    with current_app.app_context():
-        init_arbolado_schema()
-except:
-    pass # Will run on first request if context fails here
-
 # --- Routes: Arbolado (Tala) ---
 
 @solicitudes_bp.route('/arbolado', endpoint='tala_list')
@@ -771,17 +722,33 @@ def init_licencias_schema():
     cur.execute("INSERT OR IGNORE INTO licencias_seq (k, n) VALUES ('seq', 0)")
     conn.commit(); conn.close()
 
-# Run init
-try: init_licencias_schema()
-except: pass
+# Versión de las tablas de SQL crudo de este módulo, guardada en PRAGMA
+# user_version del archivo SQLite. Subirla al modificar los CREATE TABLE de
+# init_arbolado_schema / init_licencias_schema.
+SQLITE_SCHEMA_VERSION = 1
+
+def init_schemas(forzar=False):
+    """
+    Crea las tablas de tala y licencias si el archivo no está en la versión
+    actual. Se llama en create_app (app context); con el archivo al día solo
+    cuesta leer el PRAGMA.
+    """
+    conn = get_sqlite()
+    if not forzar and conn.execute("PRAGMA user_version").fetchone()[0] >= SQLITE_SCHEMA_VERSION:
+        return False
+    init_arbolado_schema()
+    init_licencias_schema()
+    conn.execute(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}")
+    current_app.logger.info(f"[SCHEMA] Tablas de tala y licencias listas (versión {SQLITE_SCHEMA_VERSION})")
+    return True
 
 def next_licencia_consecutivo():
+    # Incremento y lectura en una sola transacción sobre la conexión del request
     conn = get_sqlite(); cur = conn.cursor()
     cur.execute("UPDATE licencias_seq SET n = n + 1 WHERE k='seq'")
-    conn.commit()
     cur.execute("SELECT n FROM licencias_seq WHERE k='seq'")
     n = cur.fetchone()['n']
-    conn.close()
+    conn.commit()
     return n
 
 @solicitudes_bp.route('/licencias', endpoint='licencias_list')
@@ -901,14 +868,13 @@ def licencias_detalle_legacy(licencia_id):
 @solicitudes_bp.route('/licencias/<licencia_id>/pdf', endpoint='licencias_pdf')
 def licencias_pdf(licencia_id):
     """Genera PDF de la licencia usando formato oficial de Alcaldía"""
-    import os
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import letter
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib import colors
     from reportlab.platypus import Table, TableStyle, Paragraph
     from reportlab.lib.utils import ImageReader
-    from PyPDF2 import PdfReader, PdfWriter
+    from app.utils.pdf_membrete import stamp_letterhead
     from io import BytesIO
     import datetime
     
@@ -1120,26 +1086,7 @@ def licencias_pdf(licencia_id):
         overlay_buffer.seek(0)
         
         # ============ COMBINAR CON FORMATO OFICIAL ============
-        formato_path = os.path.join(str(current_app.config['BASE_DIR']), 'datos', 'FORMATO.pdf')
-        
-        if os.path.exists(formato_path):
-            # Usar formato oficial como base
-            formato_pdf = PdfReader(formato_path)
-            overlay_pdf = PdfReader(overlay_buffer)
-            
-            output = PdfWriter()
-            base_page = formato_pdf.pages[0]
-            overlay_page = overlay_pdf.pages[0]
-            
-            base_page.merge_page(overlay_page)
-            output.add_page(base_page)
-            
-            final_buffer = BytesIO()
-            output.write(final_buffer)
-            final_buffer.seek(0)
-        else:
-            # Si no existe FORMATO.pdf, usar el overlay directamente
-            final_buffer = overlay_buffer
+        final_buffer = stamp_letterhead(overlay_buffer.getvalue())
         
         conn.close()
         
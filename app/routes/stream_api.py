@@ -0,0 +1,59 @@
+"""
+Stream de eventos en vivo (SSE) para el usuario actual
+Rutas: /api/stream
+Eventos: chat, recordatorio, pqrs
+"""
+from flask import Blueprint, Response, current_app, jsonify, request, session
+import logging
+
+from app.utils import event_stream
+
+logger = logging.getLogger(__name__)
+
+stream_api = Blueprint('stream_api', __name__, url_prefix='/api')
+
+
+def canales_usuario():
+    """Canales que escucha el usuario de la sesión"""
+    from app.routes.participacion import codigo_oficina
+
+    canales = [session.get('user')]
+    # Los eventos del calendario se guardan con session['usuario_id'] (ver solicitudes.calendario)
+    canales.append(session.get('usuario_id', 'anonimo'))
+    oficina = codigo_oficina(session.get('secretaria', ''))
+    if oficina:
+        canales.append(f"oficina:{oficina}")
+    return canales
+
+
+@stream_api.route('/stream', methods=['GET'], endpoint='stream')
+def stream():
+    if 'user' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    desde = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    if desde and not desde.isdigit():
+        desde = None
+
+    maximo = current_app.config.get('SSE_MAX_CLIENTS', 0)
+    if not event_stream.reservar_cliente(maximo):
+        # El cliente sigue con sondeo hasta que haya cupo
+        return jsonify({'error': 'Demasiadas conexiones abiertas'}), 503
+
+    app = current_app._get_current_object()
+    try:
+        from app.utils.recordatorios import iniciar
+        iniciar(app)
+        path = event_stream.log_path(app)
+        resp = Response(
+            event_stream.stream(path, canales_usuario(), desde,
+                                duracion=app.config.get('SSE_MAX_SECONDS', event_stream.DURACION_MAX)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+    except Exception as e:
+        event_stream.liberar_cliente()
+        logger.error(f"[STREAM] Error abriendo stream: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    resp.call_on_close(event_stream.liberar_cliente)
+    return resp
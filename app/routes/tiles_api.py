@@ -0,0 +1,79 @@
+"""
+Vector tiles (MVT) para los visores MapLibre
+Rutas: /tiles/...
+"""
+from flask import Blueprint, Response, jsonify, request, url_for
+import gzip
+import logging
+
+from app.utils.tile_cache import categoria_uso, get_layer, MINZOOM, MAXZOOM
+
+logger = logging.getLogger(__name__)
+
+tiles_api = Blueprint('tiles_api', __name__, url_prefix='/tiles')
+
+
+@tiles_api.route('/<layer>.json', methods=['GET'], endpoint='tilejson')
+def tilejson(layer):
+    """TileJSON de la capa (incluye categorías de uso para armar la leyenda)"""
+    try:
+        capa = get_layer(layer)
+        if capa is None:
+            return jsonify({'error': 'Capa no encontrada'}), 404
+        tiles_url = url_for('tiles_api.tile', layer=layer, z=0, x=0, y=0, _external=True)
+        tiles_url = tiles_url.replace('/0/0/0.pbf', '/{z}/{x}/{y}.pbf')
+        data = {
+            'tilejson': '3.0.0',
+            'name': layer,
+            'tiles': [tiles_url],
+            'minzoom': MINZOOM,
+            'maxzoom': MAXZOOM,
+            'vector_layers': [{'id': layer, 'minzoom': MINZOOM, 'maxzoom': MAXZOOM}],
+            'total': len(capa.features),
+        }
+        if capa.bounds:
+            data['bounds'] = list(capa.lonlat_bounds())
+        if layer == 'predios':
+            data['categorias'] = sorted({categoria_uso(f[1]) for f in capa.features})
+        resp = jsonify(data)
+        resp.headers['ETag'] = f'"{capa.key}"'
+        return resp
+    except Exception as e:
+        logger.error(f"[TILES] Error en TileJSON de {layer}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@tiles_api.route('/<layer>/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'], endpoint='tile')
+def tile(layer, z, x, y):
+    """Tile MVT; se sirve gzip si el cliente lo acepta"""
+    capa = get_layer(layer)
+    if capa is None:
+        return jsonify({'error': 'Capa no encontrada'}), 404
+
+    # ETag por codificación: el cuerpo gzip y el descomprimido son variantes distintas
+    gzip_ok = bool(request.accept_encodings['gzip'])
+    etag = f'"{capa.key}-{z}-{x}-{y}{"-gz" if gzip_ok else ""}"'
+    headers = {
+        'ETag': etag,
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': 'public, max-age=3600',
+        'Access-Control-Allow-Origin': '*',
+    }
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+
+    try:
+        data = capa.get_tile(z, x, y)
+    except Exception as e:
+        logger.error(f"[TILES] Error generando {layer}/{z}/{x}/{y}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    if data is None:
+        return jsonify({'error': 'Tile fuera de rango'}), 404
+    if not data:
+        return Response(status=204, headers=headers)
+
+    if gzip_ok:
+        headers['Content-Encoding'] = 'gzip'
+    else:
+        data = gzip.decompress(data)
+    return Response(data, mimetype='application/vnd.mapbox-vector-tile', headers=headers)
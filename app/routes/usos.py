@@ -1,32 +1,28 @@
 import os
 import re
 import io
-import json
 import base64
 import datetime
 import unicodedata
 import logging
-try:
-    import pandas as pd
-except Exception:
-    pd = None
-try:
-    import geopandas as gpd
-except ImportError:
-    gpd = None
+from collections import namedtuple
+from app.utils.lazy import lazy_import
+
+# Librerías pesadas: se importan en el primer uso (ver app/utils/lazy.py)
+pd = lazy_import('pandas')
+gpd = lazy_import('geopandas')
 
 logger = logging.getLogger(__name__)
 
-try:
-    import qrcode
-except ImportError:
-    qrcode = None
+qrcode = lazy_import('qrcode')
 
 # Usar ReportLab exclusivamente para PDF (consistencia con otros módulos)
-try:
-    from xhtml2pdf import pisa
-except ImportError:
-    pisa = None
+pisa = lazy_import('xhtml2pdf.pisa')
+from app.utils.text_index import TextIndex
+from app.utils.excel_cache import read_excel_cached
+from app.utils import shared_cache
+from app.utils.metricas import medir
+from app.utils.static_payload import get_payload
 from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, current_app, jsonify, abort
 try:
     from shapely.geometry import mapping
@@ -36,12 +32,11 @@ except ImportError:
 usos_bp = Blueprint('usos_suelo', __name__)
 
 # --- Caches ---
-_df_predios = None
-_df_normas = None
-_df_normatividad_excel = None
-uso_lookup_cc = {}
-uso_lookup_mat = {}
-_geojson_cache = None  # Cache para GeoJSON estático
+# Los datasets derivados (DataFrame + índices) viven en app/utils/shared_cache:
+# LRU por proceso + caché compartida entre workers, versionada por (mtime, tamaño).
+DatosPredios = namedtuple('DatosPredios', ['df', 'index', 'uso_lookup_cc', 'uso_lookup_mat'])
+DatosNormas = namedtuple('DatosNormas', ['df', 'index', 'uso_index'])
+DatosNormatividad = namedtuple('DatosNormatividad', ['df', 'index'])
 
 # --- Column mapping ---
 COLMAP = {
@@ -50,7 +45,8 @@ COLMAP = {
     'uso': ['uso', 'uso_predio', 'uso_suelo', 'uso_actual', 'uso_destinado'],
     'direccion': ['direccion', 'dir', 'direccion_predio', 'ubicacion'],
     'barrio': ['barrio', 'sector', 'zona', 'localidad'],
-    'norma': ['norma', 'normatividad', 'articulo', 'descripcion_norma']
+    'norma': ['norma', 'normatividad', 'articulo', 'descripcion_norma'],
+    'homologado': ['codigo_homologado', 'cod_homologado', 'cod_pred_homologado', 'homologado']
 }
 
 # --- Helpers ---
@@ -65,75 +61,194 @@ def pick_col(df, keys):
 def norm_val(v):
     return re.sub(r'[^0-9A-Za-z]', '', str(v or '')).lower()
 
+def _predios_path():
+    return os.path.join(current_app.config['DATA_DIR'], 'tabla_predios.xlsx')
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _construir_predios(path):
+    df = read_excel_cached(path)
+    df.columns = [c.strip().lower() for c in df.columns]
+
+    # Populate lookups
+    # Assuming COD_PRED and NUM_DOC keys exist or mapped
+    col_cc = pick_col(df, COLMAP['cc'])
+    col_mat = pick_col(df, COLMAP['matricula'])
+    col_uso = pick_col(df, COLMAP['uso'])
+    uso_lookup_cc, uso_lookup_mat = {}, {}
+
+    if col_cc and col_uso:
+        df['cedula_catastral'] = df[col_cc].astype(str).str.strip()
+        uso_lookup_cc = df.set_index('cedula_catastral')[col_uso].to_dict()
+
+    if col_mat and col_uso:
+        df['matricula'] = df[col_mat].astype(str).str.strip()
+        uso_lookup_mat = df.set_index('matricula')[col_uso].to_dict()
+
+    datos = DatosPredios(df, PredioIndex(df), uso_lookup_cc, uso_lookup_mat)
+    logger.info(f"[PREDIOS] Índice construido: {len(df)} predios")
+    return datos
+
+def datos_predios():
+    """DatosPredios vigentes (None si no hay tabla de predios o no se pudo cargar)"""
+    path = _predios_path()
+    key = _file_key(path)
+    if key is None:
+        logger.warning(f"No se encuentra tabla_predios.xlsx en {path}")
+        return None
+    try:
+        return shared_cache.obtener('usos:predios', key, lambda: _construir_predios(path))
+    except Exception as e:
+        logger.error(f"Error cargando predios: {e}", exc_info=True)
+        return None
+
 def cargar_df_predios():
-    global _df_predios, uso_lookup_cc, uso_lookup_mat
-    if _df_predios is None:
-        path = os.path.join(current_app.config['DATA_DIR'], 'tabla_predios.xlsx')
-        if not os.path.exists(path):
-            logger.warning(f"No se encuentra tabla_predios.xlsx en {path}")
-            return pd.DataFrame()
-            
-        try:
-            df = pd.read_excel(path)
-            df.columns = [c.strip().lower() for c in df.columns]
-            
-            # Populate lookups
-            # Assuming COD_PRED and NUM_DOC keys exist or mapped
-            col_cc = pick_col(df, COLMAP['cc'])
-            col_mat = pick_col(df, COLMAP['matricula'])
-            col_uso = pick_col(df, COLMAP['uso'])
-            
-            if col_cc and col_uso:
-                df['cedula_catastral'] = df[col_cc].astype(str).str.strip()
-                uso_lookup_cc = df.set_index('cedula_catastral')[col_uso].to_dict()
-                
-            if col_mat and col_uso:
-                df['matricula'] = df[col_mat].astype(str).str.strip()
-                uso_lookup_mat = df.set_index('matricula')[col_uso].to_dict()
-                
-            _df_predios = df
-        except Exception as e:
-            logger.error(f"Error cargando predios: {e}", exc_info=True)
-            return pd.DataFrame()
-            
-    return _df_predios
+    """DataFrame de predios; se recarga (junto con el índice) si cambia el archivo"""
+    datos = datos_predios()
+    return datos.df if datos is not None else pd.DataFrame()
+
+class PredioIndex:
+    """
+    Índice en memoria de tabla_predios: cédula catastral, matrícula y código
+    homologado normalizados (norm_val) -> fila compacta (tupla). Las búsquedas
+    son O(1) en lugar de recorrer el DataFrame completo.
+    """
+
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self.cols = {k: pick_col(df, keys) for k, keys in COLMAP.items()}
+        self.rows = list(df.itertuples(index=False, name=None))
+        self.por_cc = self._build(df, self.cols['cc'])
+        self.por_matricula = self._build(df, self.cols['matricula'])
+        self.por_homologado = self._build(df, self.cols['homologado'])
+
+    @staticmethod
+    def _build(df, col):
+        if not col:
+            return {}
+        claves = df[col].astype(str).str.replace(r'[^0-9A-Za-z]', '', regex=True).str.lower()
+        index = {}
+        for pos, clave in enumerate(claves):
+            if clave and clave not in index:  # gana la primera fila, como antes
+                index[clave] = pos
+        return index
+
+    def _fila(self, pos):
+        return dict(zip(self.columns, self.rows[pos]))
+
+    def buscar(self, cc=None, matricula=None):
+        if cc:
+            clave = norm_val(cc)
+            pos = self.por_cc.get(clave)
+            if pos is None:
+                pos = self.por_homologado.get(clave)
+            if pos is not None:
+                return self._fila(pos)
+        if matricula:
+            pos = self.por_matricula.get(norm_val(matricula))
+            if pos is not None:
+                return self._fila(pos)
+        return None
+
+def get_predio_index():
+    """Índice de predios vigente (None si no hay tabla de predios)"""
+    datos = datos_predios()
+    if datos is None or datos.df.empty:
+        return None
+    return datos.index
+
+def _strip_accents(txt):
+    return ''.join(c for c in unicodedata.normalize('NFKD', str(txt)) if not unicodedata.combining(c))
+
+def clean_token(txt):
+    """Token de uso sin tildes, sin prefijo zona/área y solo alfanumérico"""
+    s = _strip_accents(txt).lower()
+    for pref in ("zona","área","area"):
+        if s.startswith(pref):
+            s = s[len(pref):]
+    return re.sub(r'[^0-9a-z]', '', s)
+
+def _texto(v):
+    """Valor de celda como texto ('' para vacíos/NaN)"""
+    if v is None or (isinstance(v, float) and v != v):
+        return ''
+    return str(v)
+
+def _construir_normas(path):
+    try:
+        df = read_excel_cached(path)
+        df.columns = [c.strip().lower() for c in df.columns]
+    except:
+        df = pd.DataFrame(columns=['uso','articulo','descripcion'])
+
+    # Índices: token de uso/alias/uso_oficial (generar_pdf) y uso exacto (buscar_norma)
+    index = TextIndex()
+    usos = {}
+    col_uso = pick_col(df, COLMAP["uso"])
+    for pos, row in enumerate(df.to_dict('records')):
+        for key_col in ("uso", "alias", "uso_oficial"):
+            if key_col in df.columns:
+                index.add(clean_token(_texto(row.get(key_col))), 0, pos)
+        if col_uso:
+            usos.setdefault(str(row.get(col_uso)).lower().strip(), pos)
+    return DatosNormas(df, index.freeze(), usos)
+
+def datos_normas():
+    """DatosNormas de normatividad.xlsx (None si no existe el archivo)"""
+    path = os.path.join(current_app.config['DATA_DIR'], 'normatividad.xlsx')
+    key = _file_key(path)
+    if key is None:
+        return None
+    return shared_cache.obtener('usos:normas', key, lambda: _construir_normas(path))
 
 def cargar_df_normas():
-    global _df_normas
-    if _df_normas is None:
-        path = os.path.join(current_app.config['DATA_DIR'], 'normatividad.xlsx')
-        if not os.path.exists(path):
-             return pd.DataFrame(columns=['uso','articulo','descripcion'])
-        try:
-            df = pd.read_excel(path)
-            df.columns = [c.strip().lower() for c in df.columns]
-            _df_normas = df
-        except:
-             _df_normas = pd.DataFrame(columns=['uso','articulo','descripcion'])
-    return _df_normas
+    datos = datos_normas()
+    if datos is None:
+        return pd.DataFrame(columns=['uso','articulo','descripcion'])
+    return datos.df
+
+def buscar_fila_norma(uso):
+    """Fila de normatividad.xlsx cuyo uso/alias/uso_oficial coincide con `uso` (o None)"""
+    datos = datos_normas()
+    if datos is None or datos.df.empty:
+        return None
+    pos = datos.index.exact(clean_token(uso))
+    return datos.df.iloc[pos] if pos is not None else None
+
+def _construir_normatividad(excel_path):
+    df = read_excel_cached(excel_path)
+    # Normalizar nombres de columnas
+    df.columns = [str(c).strip() for c in df.columns]
+    datos = DatosNormatividad(df, _indexar_normatividad(df))
+    logger.info(f"Excel de normatividad cargado: {len(df)} registros, {len(datos.index)} términos")
+    return datos
+
+def _normatividad_path():
+    project_root = os.path.abspath(os.path.join(current_app.root_path, '..'))
+    return os.path.join(project_root, 'documentos_generados', 'normatividad', 'plantilla_normatividad_usos.xlsx')
+
+def datos_normatividad():
+    """DatosNormatividad del Excel detallado (None si no existe o no se pudo cargar)"""
+    excel_path = _normatividad_path()
+    key = _file_key(excel_path)
+    if key is None:
+        logger.warning(f"Excel de normatividad no encontrado en: {excel_path}")
+        return None
+    try:
+        return shared_cache.obtener('usos:normatividad', key, lambda: _construir_normatividad(excel_path))
+    except Exception as e:
+        logger.error(f"Error cargando Excel de normatividad: {e}", exc_info=True)
+        return None
 
 def cargar_excel_normatividad():
     """Carga el Excel completo de normatividad con toda la información detallada"""
-    global _df_normatividad_excel
-    if _df_normatividad_excel is None:
-        project_root = os.path.abspath(os.path.join(current_app.root_path, '..'))
-        excel_path = os.path.join(project_root, 'documentos_generados', 'normatividad', 'plantilla_normatividad_usos.xlsx')
-        
-        if not os.path.exists(excel_path):
-            logger.warning(f"Excel de normatividad no encontrado en: {excel_path}")
-            return pd.DataFrame()
-        
-        try:
-            df = pd.read_excel(excel_path)
-            # Normalizar nombres de columnas
-            df.columns = [str(c).strip() for c in df.columns]
-            _df_normatividad_excel = df
-            logger.info(f"Excel de normatividad cargado: {len(df)} registros")
-        except Exception as e:
-            logger.error(f"Error cargando Excel de normatividad: {e}", exc_info=True)
-            return pd.DataFrame()
-    
-    return _df_normatividad_excel
+    datos = datos_normatividad()
+    return datos.df if datos is not None else pd.DataFrame()
 
 def normalizar_uso(texto):
     """Normaliza texto para comparación de usos del suelo"""
@@ -148,80 +263,75 @@ def normalizar_uso(texto):
     texto = re.sub(r'\s+', ' ', texto)
     return texto
 
+# Campos de búsqueda de normatividad, en orden de prioridad
+CAMPOS_NORMATIVIDAD = ['uso', 'alias', 'uso_oficial', 'categoria', 'subcategoria']
+
+def _indexar_normatividad(df):
+    index = TextIndex()
+    campos = [c for c in CAMPOS_NORMATIVIDAD if c in df.columns]
+    for pos, row in enumerate(df[campos].to_dict('records')):
+        for prioridad, campo in enumerate(campos):
+            index.add(normalizar_uso(_texto(row.get(campo))), prioridad, pos)
+    return index.freeze()
+
 def buscar_normatividad_completa(uso_predio):
     """
     Busca normatividad completa para un uso del suelo dado.
     Retorna diccionario con toda la información relevante.
+    La coincidencia se resuelve con el índice precalculado: exacta, luego
+    prefijo, luego subcadena; a igualdad gana el campo de mayor prioridad y
+    la primera fila.
     """
     if not uso_predio:
         return None
     
-    df_norm = cargar_excel_normatividad()
-    if df_norm.empty:
+    datos = datos_normatividad()
+    if datos is None or datos.df.empty:
         return None
     
-    uso_normalizado = normalizar_uso(uso_predio)
-    
-    # Buscar por coincidencia en múltiples campos
-    campos_busqueda = ['uso', 'alias', 'uso_oficial', 'categoria', 'subcategoria']
-    
-    for idx, row in df_norm.iterrows():
-        for campo in campos_busqueda:
-            if campo in df_norm.columns:
-                valor = normalizar_uso(row.get(campo, ''))
-                if valor and uso_normalizado in valor or valor in uso_normalizado:
-                    # Encontramos una coincidencia
-                    return {
-                        'uso': row.get('uso', ''),
-                        'categoria': row.get('categoria', ''),
-                        'subcategoria': row.get('subcategoria', ''),
-                        'descripcion': row.get('descripcion', ''),
-                        'uso_principal': row.get('Uso Principal', ''),
-                        'usos_compatibles': row.get('Usos Compatibles', ''),
-                        'usos_condicionados': row.get('Usos Condicionados', ''),
-                        'usos_prohibidos': row.get('Usos Prohibidos', ''),
-                        'directrices': row.get('DIRECTRICES Y CONDICIONAMIENTOS', ''),
-                        'conclusiones': row.get('CONCLUSIONES', ''),
-                        'tipo_norma': row.get('tipo_norma', ''),
-                        'num_norma': row.get('num_norma', ''),
-                        'año': row.get('año', ''),
-                        'norma_general': row.get('Norma General', ''),
-                        'vigente': row.get('vigente', ''),
-                        'fuente_url': row.get('fuente_url', '')
-                    }
-    
-    return None
-
-def buscar_predio(cc=None, matricula=None):
-    df = cargar_df_predios()
-    if df.empty: return None
-    
-    col_cc   = pick_col(df, COLMAP["cc"])
-    col_mat  = pick_col(df, COLMAP["matricula"])
+    pos = datos.index.best(normalizar_uso(uso_predio))
+    if pos is None:
+        return None
 
-    fila = None
-    if cc and col_cc:
-        m = df[col_cc].astype(str).map(norm_val) == norm_val(cc)
-        if m.any():
-            fila = df[m].iloc[0].to_dict()
+    row = datos.df.iloc[pos]
+    return {
+        'uso': row.get('uso', ''),
+        'categoria': row.get('categoria', ''),
+        'subcategoria': row.get('subcategoria', ''),
+        'descripcion': row.get('descripcion', ''),
+        'uso_principal': row.get('Uso Principal', ''),
+        'usos_compatibles': row.get('Usos Compatibles', ''),
+        'usos_condicionados': row.get('Usos Condicionados', ''),
+        'usos_prohibidos': row.get('Usos Prohibidos', ''),
+        'directrices': row.get('DIRECTRICES Y CONDICIONAMIENTOS', ''),
+        'conclusiones': row.get('CONCLUSIONES', ''),
+        'tipo_norma': row.get('tipo_norma', ''),
+        'num_norma': row.get('num_norma', ''),
+        'año': row.get('año', ''),
+        'norma_general': row.get('Norma General', ''),
+        'vigente': row.get('vigente', ''),
+        'fuente_url': row.get('fuente_url', '')
+    }
 
-    if fila is None and matricula and col_mat:
-        m = df[col_mat].astype(str).map(norm_val) == norm_val(matricula)
-        if m.any():
-            fila = df[m].iloc[0].to_dict()
-    return fila
+def buscar_predio(cc=None, matricula=None):
+    index = get_predio_index()
+    if index is None: return None
+    return index.buscar(cc=cc, matricula=matricula)
 
 def buscar_norma(uso):
     if not uso:
         return "Normatividad específica no encontrada"
-    df = cargar_df_normas()
+    datos = datos_normas()
+    if datos is None:
+        return "Normatividad específica no encontrada"
+    df = datos.df
     col_uso   = pick_col(df, COLMAP["uso"])    
     col_norma = pick_col(df, COLMAP["norma"])  
     if not col_uso or not col_norma:
         return "Normatividad específica no encontrada"
-    mask = df[col_uso].astype(str).str.lower().str.strip() == uso.lower().strip()
-    if mask.any():
-        return df.loc[mask, col_norma].iloc[0]
+    pos = datos.uso_index.get(uso.lower().strip())
+    if pos is not None:
+        return df[col_norma].iloc[pos]
     return "Normatividad específica no encontrada"
 
 # --- Routes ---
@@ -234,12 +344,12 @@ def usos_suelo():
         matri = request.form.get("matri", "").strip()
         fila = buscar_predio(cc=cc or None, matricula=matri or None)
         if fila:
-            df = cargar_df_predios()
-            col_uso = pick_col(df, COLMAP["uso"])
-            col_dir = pick_col(df, COLMAP["direccion"])
-            col_bar = pick_col(df, COLMAP["barrio"])
-            col_cc  = pick_col(df, COLMAP["cc"])
-            col_mat = pick_col(df, COLMAP["matricula"])
+            cols = get_predio_index().cols
+            col_uso = cols["uso"]
+            col_dir = cols["direccion"]
+            col_bar = cols["barrio"]
+            col_cc  = cols["cc"]
+            col_mat = cols["matricula"]
             
             # Safely get values
             uso = fila.get(col_uso, "") if col_uso else ""
@@ -266,18 +376,15 @@ def generar_pdf(cc, matri):
     if not fila_predio:
         abort(404, "No hay datos para ese predio")
 
-    # 2) Cargo DataFrames
-    dfp = cargar_df_predios()
-    dfn = cargar_df_normas()
-
-    # 3) Columnas dinámicas en predios
-    col_cc   = pick_col(dfp, COLMAP["cc"])
-    col_mat  = pick_col(dfp, COLMAP["matricula"])
-    col_uso  = pick_col(dfp, COLMAP["uso"])
-    col_dir  = pick_col(dfp, COLMAP["direccion"])
-    col_bar  = pick_col(dfp, COLMAP["barrio"])
+    # 2) Columnas dinámicas en predios (resueltas al construir el índice)
+    cols = get_predio_index().cols
+    col_cc   = cols["cc"]
+    col_mat  = cols["matricula"]
+    col_uso  = cols["uso"]
+    col_dir  = cols["direccion"]
+    col_bar  = cols["barrio"]
 
-    # 4) Extraigo datos básicos
+    # 3) Extraigo datos básicos
     uso = fila_predio.get(col_uso, "") if col_uso else ""
     datos = {
         "cc":         fila_predio.get(col_cc, "") if col_cc else "",
@@ -289,30 +396,10 @@ def generar_pdf(cc, matri):
         "entidad":    "Alcaldía Municipal de Supatá"
     }
 
-    # 5) Helpers para limpiar tokens
-    def strip_accents(txt):
-        return ''.join(c for c in unicodedata.normalize('NFKD', str(txt)) if not unicodedata.combining(c))
-    def clean_token(txt):
-        s = strip_accents(txt).lower()
-        for pref in ("zona","área","area"):
-            if s.startswith(pref):
-                s = s[len(pref):]
-        return re.sub(r'[^0-9a-z]', '', s)
-
-    uso_token = clean_token(uso)
-
-    # 6) Busco la norma correspondiente
-    row_norma = None
-    if not dfn.empty:
-        for _, row in dfn.iterrows():
-            for key in ("uso","alias","uso_oficial"):
-                if key in dfn.columns and clean_token(row.get(key,"")) == uso_token:
-                    row_norma = row
-                    break
-            if row_norma is not None:
-                break
-
-    # 7) Relleno campos de normatividad
+    # 4) Busco la norma correspondiente (índice por token de uso/alias/uso_oficial)
+    row_norma = buscar_fila_norma(uso)
+
+    # 5) Relleno campos de normatividad
     campos = {
         "norma_general":      "norma general",
         "descripcion":        "descripcion",
@@ -328,7 +415,7 @@ def generar_pdf(cc, matri):
     for k, col in campos.items():
         datos[k] = row_norma.get(col, "") if row_norma is not None else ""
 
-    # 8) Genero el QR en memoria
+    # 6) Genero el QR en memoria
     qr_data = "https://www.supata-cundinamarca.gov.co"
     if qrcode:
         qr_img  = qrcode.make(qr_data)
@@ -338,12 +425,12 @@ def generar_pdf(cc, matri):
     else:
         qr_src = ""  # Sin QR si no está disponible
 
-    # 9) Ruta al escudo
+    # 7) Ruta al escudo
     logo_path = "file:///" + os.path.join(
         current_app.root_path, "static", "imagenes", "escudo.png"
     ).replace("\\", "/")
 
-    # 10) Renderizo el HTML
+    # 8) Renderizo el HTML
     html = render_template(
         "uso_pdf.html",
         logo_path=logo_path,
@@ -351,11 +438,12 @@ def generar_pdf(cc, matri):
         **datos
     )
 
-    # 11) Genero el PDF con xhtml2pdf (sin dependencias externas como wkhtmltopdf)
+    # 9) Genero el PDF con xhtml2pdf (sin dependencias externas como wkhtmltopdf)
     if pisa:
         try:
             pdf_buffer = io.BytesIO()
-            pdf_status = pisa.CreatePDF(io.BytesIO(html.encode('utf-8')), dest=pdf_buffer)
+            with medir('pdf'):
+                pdf_status = pisa.CreatePDF(io.BytesIO(html.encode('utf-8')), dest=pdf_buffer)
             if not pdf_status.err:
                 pdf_buffer.seek(0)
                 filename = f"UsoSuelo_{datos['cc']}_{datos['matricula']}.pdf"
@@ -377,40 +465,35 @@ def generar_certificado_cod_pred(cod_pred):
         abort(400, "Código predial requerido")
     return generar_pdf(cc=cod_pred, matri="")
 
-@usos_bp.route('/usos_suelo/geojson')
-def usos_suelo_geojson():
-    """Entrega el GeoJSON directamente con caché en memoria (optimizado para velocidad)."""
-    global _geojson_cache
-    
-    # Retornar desde caché si ya está cargado
-    if _geojson_cache is not None:
-        return jsonify(_geojson_cache)
-    
+def geojson_path():
+    """Ruta del GeoJSON de usos del suelo (None si no existe)"""
+    for ruta in _rutas_geojson():
+        if os.path.exists(ruta):
+            return ruta
+    return None
+
+def _rutas_geojson():
     # Intentar múltiples rutas posibles
-    rutas_posibles = [
+    return [
         os.path.join(current_app.root_path, 'static', 'geojson', 'usos_predial.geojson'),
         os.path.join(os.path.dirname(current_app.root_path), 'static', 'geojson', 'usos_predial.geojson'),
         'static/geojson/usos_predial.geojson',
         '/usos_predial.geojson'
     ]
-    
-    static_path = None
-    for ruta in rutas_posibles:
-        if os.path.exists(ruta):
-            static_path = ruta
-            logger.info(f"GeoJSON encontrado en: {ruta}")
-            break
-    
+
+@usos_bp.route('/usos_suelo/geojson')
+def usos_suelo_geojson():
+    """
+    Entrega el GeoJSON pre-serializado y pre-comprimido (gzip/br) con ETag.
+    La serialización se hace una sola vez por versión del archivo.
+    """
+    static_path = geojson_path()
     if not static_path:
-        logger.warning(f"No se encontró GeoJSON en: {rutas_posibles}")
+        logger.warning(f"No se encontró GeoJSON en: {_rutas_geojson()}")
         return jsonify({'type': 'FeatureCollection', 'features': [], 'error': 'Archivo no encontrado'})
 
     try:
-        with open(static_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        _geojson_cache = data  # Guardar en caché
-        logger.info(f"GeoJSON cargado y cacheado: {len(data.get('features', []))} features")
-        return jsonify(data)
+        return get_payload(static_path).response()
     except Exception as e:
         logger.error(f"Error cargando GeoJSON: {e}", exc_info=True)
         return jsonify({'error': str(e), 'path': static_path}), 500
@@ -556,7 +639,8 @@ def generar_pdf_croquis():
         if pisa:
             try:
                 pdf_buffer = io.BytesIO()
-                pdf_status = pisa.CreatePDF(io.BytesIO(html_content.encode('utf-8')), dest=pdf_buffer)
+                with medir('pdf'):
+                    pdf_status = pisa.CreatePDF(io.BytesIO(html_content.encode('utf-8')), dest=pdf_buffer)
                 if not pdf_status.err:
                     pdf_buffer.seek(0)
                     return send_file(
@@ -749,7 +833,8 @@ def generar_certificado_completo():
         if pisa:
             try:
                 result_buffer = io.BytesIO()
-                pdf_status = pisa.CreatePDF(io.BytesIO(html_cert.encode('utf-8')), dest=result_buffer)
+                with medir('pdf'):
+                    pdf_status = pisa.CreatePDF(io.BytesIO(html_cert.encode('utf-8')), dest=result_buffer)
                 if not pdf_status.err:
                     pdf_main_bytes = result_buffer.getvalue()
                     logger.info("PDF generado con xhtml2pdf correctamente")
@@ -0,0 +1,154 @@
+"""
+Contadores del dashboard (/api/dashboard-stats)
+Cada módulo se calcula con una sola consulta de agregados condicionales sobre
+su tabla (COUNT + SUM(CASE ...)) y se guarda en caché con un TTL corto. Las
+escrituras por ORM sobre esas tablas (add/delete/flush y query.update/delete)
+invalidan el módulo al hacer commit; en los demás workers el dato nuevo
+aparece al vencer el TTL.
+"""
+import time
+import logging
+import threading
+
+from sqlalchemy import event, func, case
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+TTL_SEGUNDOS = 30
+
+# Tabla -> módulo del dashboard que la resume
+TABLAS = {
+    'solicitudes': 'solicitudes',
+    'radicados': 'pqrs',
+    'contratos': 'contratos',
+    'radicado_arborea': 'riesgo',
+    'usuarios': 'usuarios',
+}
+
+_cache = {}
+_generacion = {}   # módulo -> nº de invalidaciones
+_lock = threading.Lock()
+_registrado = False
+
+
+def _contar(columna_total, **condiciones):
+    """Una fila con el total y un SUM(CASE) por cada condición"""
+    from app import db
+
+    columnas = [func.count(columna_total)]
+    columnas += [func.coalesce(func.sum(case((cond, 1), else_=0)), 0) for cond in condiciones.values()]
+    fila = db.session.query(*columnas).one()
+    return dict(zip(['total', *condiciones], (int(v or 0) for v in fila)))
+
+
+def _solicitudes():
+    from app.models.solicitud import Solicitud
+    c = _contar(Solicitud.id, pendientes=Solicitud.estado == 'nuevo')
+    return {'total': c['total'], 'pendientes': c['pendientes']}
+
+
+def _pqrs():
+    from app.models.participacion import Radicado
+    c = _contar(Radicado.id, pendiente=Radicado.estado == 'PENDIENTE', en_tramite=Radicado.estado == 'EN_TRAMITE')
+    return {'pendiente': c['pendiente'], 'en_tramite': c['en_tramite'], 'total': c['total']}
+
+
+def _contratos():
+    from app.models.contrato import Contrato
+    c = _contar(Contrato.id, alerta=Contrato.alerta_vencimiento.is_(True))
+    return {'total': c['total'], 'alerta': c['alerta']}
+
+
+def _riesgo():
+    from app.models.riesgo_arborea import RadicadoArborea
+    c = _contar(RadicadoArborea.id, pendientes=RadicadoArborea.dictamen_decision.is_(None))
+    return {'total': c['total'], 'pendientes': c['pendientes']}
+
+
+def _usuarios():
+    from app.models.usuario import Usuario
+    c = _contar(Usuario.id, activos=Usuario.bloqueado.is_(False))
+    return {'total': c['total'], 'activos': c['activos']}
+
+
+CALCULOS = {
+    'solicitudes': _solicitudes,
+    'pqrs': _pqrs,
+    'contratos': _contratos,
+    'riesgo': _riesgo,
+    'usuarios': _usuarios,
+}
+
+
+def obtener(modulo):
+    """Contadores de un módulo (desde caché si no venció)"""
+    ahora = time.monotonic()
+    entrada = _cache.get(modulo)
+    if entrada is not None and entrada[0] > ahora:
+        return entrada[1]
+    with _lock:
+        generacion = _generacion.get(modulo, 0)
+    valores = CALCULOS[modulo]()
+    with _lock:
+        # Si hubo un commit mientras se calculaba, no se guarda el dato viejo
+        if _generacion.get(modulo, 0) == generacion:
+            _cache[modulo] = (ahora + TTL_SEGUNDOS, valores)
+    return valores
+
+
+def invalidar(*modulos):
+    with _lock:
+        for modulo in modulos or list(CALCULOS):
+            _cache.pop(modulo, None)
+            _generacion[modulo] = _generacion.get(modulo, 0) + 1
+
+
+def _modulos_de(mapper):
+    tabla = getattr(getattr(mapper, 'local_table', None), 'name', None)
+    modulo = TABLAS.get(tabla)
+    return {modulo} if modulo else set()
+
+
+def _marcar(session, modulos):
+    if modulos:
+        session.info.setdefault('dashboard_stats', set()).update(modulos)
+
+
+def _after_flush(session, flush_context):
+    modulos = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        try:
+            modulos |= _modulos_de(type(obj).__mapper__)
+        except AttributeError:
+            continue
+    _marcar(session, modulos)
+
+
+def _do_orm_execute(state):
+    # query.update() / query.delete() no pasan por el flush
+    if (state.is_update or state.is_delete or state.is_insert) and state.bind_mapper is not None:
+        _marcar(state.session, _modulos_de(state.bind_mapper))
+
+
+def _after_commit(session):
+    modulos = session.info.pop('dashboard_stats', None)
+    if modulos:
+        invalidar(*modulos)
+
+
+def _after_rollback(session):
+    session.info.pop('dashboard_stats', None)
+
+
+def registrar_eventos():
+    """Conecta la invalidación a las sesiones ORM (una sola vez por proceso)"""
+    global _registrado
+    with _lock:
+        if _registrado:
+            return
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+        _registrado = True
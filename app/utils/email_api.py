@@ -1,6 +1,9 @@
 """Email API helpers (SendGrid) to avoid SMTP restrictions"""
 import os
-import requests
+from app.utils.lazy import lazy_import
+from app.utils.metricas import medir
+
+requests = lazy_import('requests')
 
 def send_email_sendgrid(api_key: str, from_email: str, to_email: str, subject: str, html_content: str) -> bool:
     """Send an email via SendGrid HTTP API.
@@ -20,7 +23,8 @@ def send_email_sendgrid(api_key: str, from_email: str, to_email: str, subject: s
         "content": [{"type": "text/html", "value": html_content}]
     }
     try:
-        resp = requests.post(url, headers=headers, json=data, timeout=10)
+        with medir('sendgrid'):
+            resp = requests.post(url, headers=headers, json=data, timeout=10)
         return resp.status_code == 202
     except Exception:
         return False
@@ -6,11 +6,11 @@ Alternative to SMTP for sending emails via HTTPS in restricted environments like
 import logging
 from flask import current_app
 
-try:
-    import resend
-    RESEND_AVAILABLE = True
-except ImportError:
-    RESEND_AVAILABLE = False
+from app.utils.lazy import lazy_import
+from app.utils.metricas import medir
+
+resend = lazy_import('resend')
+RESEND_AVAILABLE = resend is not None
 
 logger = logging.getLogger(__name__)
 
@@ -58,7 +58,8 @@ def send_email_resend(to_email, subject, html_content, from_name="Alcaldía Virt
         }
         
         logger.info(f"Enviando email via Resend a {to_email}")
-        response = resend.Emails.send(email_data)
+        with medir('resend'):
+            response = resend.Emails.send(email_data)
         
         if response and "id" in response:
             logger.info(f"Email enviado exitosamente. ID: {response['id']}")
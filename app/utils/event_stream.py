@@ -0,0 +1,151 @@
+"""
+Eventos en vivo (Server-Sent Events)
+publish() guarda el evento en un log SQLite compartido por todos los workers y
+despierta a los streams del mismo proceso (pub/sub en memoria). Los streams de
+otros workers lo leen en su siguiente sondeo del log. Cada evento tiene id
+creciente, así que el navegador retoma con Last-Event-ID sin perder mensajes.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+CANAL_TODOS = '*'
+RETENCION_SEGUNDOS = 24 * 3600
+POLL_SEGUNDOS = 2.0        # sondeo del log (eventos publicados por otros workers)
+HEARTBEAT_SEGUNDOS = 15.0
+DURACION_MAX = 300.0       # el cliente se reconecta solo (retry)
+RETRY_MS = 3000
+
+_cond = threading.Condition()
+_secuencia = 0             # se incrementa con cada publish de este proceso
+_local = threading.local()
+_clientes = 0
+_clientes_lock = threading.Lock()
+_publicados = 0
+
+
+def log_path(app=None):
+    app = app or current_app
+    ruta = app.config.get('EVENT_LOG_PATH')
+    if not ruta:
+        from app.utils.static_payload import cache_dir
+        ruta = os.path.join(cache_dir(app), 'eventos.sqlite')
+    return str(ruta)
+
+
+def _connect(path):
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            canal TEXT NOT NULL, tipo TEXT NOT NULL, data TEXT NOT NULL, creado REAL NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_eventos_canal_id ON eventos (canal, id)")
+        conns[path] = conn
+    return conn
+
+
+def publish(canal, tipo, data, app=None):
+    """
+    Publica un evento para un canal (usuario, 'oficina:<código>' o '*').
+    Nunca lanza excepción: un fallo del stream no debe romper la operación
+    que lo origina.
+    """
+    global _secuencia, _publicados
+    if not canal:
+        return None
+    try:
+        conn = _connect(log_path(app))
+        cur = conn.execute(
+            "INSERT INTO eventos (canal, tipo, data, creado) VALUES (?, ?, ?, ?)",
+            (str(canal), tipo, json.dumps(data, ensure_ascii=False, default=str), time.time())
+        )
+        _publicados += 1
+        if _publicados % 200 == 0:
+            conn.execute("DELETE FROM eventos WHERE creado < ?", (time.time() - RETENCION_SEGUNDOS,))
+        with _cond:
+            _secuencia += 1
+            _cond.notify_all()
+        return cur.lastrowid
+    except Exception as e:
+        logger.error(f"[STREAM] No se pudo publicar {tipo} para {canal}: {e}")
+        return None
+
+
+def ultimo_id(path):
+    row = _connect(path).execute("SELECT MAX(id) FROM eventos").fetchone()
+    return row[0] or 0
+
+
+def leer(path, canales, despues_de, limite=100):
+    marcas = ','.join('?' * len(canales))
+    return _connect(path).execute(
+        f"SELECT id, tipo, data FROM eventos WHERE canal IN ({marcas}) AND id > ? ORDER BY id LIMIT ?",
+        (*canales, despues_de, limite)
+    ).fetchall()
+
+
+def _esperar(secuencia, timeout):
+    """Espera un publish de este proceso (o el timeout); devuelve la secuencia actual"""
+    with _cond:
+        if _secuencia == secuencia:
+            _cond.wait(timeout)
+        return _secuencia
+
+
+def reservar_cliente(maximo):
+    """Cupo para un stream nuevo; False si el worker ya tiene `maximo` abiertos"""
+    global _clientes
+    with _clientes_lock:
+        if maximo and _clientes >= maximo:
+            return False
+        _clientes += 1
+        return True
+
+
+def liberar_cliente():
+    global _clientes
+    with _clientes_lock:
+        _clientes = max(_clientes - 1, 0)
+
+
+def clientes_activos():
+    return _clientes
+
+
+def stream(path, canales, desde=None, duracion=DURACION_MAX):
+    """
+    Generador SSE para `canales`. Sin `desde` empieza en el último evento
+    existente (solo entrega lo nuevo).
+    """
+    canales = [c for c in dict.fromkeys(canales) if c] + [CANAL_TODOS]
+    visto = int(desde) if desde not in (None, '') else ultimo_id(path)
+    yield f"retry: {RETRY_MS}\n\n"
+    inicio = latido = time.monotonic()
+    secuencia = _secuencia
+    while time.monotonic() - inicio < duracion:
+        filas = leer(path, canales, visto)
+        for id_, tipo, data in filas:
+            visto = id_
+            yield f"id: {id_}\nevent: {tipo}\ndata: {data}\n\n"
+        if filas:
+            latido = time.monotonic()
+            if len(filas) == 100:
+                continue
+        elif time.monotonic() - latido >= HEARTBEAT_SEGUNDOS:
+            latido = time.monotonic()
+            yield ": ping\n\n"
+        secuencia = _esperar(secuencia, POLL_SEGUNDOS)
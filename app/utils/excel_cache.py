@@ -0,0 +1,85 @@
+"""
+Caché columnar en disco para fuentes Excel
+Cada libro/hoja se convierte una sola vez con pd.read_excel (openpyxl) y se
+guarda como pickle de pandas en CACHE_DIR/excel. La clave incluye ruta, hoja,
+opciones de lectura, mtime y tamaño, así que un archivo modificado genera una
+entrada nueva; los demás workers y los reinicios leen la caché en milisegundos.
+"""
+import os
+import hashlib
+import logging
+
+from flask import current_app
+
+from app.utils.lazy import lazy_import
+from app.utils.metricas import cronometrado
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_dir():
+    base = current_app.config.get('CACHE_DIR') or os.path.join(str(current_app.config['DOCUMENTOS_DIR']), 'cache')
+    path = os.path.join(str(base), 'excel')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _slug(value):
+    return ''.join(ch if ch.isalnum() else '_' for ch in str(value))[:40]
+
+
+def cache_path(path, sheet_name=0, **kwargs):
+    """Ruta del archivo de caché para (ruta, hoja, opciones) en su versión actual"""
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    # <libro>.<hoja>.<entrada>.<versión>.pkl: la entrada identifica (ruta, hoja,
+    # opciones) y la versión el (mtime, tamaño) del archivo
+    entrada = hashlib.sha1(repr((path, sheet_name, sorted(kwargs.items()))).encode('utf-8')).hexdigest()[:16]
+    version = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    stem = _slug(os.path.splitext(os.path.basename(path))[0])
+    return os.path.join(_cache_dir(), f"{stem}.{_slug(sheet_name)}.{entrada}.{version}.pkl")
+
+
+def _purge_stale(destino):
+    """Borra las versiones anteriores de la misma entrada (ruta, hoja y opciones)"""
+    carpeta = os.path.dirname(destino)
+    prefijo = os.path.basename(destino).rsplit('.', 2)[0] + '.'
+    for name in os.listdir(carpeta):
+        if name.endswith('.tmp'):  # escritura en curso de otro worker
+            continue
+        if name.startswith(prefijo) and os.path.join(carpeta, name) != destino:
+            try:
+                os.remove(os.path.join(carpeta, name))
+            except OSError:
+                pass
+
+
+@cronometrado('excel')
+def read_excel_cached(path, sheet_name=0, **kwargs):
+    """
+    Equivalente a pd.read_excel(path, sheet_name=..., **kwargs) con caché en
+    disco. Si la caché falla por cualquier motivo se lee el Excel directamente.
+    """
+    try:
+        destino = cache_path(path, sheet_name, **kwargs)
+    except OSError:
+        return pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+
+    if os.path.exists(destino):
+        try:
+            return pd.read_pickle(destino)
+        except Exception as e:
+            logger.warning(f"[EXCEL_CACHE] Caché ilegible {destino}: {e}")
+
+    df = pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+    try:
+        tmp = f"{destino}.{os.getpid()}.tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, destino)
+        _purge_stale(destino)
+        logger.info(f"[EXCEL_CACHE] {os.path.basename(path)}[{sheet_name}] convertido a caché columnar")
+    except Exception as e:
+        logger.warning(f"[EXCEL_CACHE] No se pudo escribir la caché de {path}: {e}")
+    return df
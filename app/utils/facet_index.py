@@ -0,0 +1,124 @@
+"""
+Índice facetado en memoria (búsqueda de texto + filtros con conteos)
+Cada documento es un bit; cada valor de faceta y cada token de texto guarda el
+conjunto de documentos como un entero (bitmap). Filtrar es combinar bitmaps con
+& y |, y contar es bit_count(), sin recorrer los documentos en cada consulta.
+"""
+import re
+import bisect
+import unicodedata
+
+_TOKEN_RE = re.compile(r'[0-9a-z]+')
+
+
+def fold(texto):
+    """Minúsculas y sin tildes"""
+    s = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in s if not unicodedata.combining(c)).lower().strip()
+
+
+def tokens(texto):
+    return _TOKEN_RE.findall(fold(texto))
+
+
+def posiciones(bitmap):
+    """Índices de los bits encendidos, en orden ascendente"""
+    out = []
+    while bitmap:
+        bajo = bitmap & -bitmap
+        out.append(bajo.bit_length() - 1)
+        bitmap ^= bajo
+    return out
+
+
+class FacetIndex:
+    """
+    docs: lista de documentos (se devuelven tal cual).
+    facetas: nombre -> función(doc) que retorna un valor o una lista de valores.
+    texto: función(doc) con el texto buscable del documento.
+    """
+
+    def __init__(self, docs, facetas, texto):
+        self.docs = docs
+        self.todos = (1 << len(docs)) - 1
+        self.facetas = {nombre: {} for nombre in facetas}
+        self._claves = {nombre: {} for nombre in facetas}  # valor plegado -> valor
+        postings = {}
+
+        for i, doc in enumerate(docs):
+            bit = 1 << i
+            for nombre, extraer in facetas.items():
+                valores = extraer(doc)
+                if not isinstance(valores, (list, tuple, set)):
+                    valores = [valores]
+                for valor in valores:
+                    if valor is None or valor == '':
+                        continue
+                    valor = str(valor)
+                    self.facetas[nombre][valor] = self.facetas[nombre].get(valor, 0) | bit
+                    self._claves[nombre].setdefault(fold(valor), valor)
+            for tok in set(tokens(texto(doc))):
+                postings[tok] = postings.get(tok, 0) | bit
+
+        self._vocab = sorted(postings)
+        self._postings = postings
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _bitmap_token(self, tok):
+        """Documentos con algún token que empiece por `tok`"""
+        bitmap = 0
+        i = bisect.bisect_left(self._vocab, tok)
+        while i < len(self._vocab) and self._vocab[i].startswith(tok):
+            bitmap |= self._postings[self._vocab[i]]
+            i += 1
+        return bitmap
+
+    def bitmap_texto(self, consulta):
+        """Todos los tokens de la consulta deben aparecer (como prefijo)"""
+        bitmap = self.todos
+        for tok in tokens(consulta):
+            bitmap &= self._bitmap_token(tok)
+            if not bitmap:
+                break
+        return bitmap
+
+    def bitmap_faceta(self, nombre, valores):
+        """OR de los valores pedidos (comparación sin tildes ni mayúsculas)"""
+        bitmap = 0
+        for valor in valores:
+            clave = self._claves[nombre].get(fold(valor))
+            if clave is not None:
+                bitmap |= self.facetas[nombre][clave]
+        return bitmap
+
+    def buscar(self, consulta='', filtros=None):
+        """
+        Devuelve (bitmap del resultado, conteos por faceta).
+        Los conteos de cada faceta aplican el texto y los demás filtros, pero
+        no el de esa misma faceta, para mostrar las alternativas disponibles.
+        """
+        filtros = {k: v for k, v in (filtros or {}).items() if v and k in self.facetas}
+        base = self.bitmap_texto(consulta)
+        por_faceta = {k: self.bitmap_faceta(k, v) for k, v in filtros.items()}
+
+        resultado = base
+        for bitmap in por_faceta.values():
+            resultado &= bitmap
+
+        conteos = {}
+        for nombre, valores in self.facetas.items():
+            sel = base
+            for otro, bitmap in por_faceta.items():
+                if otro != nombre:
+                    sel &= bitmap
+            conteos[nombre] = {v: (sel & bm).bit_count() for v, bm in sorted(valores.items())}
+        return resultado, conteos
+
+    def contar(self, nombre, bitmap):
+        """Conteo por valor de una faceta dentro de `bitmap`"""
+        return {v: (bitmap & bm).bit_count() for v, bm in sorted(self.facetas[nombre].items())}
+
+    def documentos(self, bitmap, inicio=0, fin=None):
+        return [self.docs[i] for i in posiciones(bitmap)[inicio:fin]]
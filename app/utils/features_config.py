@@ -0,0 +1,79 @@
+"""
+Permisos por módulo leídos de config.json
+El archivo solo se vuelve a leer cuando cambia su (inodo, mtime, tamaño). El
+mapa módulo -> roles se compila una vez a frozensets dentro de un mapping de
+solo lectura y se publica reemplazando la referencia en
+app.config['APP_FEATURES'], así que un request nunca ve un mapa a medio armar.
+"""
+import os
+import json
+import logging
+import threading
+from types import MappingProxyType
+
+from flask import current_app
+
+from app.utils import normalize_features
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_key = None
+
+
+def config_path(app=None):
+    app = app or current_app
+    return os.path.join(app.config['BASE_DIR'], "config.json")
+
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def compilar(raw):
+    """Mapa inmutable módulo -> frozenset de roles/usuarios"""
+    return MappingProxyType({feat: frozenset(roles) for feat, roles in normalize_features(raw).items()})
+
+
+def _publicar(app, features, key):
+    global _key
+    app.config["APP_FEATURES"] = compilar(features)
+    _key = key
+
+
+def refrescar(app=None):
+    """
+    Recarga los permisos si config.json cambió desde la última lectura.
+    Sin archivo se conservan los permisos vigentes (por defecto los de Config).
+    """
+    global _key
+    app = app or current_app
+    path = config_path(app)
+    key = _file_key(path)
+    if key is None or key == _key:
+        return
+    with _lock:
+        key = _file_key(path)
+        if key is None or key == _key:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cfg = json.load(f)
+        except Exception as e:
+            # Archivo a medio escribir o JSON inválido: se reintenta en el próximo cambio
+            logger.error(f"[FEATURES] Error leyendo {path}: {e}")
+            _key = key
+            return
+        _publicar(app, cfg.get("features"), key)
+        logger.info("[FEATURES] Permisos por módulo recargados")
+
+
+def actualizar(features, app=None):
+    """Publica de inmediato los permisos recién guardados en config.json"""
+    app = app or current_app
+    with _lock:
+        _publicar(app, features, _file_key(config_path(app)))
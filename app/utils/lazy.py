@@ -0,0 +1,74 @@
+"""
+Importación diferida de librerías pesadas (pandas, reportlab, PyPDF2, qrcode...)
+lazy_import() devuelve un módulo fachada que importa el real en el primer
+acceso a un atributo, así el arranque del worker no paga librerías que la
+mayoría de requests nunca usa. Si la librería no está instalada devuelve None,
+igual que los `try: import x / except ImportError: x = None` que reemplaza.
+"""
+import sys
+import types
+import importlib
+import importlib.util
+import threading
+
+_lock = threading.RLock()
+
+
+class LazyModule(types.ModuleType):
+    """Fachada de un módulo que se importa al usarlo por primera vez"""
+
+    def __init__(self, nombre):
+        super().__init__(nombre)
+        self.__dict__['_lazy_modulo'] = None
+
+    def _cargar(self):
+        modulo = self.__dict__['_lazy_modulo']
+        if modulo is None:
+            with _lock:
+                modulo = self.__dict__['_lazy_modulo']
+                if modulo is None:
+                    modulo = importlib.import_module(self.__name__)
+                    # Los siguientes accesos ya no pasan por __getattr__
+                    self.__dict__.update(modulo.__dict__)
+                    self.__dict__['_lazy_modulo'] = modulo
+        return modulo
+
+    def __getattr__(self, attr):
+        return getattr(self._cargar(), attr)
+
+    def __setattr__(self, attr, valor):
+        # Configuración del módulo (p. ej. resend.api_key) va al módulo real
+        setattr(self._cargar(), attr, valor)
+        self.__dict__[attr] = valor
+
+    def __dir__(self):
+        return dir(self._cargar())
+
+    def __repr__(self):
+        estado = 'cargado' if self.__dict__['_lazy_modulo'] is not None else 'diferido'
+        return f"<LazyModule {self.__name__!r} ({estado})>"
+
+
+def disponible(nombre):
+    """True si el paquete está instalado (sin importarlo)"""
+    raiz = nombre.split('.')[0]
+    if raiz in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(raiz) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def lazy_import(nombre):
+    """Módulo diferido, el real si ya estaba importado, o None si no está instalado"""
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    if not disponible(nombre):
+        return None
+    return LazyModule(nombre)
+
+
+def cargado(nombre):
+    """True si el módulo real ya se importó en este proceso"""
+    return nombre in sys.modules
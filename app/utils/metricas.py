@@ -0,0 +1,377 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus (/metrics)
+- HTTP: requests, latencia y tamaño de respuesta por endpoint; errores 5xx.
+- Subsistemas: tiempo y errores de PDF, Excel, SECOP, SMTP/Resend/SendGrid y
+  base de datos, medidos con medir() / cronometrado().
+Cada worker acumula en memoria y cada SINCRONIZAR_SEGUNDOS (y al atender el
+scrape) guarda su copia en CACHE_DIR/metricas.sqlite; /metrics suma las de
+todos los workers de la instancia. Lo contado por workers que ya terminaron
+se pasa a una fila acumulada, así los contadores nunca retroceden. Si el
+archivo compartido falla, se exportan los valores del proceso con label `pid`.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+INF = 'le="+Inf"'
+
+DB_NOMBRE = 'metricas.sqlite'
+SINCRONIZAR_SEGUNDOS = 5
+ACUMULADO = 'acumulado'   # proceso al que pasan las series de workers terminados
+
+_lock = threading.Lock()
+_INICIO = time.time()
+_cambios = 0              # se incrementa con cada observación de este proceso
+_ruta = None              # archivo compartido (lo fija registrar)
+_proceso = None           # (pid, id único del proceso en el archivo compartido)
+_hilo_pid = None
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(nombres, valores, *extra):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    pares.extend(e for e in extra if e)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, labels=()):
+        self.nombre, self.ayuda, self.labels = nombre, ayuda, tuple(labels)
+        self._series = {}
+
+    def inc(self, *valores, cantidad=1):
+        global _cambios
+        with _lock:
+            self._series[valores] = self._series.get(valores, 0) + cantidad
+            _cambios += 1
+
+    def copia(self):
+        with _lock:
+            return dict(self._series)
+
+    @staticmethod
+    def sumar(a, b):
+        return a + b
+
+    def exportar(self, series=None, extra=None):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        for valores, total in sorted((self.copia() if series is None else series).items()):
+            lineas.append(f"{self.nombre}{_labels(self.labels, valores, extra)} {_numero(total)}")
+        return lineas
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, labels=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre, self.ayuda, self.labels = nombre, ayuda, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels -> [conteo por bucket, suma, total]
+
+    def observar(self, valor, *valores):
+        global _cambios
+        with _lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+            _cambios += 1
+
+    def copia(self):
+        with _lock:
+            return {k: [list(v[0]), v[1], v[2]] for k, v in self._series.items()}
+
+    @staticmethod
+    def sumar(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def exportar(self, series=None, extra=None):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for valores, (conteos, suma, total) in sorted((self.copia() if series is None else series).items()):
+            acumulado = 0
+            for limite, n in zip(self.buckets, conteos):
+                acumulado += n
+                le = f'le="{_numero(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{_labels(self.labels, valores, extra, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_labels(self.labels, valores, extra, INF)} {total}")
+            lineas.append(f"{self.nombre}_sum{_labels(self.labels, valores, extra)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_labels(self.labels, valores, extra)} {total}")
+        return lineas
+
+
+HTTP_REQUESTS = Contador('http_requests_total', 'Requests atendidos', ('endpoint', 'method', 'status'))
+HTTP_ERRORES = Contador('http_request_errors_total', 'Respuestas 5xx', ('endpoint', 'method'))
+HTTP_DURACION = Histograma('http_request_duration_seconds', 'Latencia hasta enviar los headers',
+                           ('endpoint', 'method'))
+HTTP_TAMANO = Histograma('http_response_size_bytes', 'Tamaño del cuerpo de la respuesta',
+                         ('endpoint',), BUCKETS_BYTES)
+SUBSISTEMA_DURACION = Histograma('app_subsystem_duration_seconds', 'Tiempo en cada subsistema',
+                                 ('subsistema',))
+SUBSISTEMA_ERRORES = Contador('app_subsystem_errors_total', 'Errores por subsistema', ('subsistema',))
+# Alimentadas por app/utils/sql_perfil.py
+SQL_CONSULTAS = Histograma('http_request_sql_queries', 'Consultas SQL por request', ('endpoint',),
+                           (1, 2, 5, 10, 20, 50, 100, 200, 500))
+SQL_N1 = Contador('http_request_sql_n1_total', 'Requests con sentencias repetidas (posible N+1)', ('endpoint',))
+
+METRICAS = [HTTP_REQUESTS, HTTP_ERRORES, HTTP_DURACION, HTTP_TAMANO, SUBSISTEMA_DURACION, SUBSISTEMA_ERRORES,
+            SQL_CONSULTAS, SQL_N1]
+_POR_NOMBRE = {m.nombre: m for m in METRICAS}
+
+
+def observar(subsistema, segundos, error=False):
+    SUBSISTEMA_DURACION.observar(segundos, subsistema)
+    if error:
+        SUBSISTEMA_ERRORES.inc(subsistema)
+
+
+@contextmanager
+def medir(subsistema):
+    """Mide el bloque como tiempo de `subsistema` (las excepciones cuentan como error)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observar(subsistema, time.perf_counter() - inicio, error=True)
+        raise
+    observar(subsistema, time.perf_counter() - inicio)
+
+
+def cronometrado(subsistema):
+    """Decorador equivalente a envolver la función en medir(subsistema)"""
+    def decorador(func):
+        @wraps(func)
+        def envoltura(*args, **kwargs):
+            with medir(subsistema):
+                return func(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# --- Middleware HTTP ---
+
+def _antes():
+    g._metricas_inicio = time.perf_counter()
+    if _hilo_pid != os.getpid():
+        _iniciar_sincronizador()
+
+
+def _despues(response):
+    inicio = g.pop('_metricas_inicio', None)
+    if inicio is None:
+        return response
+    try:
+        # Sin endpoint (404 de rutas inexistentes) se agrupan para no crear una serie por URL
+        endpoint = request.endpoint or '<sin_ruta>'
+        metodo = request.method
+        HTTP_DURACION.observar(time.perf_counter() - inicio, endpoint, metodo)
+        HTTP_REQUESTS.inc(endpoint, metodo, str(response.status_code))
+        if response.status_code >= 500:
+            HTTP_ERRORES.inc(endpoint, metodo)
+        if response.content_length is not None:
+            HTTP_TAMANO.observar(response.content_length, endpoint)
+    except Exception as e:
+        logger.warning(f"[METRICAS] No se pudo registrar el request: {e}")
+    return response
+
+
+def _db_antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metricas_inicio', []).append(time.perf_counter())
+
+
+def _db_despues(conn, cursor, statement, parameters, context, executemany):
+    pila = conn.info.get('_metricas_inicio')
+    if pila:
+        observar('db', time.perf_counter() - pila.pop())
+
+
+def _db_error(contexto):
+    pila = contexto.connection.info.get('_metricas_inicio') if contexto.connection is not None else None
+    if pila:
+        observar('db', time.perf_counter() - pila.pop(), error=True)
+
+
+# --- Archivo compartido entre workers ---
+
+def _conectar():
+    conn = sqlite3.connect(_ruta, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS series ("
+        " proceso TEXT NOT NULL, pid INTEGER NOT NULL, metrica TEXT NOT NULL,"
+        " labels TEXT NOT NULL, valor TEXT NOT NULL, PRIMARY KEY (proceso, metrica, labels))"
+    )
+    return conn
+
+
+def _id_proceso():
+    """Id del proceso en el archivo; cambia tras un fork aunque el pid se reutilice"""
+    global _proceso
+    pid = os.getpid()
+    if _proceso is None or _proceso[0] != pid:
+        _proceso = (pid, f"{pid}-{uuid.uuid4().hex[:8]}")
+    return _proceso
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _acumular_terminados(conn):
+    """Pasa a ACUMULADO las series de los workers que ya no existen"""
+    terminados = [
+        proceso for proceso, pid in conn.execute("SELECT DISTINCT proceso, pid FROM series WHERE proceso != ?",
+                                                 (ACUMULADO,))
+        if not _vivo(pid)
+    ]
+    for proceso in terminados:
+        for metrica, labels, valor in conn.execute(
+            "SELECT metrica, labels, valor FROM series WHERE proceso = ?", (proceso,)
+        ).fetchall():
+            tipo = _POR_NOMBRE.get(metrica)
+            previo = conn.execute(
+                "SELECT valor FROM series WHERE proceso = ? AND metrica = ? AND labels = ?",
+                (ACUMULADO, metrica, labels)
+            ).fetchone()
+            if tipo is not None and previo is not None:
+                valor = json.dumps(tipo.sumar(json.loads(previo[0]), json.loads(valor)))
+            conn.execute("INSERT OR REPLACE INTO series VALUES (?, 0, ?, ?, ?)", (ACUMULADO, metrica, labels, valor))
+        conn.execute("DELETE FROM series WHERE proceso = ?", (proceso,))
+
+
+def sincronizar():
+    """Guarda la copia de este proceso en el archivo compartido"""
+    if _ruta is None:
+        return
+    with _lock:
+        cambios = _cambios
+    pid, proceso = _id_proceso()
+    filas = [
+        (proceso, pid, metrica.nombre, json.dumps(list(valores)), json.dumps(valor))
+        for metrica in METRICAS for valores, valor in metrica.copia().items()
+    ]
+    conn = _conectar()
+    try:
+        with conn:
+            conn.execute("DELETE FROM series WHERE proceso = ?", (proceso,))
+            conn.executemany("INSERT INTO series VALUES (?, ?, ?, ?, ?)", filas)
+            _acumular_terminados(conn)
+    finally:
+        conn.close()
+    return cambios
+
+
+def _sincronizador():
+    ultimo = None
+    while _hilo_pid == os.getpid():
+        time.sleep(SINCRONIZAR_SEGUNDOS)
+        if _cambios == ultimo:
+            continue
+        try:
+            ultimo = sincronizar()
+        except Exception as e:
+            logger.warning(f"[METRICAS] No se pudo sincronizar con {_ruta}: {e}")
+
+
+def _iniciar_sincronizador():
+    global _hilo_pid
+    with _lock:
+        if _ruta is None or _hilo_pid == os.getpid():
+            return
+        _hilo_pid = os.getpid()
+    threading.Thread(target=_sincronizador, name='metricas', daemon=True).start()
+
+
+def _agregado():
+    """{metrica: {labels: valor}} sumando todos los workers, y cuántos están vivos"""
+    sincronizar()
+    conn = _conectar()
+    try:
+        filas = conn.execute("SELECT proceso, metrica, labels, valor FROM series").fetchall()
+    finally:
+        conn.close()
+    series = {m.nombre: {} for m in METRICAS}
+    procesos = set()
+    for proceso, metrica, labels, valor in filas:
+        tipo = _POR_NOMBRE.get(metrica)
+        if tipo is None:
+            continue
+        if proceso != ACUMULADO:
+            procesos.add(proceso)
+        valores, valor = tuple(json.loads(labels)), json.loads(valor)
+        previo = series[metrica].get(valores)
+        series[metrica][valores] = valor if previo is None else tipo.sumar(previo, valor)
+    return series, len(procesos)
+
+
+_registrado_db = False
+
+
+def registrar(app):
+    """Conecta el middleware HTTP, el tiempo de SQL del ORM y el archivo compartido"""
+    global _registrado_db, _ruta
+    from app.utils.static_payload import cache_dir
+    _ruta = os.path.join(cache_dir(app), DB_NOMBRE)
+    app.before_request(_antes)
+    app.after_request(_despues)
+    with _lock:
+        if not _registrado_db:
+            event.listen(Engine, 'before_cursor_execute', _db_antes)
+            event.listen(Engine, 'after_cursor_execute', _db_despues)
+            event.listen(Engine, 'handle_error', _db_error)
+            _registrado_db = True
+
+
+def exportar():
+    """Texto de exposición de Prometheus (versión 0.0.4), sumando todos los workers"""
+    try:
+        series, workers = _agregado()
+        extra = None
+    except Exception as e:
+        logger.warning(f"[METRICAS] Archivo compartido no disponible; se exporta solo este worker: {e}")
+        series, workers = {}, 1
+        extra = f'pid="{os.getpid()}"'
+    lineas = [
+        "# HELP app_worker_info Worker que respondió",
+        "# TYPE app_worker_info gauge",
+        f'app_worker_info{{pid="{os.getpid()}"}} 1',
+        "# HELP app_workers Workers con métricas en el archivo compartido",
+        "# TYPE app_workers gauge",
+        f"app_workers {workers}",
+        "# HELP process_start_time_seconds Inicio del proceso (epoch)",
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {_numero(_INICIO)}",
+    ]
+    for metrica in METRICAS:
+        lineas.extend(metrica.exportar(series.get(metrica.nombre), extra))
+    return '\n'.join(lineas) + '\n'
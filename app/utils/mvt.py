@@ -0,0 +1,362 @@
+"""
+Codificador mínimo de Mapbox Vector Tiles (MVT 2.1)
+Sin dependencias externas: proyección Web Mercator, recorte al tile con
+búfer, simplificación Douglas-Peucker según zoom y serialización protobuf.
+"""
+import math
+import struct
+
+EXTENT = 4096
+BUFFER = 64
+
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+GEOM_POLYGON = 3
+
+
+# --- Proyección ---
+
+def lonlat_to_world(lon, lat):
+    """Coordenadas Web Mercator normalizadas a [0, 1] (y hacia abajo)"""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = (lon + 180.0) / 360.0
+    s = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return x, y
+
+
+def tile_bounds(z, x, y):
+    """(minx, miny, maxx, maxy) del tile en coordenadas de mundo"""
+    n = float(1 << z)
+    return x / n, y / n, (x + 1) / n, (y + 1) / n
+
+
+def world_to_lonlat(wx, wy):
+    lon = wx * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * wy))))
+    return lon, lat
+
+
+# --- Geometría ---
+
+def project_geometry(geometry):
+    """
+    GeoJSON -> (tipo MVT, partes) en coordenadas de mundo.
+    Polígonos: lista de polígonos, cada uno lista de anillos.
+    Líneas: lista de líneas. Puntos: lista de puntos.
+    """
+    if not geometry:
+        return None, []
+    gtype = geometry.get('type')
+    coords = geometry.get('coordinates') or []
+
+    def ring(r):
+        return [lonlat_to_world(p[0], p[1]) for p in r]
+
+    if gtype == 'Polygon':
+        return GEOM_POLYGON, [[ring(r) for r in coords]]
+    if gtype == 'MultiPolygon':
+        return GEOM_POLYGON, [[ring(r) for r in poly] for poly in coords]
+    if gtype == 'LineString':
+        return GEOM_LINESTRING, [ring(coords)]
+    if gtype == 'MultiLineString':
+        return GEOM_LINESTRING, [ring(l) for l in coords]
+    if gtype == 'Point':
+        return GEOM_POINT, [lonlat_to_world(coords[0], coords[1])]
+    if gtype == 'MultiPoint':
+        return GEOM_POINT, [lonlat_to_world(p[0], p[1]) for p in coords]
+    return None, []
+
+
+def bbox_of(gtype, parts):
+    xs, ys = [], []
+    if gtype == GEOM_POLYGON:
+        for poly in parts:
+            for r in poly[:1]:
+                xs.extend(p[0] for p in r)
+                ys.extend(p[1] for p in r)
+    elif gtype == GEOM_LINESTRING:
+        for line in parts:
+            xs.extend(p[0] for p in line)
+            ys.extend(p[1] for p in line)
+    else:
+        xs = [p[0] for p in parts]
+        ys = [p[1] for p in parts]
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _sqseg_dist(p, a, b):
+    x, y = a
+    dx, dy = b[0] - x, b[1] - y
+    if dx or dy:
+        t = ((p[0] - x) * dx + (p[1] - y) * dy) / (dx * dx + dy * dy)
+        if t > 1:
+            x, y = b
+        elif t > 0:
+            x += dx * t
+            y += dy * t
+    dx, dy = p[0] - x, p[1] - y
+    return dx * dx + dy * dy
+
+
+def simplify(points, tolerance):
+    """Douglas-Peucker iterativo; conserva extremos"""
+    if len(points) < 3 or tolerance <= 0:
+        return points
+    sq_tol = tolerance * tolerance
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_d, index = 0.0, 0
+        for i in range(first + 1, last):
+            d = _sqseg_dist(points[i], points[first], points[last])
+            if d > max_d:
+                max_d, index = d, i
+        if max_d > sq_tol:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _clip_ring(ring, lo, hi):
+    """Sutherland-Hodgman contra el rectángulo [lo, hi] x [lo, hi]"""
+    def clip(pts, inside, cut):
+        out = []
+        if not pts:
+            return out
+        prev = pts[-1]
+        for cur in pts:
+            if inside(cur):
+                if not inside(prev):
+                    out.append(cut(prev, cur))
+                out.append(cur)
+            elif inside(prev):
+                out.append(cut(prev, cur))
+            prev = cur
+        return out
+
+    def at_x(xv):
+        return lambda a, b: (xv, a[1] + (b[1] - a[1]) * (xv - a[0]) / (b[0] - a[0]))
+
+    def at_y(yv):
+        return lambda a, b: (a[0] + (b[0] - a[0]) * (yv - a[1]) / (b[1] - a[1]), yv)
+
+    pts = ring
+    pts = clip(pts, lambda p: p[0] >= lo, at_x(lo))
+    pts = clip(pts, lambda p: p[0] <= hi, at_x(hi))
+    pts = clip(pts, lambda p: p[1] >= lo, at_y(lo))
+    pts = clip(pts, lambda p: p[1] <= hi, at_y(hi))
+    return pts
+
+
+def _clip_line(line, lo, hi):
+    """Recorta una línea; devuelve segmentos dentro del rectángulo"""
+    def inside(p):
+        return lo <= p[0] <= hi and lo <= p[1] <= hi
+    segmentos, actual = [], []
+    for p in line:
+        if inside(p):
+            actual.append(p)
+        else:
+            if len(actual) > 1:
+                segmentos.append(actual)
+            actual = []
+    if len(actual) > 1:
+        segmentos.append(actual)
+    return segmentos
+
+
+def _ring_area(ring):
+    area = 0
+    for i in range(len(ring) - 1):
+        area += ring[i][0] * ring[i + 1][1] - ring[i + 1][0] * ring[i][1]
+    return area / 2.0
+
+
+def _to_tile(points, z, x, y):
+    n = float(1 << z)
+    return [((px * n - x) * EXTENT, (py * n - y) * EXTENT) for px, py in points]
+
+
+def _dedupe_int(points):
+    out = []
+    for px, py in points:
+        p = (int(round(px)), int(round(py)))
+        if not out or out[-1] != p:
+            out.append(p)
+    return out
+
+
+def tile_geometry(gtype, parts, z, x, y):
+    """
+    Lleva la geometría al sistema del tile (z, x, y): recorta con búfer,
+    simplifica (tolerancia ~1 unidad del tile) y redondea a enteros.
+    Devuelve la lista de partes lista para codificar, o [] si no queda nada.
+    """
+    lo, hi = -BUFFER, EXTENT + BUFFER
+    if gtype == GEOM_POINT:
+        pts = _dedupe_int(_to_tile(parts, z, x, y))
+        return [p for p in pts if 0 <= p[0] < EXTENT and 0 <= p[1] < EXTENT]
+
+    if gtype == GEOM_LINESTRING:
+        out = []
+        for line in parts:
+            for seg in _clip_line(_to_tile(line, z, x, y), lo, hi):
+                seg = _dedupe_int(simplify(seg, 1.0))
+                if len(seg) > 1:
+                    out.append(seg)
+        return out
+
+    out = []
+    for poly in parts:
+        rings = []
+        for i, ring in enumerate(poly):
+            r = _clip_ring(_to_tile(ring, z, x, y), lo, hi)
+            if len(r) < 3:
+                if i == 0:
+                    break
+                continue
+            r = _dedupe_int(simplify(r + [r[0]], 1.0))
+            if r[0] != r[-1]:
+                r.append(r[0])
+            if len(r) < 4:
+                if i == 0:
+                    break
+                continue
+            area = _ring_area(r)
+            if area == 0:
+                if i == 0:
+                    break
+                continue
+            # MVT: exterior con área positiva (y hacia abajo), huecos negativa
+            if (i == 0) != (area > 0):
+                r.reverse()
+            rings.append(r)
+        if rings:
+            out.append(rings)
+    return out
+
+
+# --- Protobuf ---
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        b = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _key(field, wire):
+    return _varint((field << 3) | wire)
+
+
+def _bytes_field(field, data):
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _varint_field(field, value):
+    return _key(field, 0) + _varint(value)
+
+
+def _packed(field, values):
+    return _bytes_field(field, b''.join(_varint(v) for v in values))
+
+
+def _command(cmd, count):
+    return (cmd & 0x7) | (count << 3)
+
+
+def encode_geometry(gtype, parts):
+    cmds = []
+    cx = cy = 0
+
+    def move(points, close):
+        nonlocal cx, cy
+        pts = points[:-1] if close else points
+        px, py = pts[0]
+        cmds.append(_command(1, 1))
+        cmds.extend((_zigzag(px - cx), _zigzag(py - cy)))
+        cx, cy = px, py
+        cmds.append(_command(2, len(pts) - 1))
+        for px, py in pts[1:]:
+            cmds.extend((_zigzag(px - cx), _zigzag(py - cy)))
+            cx, cy = px, py
+        if close:
+            cmds.append(_command(7, 1))
+
+    if gtype == GEOM_POINT:
+        cmds.append(_command(1, len(parts)))
+        for px, py in parts:
+            cmds.extend((_zigzag(px - cx), _zigzag(py - cy)))
+            cx, cy = px, py
+    elif gtype == GEOM_LINESTRING:
+        for line in parts:
+            move(line, False)
+    else:
+        for poly in parts:
+            for ring in poly:
+                move(ring, True)
+    return cmds
+
+
+def _encode_value(v):
+    if isinstance(v, bool):
+        return _varint_field(7, int(v))
+    if isinstance(v, int) and -(1 << 63) <= v < (1 << 63):
+        return _varint_field(6, _zigzag(v) & 0xFFFFFFFFFFFFFFFF)
+    if isinstance(v, float):
+        return _key(3, 1) + struct.pack('<d', v)
+    return _bytes_field(1, str(v).encode('utf-8'))
+
+
+def encode_layer(name, features):
+    """
+    features: iterable de (id, propiedades, tipo, partes_en_tile).
+    Devuelve los bytes del mensaje Tile con una sola capa (b'' si vacía).
+    """
+    keys, values = {}, {}
+    encoded = []
+    for fid, props, gtype, parts in features:
+        if not parts:
+            continue
+        tags = []
+        for k, v in (props or {}).items():
+            if v is None or (isinstance(v, float) and math.isnan(v)):
+                continue
+            if isinstance(v, (dict, list)):
+                continue
+            ki = keys.setdefault(k, len(keys))
+            vkey = (type(v).__name__, v)
+            vi = values.setdefault(vkey, len(values))
+            tags.extend((ki, vi))
+        msg = b''
+        if fid is not None:
+            msg += _varint_field(1, int(fid))
+        msg += _packed(2, tags)
+        msg += _varint_field(3, gtype)
+        msg += _packed(4, encode_geometry(gtype, parts))
+        encoded.append(msg)
+
+    if not encoded:
+        return b''
+
+    layer = _varint_field(15, 2) + _bytes_field(1, name.encode('utf-8'))
+    layer += b''.join(_bytes_field(2, f) for f in encoded)
+    layer += b''.join(_bytes_field(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(_bytes_field(4, _encode_value(v)) for _, v in values)
+    layer += _varint_field(5, EXTENT)
+    return _bytes_field(3, layer)
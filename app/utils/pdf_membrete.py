@@ -0,0 +1,125 @@
+"""
+Membrete oficial (FORMATO.pdf) compartido por todos los generadores de PDF
+La plantilla se parsea una sola vez por proceso (se recarga si cambia su mtime)
+y se inserta en cada documento como un único Form XObject que todas las
+páginas referencian, en lugar de copiar la página plantilla por cada página.
+"""
+import io
+import os
+import logging
+import threading
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+XOBJECT_NAME = '/FormatoOficial'
+
+_lock = threading.Lock()
+_cache = {}
+
+
+class _Plantilla:
+    """Página 1 de FORMATO.pdf ya parseada (contenido decodificado + recursos)"""
+
+    def __init__(self, path):
+        from PyPDF2 import PdfReader
+        from PyPDF2.generic import FloatObject
+
+        self.reader = PdfReader(path)
+        page = self.reader.pages[0]
+        contents = page.get_contents()
+        self.content = contents.get_data() if contents is not None else b''
+        self.resources = page.get('/Resources')
+        self.mediabox = [FloatObject(float(v)) for v in page.mediabox]
+
+    def add_to(self, writer):
+        """Registra la plantilla como Form XObject en `writer` y devuelve su referencia"""
+        from PyPDF2.generic import ArrayObject, DecodedStreamObject, NameObject
+
+        form = DecodedStreamObject()
+        form.set_data(self.content)
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject(self.mediabox),
+        })
+        if self.resources is not None:
+            # La lectura perezosa del PdfReader no es segura entre hilos
+            with _lock:
+                form[NameObject('/Resources')] = self.resources.get_object().clone(writer)
+        return writer._add_object(form)
+
+
+def formato_path():
+    return os.path.join(str(current_app.config['DATA_DIR']), 'FORMATO.pdf')
+
+
+def get_plantilla(path=None):
+    """Plantilla cacheada por proceso; None si el archivo no existe"""
+    path = os.path.realpath(path or formato_path())
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    plantilla = _Plantilla(path)
+    with _lock:
+        _cache[path] = (key, plantilla)
+    logger.info(f"[MEMBRETE] Plantilla cargada: {path}")
+    return plantilla
+
+
+def stamp_letterhead(overlay_bytes, path=None):
+    """
+    Aplica el membrete oficial debajo de cada página de `overlay_bytes`.
+    Devuelve un BytesIO listo para send_file; si FORMATO.pdf no existe se
+    devuelve el overlay sin cambios.
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+    from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+
+    plantilla = get_plantilla(path)
+    if plantilla is None:
+        logger.warning("[MEMBRETE] FORMATO.pdf no encontrado, PDF sin formato oficial")
+        return io.BytesIO(overlay_bytes)
+
+    overlay = PdfReader(io.BytesIO(overlay_bytes))
+    writer = PdfWriter()
+    form_ref = plantilla.add_to(writer)
+
+    # Un solo stream "dibujar membrete" compartido por todas las páginas
+    prefix = DecodedStreamObject()
+    prefix.set_data(f'q {XOBJECT_NAME} Do Q\n'.encode('ascii'))
+    prefix_ref = writer._add_object(prefix)
+
+    for overlay_page in overlay.pages:
+        page = writer.add_page(overlay_page)
+
+        resources = page.get('/Resources')
+        if resources is None:
+            resources = DictionaryObject()
+            page[NameObject('/Resources')] = resources
+        resources = resources.get_object()
+        xobjects = resources.get('/XObject')
+        if xobjects is None:
+            xobjects = DictionaryObject()
+            resources[NameObject('/XObject')] = xobjects
+        xobjects.get_object()[NameObject(XOBJECT_NAME)] = form_ref
+
+        contents = page.get('/Contents')
+        streams = [prefix_ref]
+        if contents is not None:
+            obj = contents.get_object()
+            streams.extend(obj if isinstance(obj, ArrayObject) else [contents])
+        page[NameObject('/Contents')] = ArrayObject(streams)
+        page[NameObject('/MediaBox')] = ArrayObject(plantilla.mediabox)
+
+    out = io.BytesIO()
+    writer.write(out)
+    out.seek(0)
+    return out
@@ -18,7 +18,7 @@ from reportlab.platypus import (
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
-from PyPDF2 import PdfReader, PdfWriter
+from app.utils.pdf_membrete import stamp_letterhead
 
 
 class PDFPlanContingenciaOficial:
@@ -32,9 +32,11 @@ class PDFPlanContingenciaOficial:
     COLOR_LIGHT = colors.HexColor('#f5f5f5')
     COLOR_BORDER = colors.HexColor('#cccccc')
     
-    def __init__(self, plan, current_app):
+    def __init__(self, plan, current_app=None, formato_path=None):
         self.plan = plan
         self.current_app = current_app
+        # Permite renderizar fuera del app context (pool de renderizado)
+        self.formato_path = formato_path or os.path.join(current_app.config['DATA_DIR'], 'FORMATO.pdf')
         self.w, self.h = letter
         self.margin = 0.6 * inch
         self.styles = getSampleStyleSheet()
@@ -221,28 +223,7 @@ class PDFPlanContingenciaOficial:
             # COMBINAR CON FORMATO OFICIAL (como en oficios)
             # ============================================
             try:
-                formato_path = os.path.join(self.current_app.config['DATA_DIR'], 'FORMATO.pdf')
-                if os.path.exists(formato_path):
-                    template_pdf = PdfReader(formato_path)
-                    base_template_page = template_pdf.pages[0]
-                    overlay_pdf = PdfReader(buffer)
-                    output = PdfWriter()
-
-                    # Aplicar formato oficial a cada página sin reabrir
-                    for page_num in range(len(overlay_pdf.pages)):
-                        template_page = __import__('copy').deepcopy(base_template_page)
-                        overlay_page = overlay_pdf.pages[page_num]
-                        template_page.merge_page(overlay_page)
-                        output.add_page(template_page)
-
-                    final_buffer = __import__('io').BytesIO()
-                    output.write(final_buffer)
-                    final_buffer.seek(0)
-                    return final_buffer
-                else:
-                    print("ADVERTENCIA: FORMATO.pdf no encontrado, devolviendo PDF sin formato oficial")
-                    buffer.seek(0)
-                    return buffer
+                return stamp_letterhead(buffer.getvalue(), self.formato_path)
             except Exception as e:
                 print(f"Error al combinar con FORMATO oficial: {e}")
                 buffer.seek(0)
@@ -0,0 +1,150 @@
+"""
+Catálogo del Plan de Desarrollo (metas de producto)
+Se lee plan_desarrollo.xlsx una sola vez por versión del archivo (mtime,
+tamaño) y se deja listo el JSON que consume el formulario de solicitudes
+(metas, ejes y sectores, con ETag).
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Claves estándar de cada meta (las que usa el formulario)
+CAMPOS = ('meta de producto', 'codigo bpim', 'eje', 'sector')
+
+_lock = threading.Lock()
+_catalogo = None
+
+
+def plan_path():
+    return os.path.join(str(current_app.config['BASE_DIR']), 'datos', 'plan_desarrollo', 'plan_desarrollo.xlsx')
+
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _texto(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return ''
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+def _leer_excel(path):
+    """Registros normalizados del Excel (mismas reglas de columnas de siempre)"""
+    from app.utils.excel_cache import read_excel_cached
+    df = read_excel_cached(path)
+
+    # Expected keys: 'meta de producto', 'eje', 'sector', 'codigo bpim'
+    rename_map = {}
+    for col in df.columns:
+        str_col = str(col).lower().strip()
+        if 'meta' in str_col:
+            rename_map[col] = 'meta de producto'
+        elif 'bpim' in str_col or 'bpin' in str_col:
+            rename_map[col] = 'codigo bpim'
+        elif 'eje' in str_col:
+            rename_map[col] = 'eje'
+        elif 'sector' in str_col:
+            rename_map[col] = 'sector'
+    if rename_map:
+        df = df.rename(columns=rename_map)
+
+    if 'meta de producto' not in df.columns:
+        df['meta de producto'] = "Meta desconocida"
+
+    return df.fillna('').to_dict('records')
+
+
+class PlanCatalog:
+    """Metas del plan y el JSON del formulario ya serializado"""
+
+    def __init__(self, records, key=None):
+        self.key = key
+        self.metas = [{c: _texto(r.get(c, '')) for c in CAMPOS} for r in records]
+        self.payload = json.dumps({
+            'metas': self.metas,
+            'ejes': sorted({m['eje'] for m in self.metas if m['eje']}),
+            'sectores': sorted({m['sector'] for m in self.metas if m['sector']}),
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = '"plan-%s"' % hashlib.sha1(self.payload).hexdigest()[:16]
+
+
+def _cargar(path):
+    try:
+        import pandas  # noqa: F401
+    except Exception:
+        logger.warning("[PLAN] pandas no está disponible; usando datos de fallback")
+        return _get_fallback_plan()
+    try:
+        return _leer_excel(path)
+    except Exception as e:
+        logger.error(f"[PLAN] Error cargando plan de desarrollo: {e}. Usando datos de fallback.")
+        return _get_fallback_plan()
+
+
+def get_plan_catalog():
+    """Catálogo vigente; se recarga solo cuando cambia plan_desarrollo.xlsx"""
+    global _catalogo
+    path = plan_path()
+    key = _file_key(path)
+    catalogo = _catalogo
+    if catalogo is not None and catalogo.key == key:
+        return catalogo
+    with _lock:
+        if _catalogo is None or _catalogo.key != key:
+            if key is None:
+                logger.warning(f"[PLAN] No se encontró {path}; usando datos de fallback")
+                records = _get_fallback_plan()
+            else:
+                records = _cargar(path)
+            _catalogo = PlanCatalog(records, key)
+            logger.info(f"[PLAN] Catálogo cargado: {len(_catalogo.metas)} metas")
+        return _catalogo
+
+
+def _get_fallback_plan():
+    """Datos por defecto si falla la carga del Excel"""
+    return [
+        {
+            "eje": "Seguridad y Convivencia",
+            "sector": "Justicia y Seguridad",
+            "meta de producto": "Implementar estrategia de seguridad integral",
+            "codigo bpim": "2024-001"
+        },
+        {
+            "eje": "Infraestructura para el Desarrollo",
+            "sector": "Transporte",
+            "meta de producto": "Mantenimiento de 50km de vías terciarias",
+            "codigo bpim": "2024-002"
+        },
+        {
+            "eje": "Bienestar Social",
+            "sector": "Salud",
+            "meta de producto": "Cobertura universal de vacunación",
+            "codigo bpim": "2024-003"
+        },
+        {
+            "eje": "Desarrollo Económico",
+            "sector": "Agricultura",
+            "meta de producto": "Asistencia técnica a 200 familias campesinas",
+            "codigo bpim": "2024-004"
+        },
+        {
+            "eje": "Educación de Calidad",
+            "sector": "Educación",
+            "meta de producto": "Mejoramiento de 10 sedes educativas rurales",
+            "codigo bpim": "2024-005"
+        }
+    ]
@@ -7,9 +7,7 @@ def get_user_preferences(session):
     """
     Obtiene las preferencias del usuario desde la sesión y BD
     """
-    from flask import current_app
-    from app import db
-    from app.models.usuario import Usuario
+    from app.utils.usuario_actual import obtener as obtener_usuario_actual
     
     default_prefs = {
         'tema': 'light',
@@ -24,10 +22,9 @@ def get_user_preferences(session):
         return default_prefs
     
     try:
-        user = Usuario.query.filter_by(usuario=session['user']).first()
+        user = obtener_usuario_actual(session)
         if user:
-            prefs = user.get_preferencias()
-            return {**default_prefs, **prefs}
+            return {**default_prefs, **user.preferencias}
     except:
         pass
     
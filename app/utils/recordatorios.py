@@ -0,0 +1,75 @@
+"""
+Recordatorios del calendario enviados por el stream de eventos
+Un hilo por worker revisa cada minuto los eventos que entran en su ventana de
+notificación (notificacion_minutos antes del inicio). Cada evento se reclama
+con un UPDATE sobre notificacion_enviada, así que aunque varios workers
+revisen a la vez, el recordatorio se publica una sola vez. Los avisos de
+30/15/5..1 minutos y de eventos pendientes los sigue calculando el navegador
+(base.html) con la lista de /eventos/proximos.
+"""
+import time
+import logging
+import datetime
+import threading
+
+from app.utils.event_stream import publish
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_SEGUNDOS = 60
+VENTANA_MAX = datetime.timedelta(days=1)     # notificacion_minutos máximo razonable
+TOLERANCIA = datetime.timedelta(minutes=5)   # no avisar eventos que ya empezaron hace rato
+
+_iniciado = False
+_lock = threading.Lock()
+
+
+def revisar(app):
+    """Publica los recordatorios pendientes; devuelve cuántos se enviaron"""
+    from app import db
+    from app.models.calendario import EventoCalendario
+
+    enviados = 0
+    with app.app_context():
+        ahora = datetime.datetime.now()
+        candidatos = EventoCalendario.query.filter(
+            EventoCalendario.completado.is_(False),
+            EventoCalendario.notificacion_enviada.is_(False),
+            EventoCalendario.fecha_inicio >= ahora - TOLERANCIA,
+            EventoCalendario.fecha_inicio <= ahora + VENTANA_MAX,
+        ).all()
+        for evento in candidatos:
+            aviso = evento.fecha_inicio - datetime.timedelta(minutes=evento.notificacion_minutos or 0)
+            if aviso > ahora:
+                continue
+            reclamado = EventoCalendario.query.filter_by(id=evento.id, notificacion_enviada=False).update(
+                {'notificacion_enviada': True}, synchronize_session=False
+            )
+            db.session.commit()
+            if reclamado:
+                publish(evento.usuario_id, 'recordatorio', evento.to_dict(), app=app)
+                enviados += 1
+        db.session.remove()
+    return enviados
+
+
+def _bucle(app):
+    while True:
+        try:
+            n = revisar(app)
+            if n:
+                logger.info(f"[RECORDATORIOS] {n} recordatorios publicados")
+        except Exception as e:
+            logger.error(f"[RECORDATORIOS] Error revisando eventos: {e}")
+        time.sleep(INTERVALO_SEGUNDOS)
+
+
+def iniciar(app):
+    """Arranca el hilo de recordatorios de este worker (una sola vez)"""
+    global _iniciado
+    if _iniciado:
+        return
+    with _lock:
+        if not _iniciado:
+            _iniciado = True
+            threading.Thread(target=_bucle, args=(app,), name='recordatorios', daemon=True).start()
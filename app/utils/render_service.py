@@ -0,0 +1,292 @@
+"""
+Servicio de renderizado de PDFs pesados en un pool de procesos
+Los trabajos se ejecutan fuera del hilo del request; su estado y el PDF
+resultante quedan en disco (DOCUMENTOS_DIR/jobs) para que cualquier worker de
+gunicorn pueda responder /api/jobs/<id>. No requiere broker externo.
+Un lote lo sigue un hilo del worker que lo creó; si ese proceso muere (o el
+lote deja de dar señales por RENDER_LOTE_INACTIVIDAD segundos) get_job lo
+marca como error en vez de dejarlo 'procesando' para siempre.
+"""
+import io
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, request, session, jsonify, send_file, url_for
+
+from app.utils import metricas
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+
+ESTADO_EN_COLA = 'en_cola'
+ESTADO_PROCESANDO = 'procesando'
+ESTADO_TERMINADO = 'terminado'
+ESTADO_ERROR = 'error'
+
+LATIDO_LOTE_SEGUNDOS = 60   # el hilo del lote actualiza el estado al menos con esta frecuencia
+
+
+def jobs_dir(app=None):
+    app = app or current_app
+    path = os.path.join(str(app.config['DOCUMENTOS_DIR']), 'jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _update_status(directory, job_id, **cambios):
+    path = os.path.join(directory, f"{job_id}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {'id': job_id}
+    data.update(cambios)
+    data['actualizado'] = time.time()
+    _write_json(path, data)
+    return data
+
+
+def _run_job(directory, job_id, func, args):
+    """Se ejecuta en el proceso hijo: renderiza y deja el PDF en disco"""
+    _update_status(directory, job_id, estado=ESTADO_PROCESANDO)
+    inicio = time.time()
+    try:
+        data = func(*args)
+        destino = os.path.join(directory, f"{job_id}.pdf")
+        tmp = f"{destino}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, destino)
+        _update_status(directory, job_id, estado=ESTADO_TERMINADO,
+                       bytes=len(data), segundos=round(time.time() - inicio, 3))
+        return data
+    except Exception as e:
+        _update_status(directory, job_id, estado=ESTADO_ERROR, error=str(e))
+        raise
+
+
+def _medir(future):
+    """Registra en las métricas el tiempo del trabajo (cola + render) al terminar"""
+    inicio = time.perf_counter()
+
+    def _terminado(f):
+        error = f.cancelled() or f.exception() is not None
+        metricas.observar('pdf', time.perf_counter() - inicio, error=error)
+
+    future.add_done_callback(_terminado)
+    return future
+
+
+def _get_executor(app):
+    global _executor
+    with _lock:
+        if _executor is None:
+            workers = int(app.config.get('RENDER_POOL_WORKERS', 2))
+            # spawn: el hijo no hereda conexiones de BD ni hilos del proceso web
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"[RENDER] Pool de renderizado iniciado ({workers} procesos)")
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _purge_old_jobs(directory, ttl):
+    limite = time.time() - ttl
+    try:
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) < limite:
+                os.remove(path)
+    except OSError as e:
+        logger.warning(f"[RENDER] No se pudieron purgar trabajos viejos: {e}")
+
+
+def submit(func, *args, filename='documento.pdf'):
+    """
+    Encola `func(*args)` (debe devolver bytes del PDF y ser importable a nivel
+    de módulo). Devuelve (job_id, future).
+    """
+    app = current_app._get_current_object()
+    directory = jobs_dir(app)
+    _purge_old_jobs(directory, int(app.config.get('RENDER_JOB_TTL', 3600)))
+
+    job_id = uuid.uuid4().hex
+    _write_json(os.path.join(directory, f"{job_id}.json"), {
+        'id': job_id,
+        'estado': ESTADO_EN_COLA,
+        'filename': filename,
+        'usuario': session.get('user'),
+        'creado': time.time(),
+        'actualizado': time.time(),
+    })
+    try:
+        future = _medir(_get_executor(app).submit(_run_job, directory, job_id, func, args))
+    except BrokenProcessPool:
+        _reset_executor()
+        future = _medir(_get_executor(app).submit(_run_job, directory, job_id, func, args))
+    return job_id, future
+
+
+def submit_batch(func, items, on_finish=None, **meta):
+    """
+    Reparte `func(*args)` para cada (clave, args) de `items` entre los procesos
+    del pool. Un hilo del proceso web registra el avance (completados/fallidos)
+    a medida que terminan y al final llama on_finish(claves_ok, errores) dentro
+    de un app context. Devuelve el job_id.
+    """
+    app = current_app._get_current_object()
+    directory = jobs_dir(app)
+    _purge_old_jobs(directory, int(app.config.get('RENDER_JOB_TTL', 3600)))
+
+    job_id = uuid.uuid4().hex
+    estado = dict(meta)
+    estado.update({
+        'id': job_id,
+        'tipo': 'lote',
+        'estado': ESTADO_EN_COLA,
+        'total': len(items),
+        'completados': 0,
+        'fallidos': 0,
+        'usuario': session.get('user'),
+        'propietario_pid': os.getpid(),
+        'propietario_host': socket.gethostname(),
+        'creado': time.time(),
+        'actualizado': time.time(),
+    })
+    _write_json(os.path.join(directory, f"{job_id}.json"), estado)
+
+    try:
+        executor = _get_executor(app)
+        futures = {_medir(executor.submit(func, *args)): clave for clave, args in items}
+    except BrokenProcessPool:
+        _reset_executor()
+        executor = _get_executor(app)
+        futures = {_medir(executor.submit(func, *args)): clave for clave, args in items}
+
+    def _seguir():
+        ok, errores = [], []
+        _update_status(directory, job_id, estado=ESTADO_PROCESANDO)
+        pendientes = set(futures)
+        while pendientes:
+            hechos, pendientes = wait(pendientes, timeout=LATIDO_LOTE_SEGUNDOS, return_when=FIRST_COMPLETED)
+            for future in hechos:
+                clave = futures[future]
+                try:
+                    future.result()
+                    ok.append(clave)
+                except Exception as e:
+                    errores.append(f"{clave}: {e}")
+                    logger.error(f"[RENDER] Lote {job_id}, elemento {clave}: {e}")
+            # También sirve de latido aunque no haya terminado ningún elemento
+            _update_status(directory, job_id, completados=len(ok), fallidos=len(errores))
+
+        try:
+            if on_finish is not None:
+                with app.app_context():
+                    on_finish(ok, errores)
+            _update_status(directory, job_id, estado=ESTADO_TERMINADO,
+                           resultados=ok, errores=errores)
+        except Exception as e:
+            logger.error(f"[RENDER] Error cerrando lote {job_id}: {e}", exc_info=True)
+            _update_status(directory, job_id, estado=ESTADO_ERROR, error=str(e),
+                           resultados=ok, errores=errores)
+
+    threading.Thread(target=_seguir, name=f"lote-{job_id[:8]}", daemon=True).start()
+    return job_id
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _lote_huerfano(job):
+    """Motivo por el que un lote sin terminar ya no avanzará, o None"""
+    if job.get('tipo') != 'lote' or job.get('estado') not in (ESTADO_EN_COLA, ESTADO_PROCESANDO):
+        return None
+    pid = job.get('propietario_pid')
+    if pid and job.get('propietario_host') == socket.gethostname() and not _proceso_vivo(pid):
+        return 'El proceso que generaba el lote terminó; vuelva a generarlo'
+    inactividad = float(current_app.config.get('RENDER_LOTE_INACTIVIDAD', 900))
+    if time.time() - float(job.get('actualizado') or 0) > inactividad:
+        return 'El lote dejó de avanzar; vuelva a generarlo'
+    return None
+
+
+def get_job(job_id):
+    """Estado del trabajo (dict) o None si no existe"""
+    if not job_id.isalnum():
+        return None
+    directory = jobs_dir()
+    path = os.path.join(directory, f"{job_id}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    motivo = _lote_huerfano(job)
+    if motivo:
+        logger.warning(f"[RENDER] Lote {job_id} huérfano: {motivo}")
+        job = _update_status(directory, job_id, estado=ESTADO_ERROR, error=motivo)
+    return job
+
+
+def job_pdf_path(job_id):
+    return os.path.join(jobs_dir(), f"{job_id}.pdf")
+
+
+def render_response(func, *args, filename='documento.pdf'):
+    """
+    Respuesta estándar para endpoints de PDF pesados.
+    - Sin ?async=1 se espera el resultado completo (compatibilidad con enlaces).
+    - Con ?async=1 se espera como máximo RENDER_SYNC_TIMEOUT segundos (camino
+      rápido para documentos cortos); si no alcanza se responde 202 con el id
+      del trabajo para consultar /api/jobs/<id>.
+    """
+    job_id, future = submit(func, *args, filename=filename)
+    asincrono = request.args.get('async') in ('1', 'true')
+    timeout = float(current_app.config.get('RENDER_SYNC_TIMEOUT', 3)) if asincrono else None
+    try:
+        data = future.result(timeout=timeout)
+    except FutureTimeout:
+        return jsonify({
+            'job_id': job_id,
+            'estado': ESTADO_EN_COLA,
+            'status_url': url_for('jobs_api.estado', job_id=job_id),
+        }), 202
+    except BrokenProcessPool:
+        _reset_executor()
+        raise
+    return send_file(io.BytesIO(data), mimetype='application/pdf',
+                     as_attachment=True, download_name=filename)
@@ -1,6 +1,53 @@
 from app import db
 from app.models.metas import MetaPlan
 import datetime as dt
+import logging
+import os
+
+
+def seed_usuarios():
+    """Crea el usuario admin y los usuarios demo si no existe el admin"""
+    from app.models.usuario import Usuario
+
+    try:
+        admin = Usuario.query.filter_by(usuario='admin').first()
+        if not admin:
+            logging.warning("[RAILWAY LOG] Creando usuario admin por defecto...")
+            admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
+
+            admin = Usuario(
+                usuario='admin',
+                nombre='Administrador',
+                apellidos='Sistema',
+                role='admin',
+                email=None  # SIN EMAIL POR DEFECTO
+            )
+            admin.set_password(admin_password)
+            db.session.add(admin)
+
+            # Crear usuarios demo SIN EMAILS
+            demo_users = [
+                ('planeacion', os.environ.get('PLANEACION_PASSWORD', 'planeacion123'), 'Planeación', 'Municipal', 'planeacion'),
+                ('gobierno', os.environ.get('GOBIERNO_PASSWORD', 'gobierno123'), 'Gobierno', 'Municipal', 'gobierno')
+            ]
+            for u, p, n, a, r in demo_users:
+                if not Usuario.query.filter_by(usuario=u).first():
+                    nuevo = Usuario(usuario=u, nombre=n, apellidos=a, role=r, email=None)  # SIN EMAIL
+                    nuevo.set_password(p)
+                    db.session.add(nuevo)
+
+            try:
+                db.session.commit()
+                logging.info("[RAILWAY LOG] Usuarios creados correctamente")
+            except Exception as commit_error:
+                logging.warning(f"[RAILWAY] Algunos usuarios ya existían: {commit_error}")
+                db.session.rollback()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"[RAILWAY ERROR] Error inicializando DB: {e}")
+        return False
+
 
 def seed_metas():
     """Inicializa metas del plan de desarrollo si no existen"""
@@ -15,14 +15,15 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-try:
-    import pyotp
-    import qrcode
-    from io import BytesIO
-    import base64
-    TOTP_AVAILABLE = True
-except ImportError:
-    TOTP_AVAILABLE = False
+from io import BytesIO
+import base64
+from .lazy import lazy_import
+from .metricas import medir
+
+# pyotp/qrcode se importan al generar el primer secreto o QR
+pyotp = lazy_import('pyotp')
+qrcode = lazy_import('qrcode')
+TOTP_AVAILABLE = pyotp is not None and qrcode is not None
 
 class PasswordValidator:
     """Validador de fortaleza de contraseñas"""
@@ -204,7 +205,7 @@ class EmailService:
                     print("   ⚠️ Falló API, intentando SMTP...")
 
             print("   ⏳ Conectando a SMTP...")
-            with smtplib.SMTP(smtp_server, int(smtp_port), timeout=10) as server:
+            with medir('smtp'), smtplib.SMTP(smtp_server, int(smtp_port), timeout=10) as server:
                 print("   ✅ Conectado")
                 server.starttls()
                 print("   ✅ TLS activado")
@@ -287,7 +288,7 @@ class EmailService:
             msg.attach(MIMEText(html, 'html'))
             
             print("   ⏳ Enviando vía SMTP...")
-            with smtplib.SMTP(smtp_server, int(smtp_port), timeout=10) as server:
+            with medir('smtp'), smtplib.SMTP(smtp_server, int(smtp_port), timeout=10) as server:
                 server.starttls()
                 server.login(smtp_user, smtp_password)
                 server.send_message(msg)
@@ -336,7 +337,7 @@ class EmailService:
             original_timeout = socket.getdefaulttimeout()
             try:
                 socket.setdefaulttimeout(5)
-                with smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
+                with medir('smtp'), smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
                     server.starttls()
                     server.login(smtp_user, smtp_password)
                     server.send_message(msg)
@@ -385,7 +386,7 @@ class EmailService:
             original_timeout = socket.getdefaulttimeout()
             try:
                 socket.setdefaulttimeout(5)
-                with smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
+                with medir('smtp'), smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
                     server.starttls()
                     server.login(smtp_user, smtp_password)
                     server.send_message(msg)
@@ -436,7 +437,7 @@ class EmailService:
             original_timeout = socket.getdefaulttimeout()
             try:
                 socket.setdefaulttimeout(5)
-                with smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
+                with medir('smtp'), smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
                     server.starttls()
                     server.login(smtp_user, smtp_password)
                     server.send_message(msg)
@@ -519,7 +520,7 @@ class EmailService:
             original_timeout = socket.getdefaulttimeout()
             try:
                 socket.setdefaulttimeout(5)
-                with smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
+                with medir('smtp'), smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
                     server.starttls()
                     server.login(smtp_user, smtp_password)
                     server.send_message(msg)
@@ -585,7 +586,7 @@ class EmailService:
             original_timeout = socket.getdefaulttimeout()
             try:
                 socket.setdefaulttimeout(5)
-                with smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
+                with medir('smtp'), smtplib.SMTP(smtp_server, smtp_port, timeout=5) as server:
                     server.starttls()
                     server.login(smtp_user, smtp_password)
                     server.send_message(msg)
@@ -808,7 +809,7 @@ class TOTPHelper:
             msg['To'] = email_admin
             msg.attach(MIMEText(html, 'html'))
             
-            with smtplib.SMTP(smtp_server, int(smtp_port), timeout=10) as server:
+            with medir('smtp'), smtplib.SMTP(smtp_server, int(smtp_port), timeout=10) as server:
                 server.starttls()
                 server.login(smtp_user, smtp_password)
                 server.send_message(msg)
@@ -0,0 +1,250 @@
+"""
+Caché de datasets derivados (DataFrames + índices) compartida entre workers
+Dos niveles:
+  1. Memoria del proceso: LRU acotada por número de entradas y por bytes
+     (tamaño del pickle), así un worker no retiene datasets que ya no usa.
+  2. SQLite en CACHE_DIR/datasets.sqlite: el valor ya construido en pickle,
+     acotado por bytes (se desalojan las entradas menos usadas). Un worker
+     nuevo o recién reiniciado lo deserializa en vez de reconstruirlo.
+Cada entrada tiene un nombre y una versión (normalmente el (mtime, tamaño) del
+archivo fuente); una versión distinta reemplaza la anterior. Las fallas en
+frío se resuelven en un solo vuelo: dentro del proceso con un lock por nombre
+y entre workers con un flock sobre CACHE_DIR/datasets.locks/<nombre>.lock,
+de modo que el dataset se construye una sola vez y los demás lo leen del
+nivel 2.
+"""
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo vuelo único dentro del proceso
+    fcntl = None
+
+from app.utils.static_payload import cache_dir
+
+logger = logging.getLogger(__name__)
+
+DB_NOMBRE = 'datasets.sqlite'
+MAX_ENTRADAS_MEMORIA = 32
+
+_lock = threading.Lock()
+_memoria = OrderedDict()   # nombre -> (versión, valor, bytes)
+_bytes_memoria = 0
+_vuelos = {}               # nombre -> lock del vuelo único
+_stats = {'memoria': 0, 'disco': 0, 'construidos': 0, 'desalojados': 0}
+
+
+def _limites():
+    cfg = current_app.config
+    mb = 1024 * 1024
+    return (int(cfg.get('DATASET_CACHE_MEMORIA_MB', 256)) * mb,
+            int(cfg.get('DATASET_CACHE_DISCO_MB', 512)) * mb)
+
+
+def _version(version):
+    return repr(version)
+
+
+# --- Nivel 1: memoria del proceso ---
+
+def _memoria_get(nombre, version):
+    with _lock:
+        entrada = _memoria.get(nombre)
+        if entrada is None or entrada[0] != version:
+            return None
+        _memoria.move_to_end(nombre)
+        _stats['memoria'] += 1
+        return entrada
+
+
+def _memoria_put(nombre, version, valor, tamano, max_bytes):
+    global _bytes_memoria
+    with _lock:
+        anterior = _memoria.pop(nombre, None)
+        if anterior is not None:
+            _bytes_memoria -= anterior[2]
+        _memoria[nombre] = (version, valor, tamano)
+        _bytes_memoria += tamano
+        # Siempre se conserva la entrada recién puesta
+        while len(_memoria) > 1 and (len(_memoria) > MAX_ENTRADAS_MEMORIA or _bytes_memoria > max_bytes):
+            viejo, (_, _, bytes_viejo) = _memoria.popitem(last=False)
+            _bytes_memoria -= bytes_viejo
+            _stats['desalojados'] += 1
+            logger.info(f"[DATASETS] '{viejo}' desalojado de memoria ({bytes_viejo // 1024} KB)")
+
+
+# --- Nivel 2: SQLite compartido ---
+
+def _conectar():
+    conn = sqlite3.connect(os.path.join(cache_dir(), DB_NOMBRE), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entradas ("
+        " nombre TEXT PRIMARY KEY, version TEXT NOT NULL, valor BLOB NOT NULL,"
+        " bytes INTEGER NOT NULL, usado REAL NOT NULL)"
+    )
+    return conn
+
+
+def _disco_get(nombre, version):
+    """(valor, bytes) guardado para esa versión, o None"""
+    try:
+        conn = _conectar()
+        try:
+            fila = conn.execute(
+                "SELECT valor FROM entradas WHERE nombre = ? AND version = ?", (nombre, version)
+            ).fetchone()
+            if fila is None:
+                return None
+            conn.execute("UPDATE entradas SET usado = ? WHERE nombre = ?", (time.time(), nombre))
+            conn.commit()
+        finally:
+            conn.close()
+        blob = fila[0]
+        return pickle.loads(blob), len(blob)
+    except Exception as e:
+        logger.warning(f"[DATASETS] No se pudo leer '{nombre}' de la caché compartida: {e}")
+        return None
+
+
+def _disco_put(nombre, version, blob, max_bytes):
+    if len(blob) > max_bytes:
+        logger.warning(f"[DATASETS] '{nombre}' ({len(blob) // 1024} KB) supera el límite de disco; no se comparte")
+        return
+    try:
+        conn = _conectar()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entradas (nombre, version, valor, bytes, usado) VALUES (?, ?, ?, ?, ?)",
+                (nombre, version, sqlite3.Binary(blob), len(blob), time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entradas").fetchone()[0]
+            if total > max_bytes:
+                for viejo, tamano in conn.execute(
+                    "SELECT nombre, bytes FROM entradas WHERE nombre != ? ORDER BY usado", (nombre,)
+                ).fetchall():
+                    conn.execute("DELETE FROM entradas WHERE nombre = ?", (viejo,))
+                    total -= tamano
+                    logger.info(f"[DATASETS] '{viejo}' desalojado de la caché compartida")
+                    if total <= max_bytes:
+                        break
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[DATASETS] No se pudo guardar '{nombre}' en la caché compartida: {e}")
+
+
+# --- Vuelo único ---
+
+def _lock_vuelo(nombre):
+    with _lock:
+        return _vuelos.setdefault(nombre, threading.Lock())
+
+
+@contextmanager
+def _lock_archivo(nombre):
+    """Exclusión entre workers mientras uno construye `nombre`"""
+    if fcntl is None:
+        yield
+        return
+    carpeta = os.path.join(cache_dir(), 'datasets.locks')
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, hashlib.sha1(nombre.encode('utf-8')).hexdigest()[:16] + '.lock')
+    with open(ruta, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def obtener(nombre, version, construir):
+    """
+    Valor de `nombre` para `version`: desde memoria, desde la caché compartida
+    o construido con `construir()` (una sola vez aunque lleguen varios
+    requests o workers a la vez). Las excepciones de `construir` se propagan
+    y no se guarda nada.
+    """
+    version = _version(version)
+    entrada = _memoria_get(nombre, version)
+    if entrada is not None:
+        return entrada[1]
+
+    max_memoria, max_disco = _limites()
+    with _lock_vuelo(nombre):
+        entrada = _memoria_get(nombre, version)
+        if entrada is not None:
+            return entrada[1]
+
+        leido = _disco_get(nombre, version)
+        if leido is None:
+            with _lock_archivo(nombre):
+                # Otro worker pudo terminar de construirlo mientras se esperaba
+                leido = _disco_get(nombre, version)
+                if leido is None:
+                    inicio = time.perf_counter()
+                    valor = construir()
+                    try:
+                        blob = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+                    except Exception as e:
+                        logger.warning(f"[DATASETS] '{nombre}' no se puede serializar; solo en memoria: {e}")
+                        blob = b''
+                    if blob:
+                        _disco_put(nombre, version, blob, max_disco)
+                    logger.info(f"[DATASETS] '{nombre}' construido en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+                    leido = (valor, len(blob))
+                    origen = 'construidos'
+                else:
+                    origen = 'disco'
+        else:
+            origen = 'disco'
+        with _lock:
+            _stats[origen] += 1
+
+        valor, tamano = leido
+        _memoria_put(nombre, version, valor, tamano, max_memoria)
+        return valor
+
+
+def invalidar(nombre=None):
+    """Descarta `nombre` (o todo) de la memoria del proceso y de la caché compartida"""
+    global _bytes_memoria
+    with _lock:
+        nombres = [nombre] if nombre else list(_memoria)
+        for n in nombres:
+            entrada = _memoria.pop(n, None)
+            if entrada is not None:
+                _bytes_memoria -= entrada[2]
+    try:
+        conn = _conectar()
+        try:
+            if nombre:
+                conn.execute("DELETE FROM entradas WHERE nombre = ?", (nombre,))
+            else:
+                conn.execute("DELETE FROM entradas")
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"[DATASETS] No se pudo invalidar la caché compartida: {e}")
+
+
+def estadisticas():
+    """Aciertos por nivel, construcciones y ocupación de memoria de este proceso"""
+    with _lock:
+        return {
+            **_stats,
+            'entradas_memoria': list(_memoria),
+            'bytes_memoria': _bytes_memoria,
+        }
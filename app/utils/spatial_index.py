@@ -0,0 +1,95 @@
+"""
+Índice espacial STR (Sort-Tile-Recursive) en memoria
+Árbol R empaquetado y estático para consultas por punto y por rectángulo
+sobre capas de predios; sin dependencias externas.
+"""
+import math
+
+NODE_CAPACITY = 16
+
+
+class STRTree:
+    """
+    Árbol R de solo lectura construido con STR.
+    items: lista de (bbox, valor) con bbox = (minx, miny, maxx, maxy).
+    """
+
+    def __init__(self, items, capacity=NODE_CAPACITY):
+        self.capacity = capacity
+        self.size = len(items)
+        nivel = [(bbox, valor) for bbox, valor in items]
+        self.leaf = True
+        self.root = None
+        if not nivel:
+            return
+        hojas = True
+        while True:
+            nodos = self._pack(nivel, hojas)
+            if len(nodos) == 1:
+                self.root = nodos[0]
+                break
+            nivel = nodos
+            hojas = False
+
+    def _pack(self, entradas, hojas):
+        """Agrupa entradas en nodos: rebanadas por x y, dentro, por y"""
+        cap = self.capacity
+        n_nodos = math.ceil(len(entradas) / cap)
+        n_rebanadas = math.ceil(math.sqrt(n_nodos))
+        por_rebanada = n_rebanadas * cap
+
+        entradas = sorted(entradas, key=lambda e: (e[0][0] + e[0][2]))
+        nodos = []
+        for i in range(0, len(entradas), por_rebanada):
+            rebanada = sorted(entradas[i:i + por_rebanada], key=lambda e: (e[0][1] + e[0][3]))
+            for j in range(0, len(rebanada), cap):
+                hijos = rebanada[j:j + cap]
+                bbox = (
+                    min(h[0][0] for h in hijos), min(h[0][1] for h in hijos),
+                    max(h[0][2] for h in hijos), max(h[0][3] for h in hijos),
+                )
+                nodos.append((bbox, (hojas, hijos)))
+        return nodos
+
+    def query(self, minx, miny, maxx, maxy):
+        """Valores cuyo bbox intersecta el rectángulo"""
+        if self.root is None:
+            return []
+        resultado = []
+        pila = [self.root]
+        while pila:
+            bbox, (hojas, hijos) = pila.pop()
+            if bbox[2] < minx or bbox[0] > maxx or bbox[3] < miny or bbox[1] > maxy:
+                continue
+            for hbox, valor in hijos:
+                if hbox[2] < minx or hbox[0] > maxx or hbox[3] < miny or hbox[1] > maxy:
+                    continue
+                if hojas:
+                    resultado.append(valor)
+                else:
+                    pila.append((hbox, valor))
+        return resultado
+
+    def query_point(self, x, y):
+        return self.query(x, y, x, y)
+
+
+def point_in_ring(x, y, ring):
+    """Ray casting (par-impar)"""
+    dentro = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            dentro = not dentro
+        j = i
+    return dentro
+
+
+def point_in_polygons(x, y, polygons):
+    """polygons: lista de polígonos, cada uno lista de anillos (exterior + huecos)"""
+    for rings in polygons:
+        if rings and point_in_ring(x, y, rings[0]) and not any(point_in_ring(x, y, h) for h in rings[1:]):
+            return True
+    return False
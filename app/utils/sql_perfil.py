@@ -0,0 +1,154 @@
+"""
+Perfil de SQL por request: consultas, tiempo de base de datos y N+1
+Cuenta cada sentencia ejecutada durante el request (ORM por eventos del
+engine y SQL crudo por la conexión de sqlite_pool) y agrupa por texto de la
+sentencia: con parámetros enlazados, un N+1 aparece como la misma sentencia
+repetida. Al terminar el request:
+  - agrega el header Server-Timing (db y app) para verlo en el navegador,
+  - registra en el log las sentencias más repetidas que pasan el umbral, con
+    un resumen de la pila (solo frames de app/) capturado en la repetición
+    que cruza el umbral; los parámetros nunca se registran.
+El costo por consulta es un perf_counter y un dict, apto para producción.
+"""
+import os
+import time
+import logging
+import traceback
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils import metricas
+
+logger = logging.getLogger(__name__)
+
+MAX_SQL_LOG = 160
+FRAMES_PILA = 4
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_PROPIOS = ('sql_perfil.py', 'sqlite_pool.py', 'metricas.py')
+_registrado = False
+
+
+class PerfilRequest:
+    __slots__ = ('inicio', 'consultas', 'segundos', 'sentencias')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.segundos = 0.0
+        self.sentencias = {}   # sql -> [veces, segundos, pila]
+
+
+def _pila():
+    """Últimos frames del código de la app que llevaron a la consulta"""
+    frames = [
+        f for f in traceback.extract_stack()
+        if f.filename.startswith(_APP_DIR) and not f.filename.endswith(_PROPIOS)
+    ]
+    return ' <- '.join(
+        f"{os.path.relpath(f.filename, _APP_DIR)}:{f.lineno} {f.name}" for f in reversed(frames[-FRAMES_PILA:])
+    )
+
+
+def registrar(sql, segundos):
+    """Anota una sentencia en el perfil del request actual (si lo hay)"""
+    if not has_request_context():
+        return
+    perfil = g.get('_sql_perfil')
+    if perfil is None:
+        return
+    perfil.consultas += 1
+    perfil.segundos += segundos
+    datos = perfil.sentencias.get(sql)
+    if datos is None:
+        perfil.sentencias[sql] = [1, segundos, None]
+        return
+    datos[0] += 1
+    datos[1] += segundos
+    if datos[0] == current_app.config.get('SQL_N1_UMBRAL', 5):
+        datos[2] = _pila()
+
+
+# --- Eventos del engine (ORM) ---
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_sql_perfil_inicio', []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    pila = conn.info.get('_sql_perfil_inicio')
+    if pila:
+        registrar(statement, time.perf_counter() - pila.pop())
+
+
+def _error(contexto):
+    # Sin esto la pila de la conexión (que vuelve al pool) crece con cada sentencia fallida
+    pila = contexto.connection.info.get('_sql_perfil_inicio') if contexto.connection is not None else None
+    if pila:
+        registrar(contexto.statement, time.perf_counter() - pila.pop())
+
+
+# --- Ciclo del request ---
+
+def _iniciar():
+    g._sql_perfil = PerfilRequest()
+
+
+def _resumen(sql):
+    sql = ' '.join(str(sql).split())
+    return sql if len(sql) <= MAX_SQL_LOG else sql[:MAX_SQL_LOG] + '…'
+
+
+def _finalizar(response):
+    perfil = g.pop('_sql_perfil', None)
+    if perfil is None:
+        return response
+    try:
+        config = current_app.config
+        endpoint = request.endpoint or '<sin_ruta>'
+        total_ms = (time.perf_counter() - perfil.inicio) * 1000
+        db_ms = perfil.segundos * 1000
+
+        if config.get('SQL_SERVER_TIMING', True):
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={db_ms:.1f};desc="{perfil.consultas} consultas", app;dur={total_ms:.1f}'
+            )
+        metricas.SQL_CONSULTAS.observar(perfil.consultas, endpoint)
+
+        umbral = config.get('SQL_N1_UMBRAL', 5)
+        repetidas = sorted(
+            ((sql, d) for sql, d in perfil.sentencias.items() if d[0] >= umbral),
+            key=lambda item: (-item[1][0], -item[1][1]),
+        )
+        if repetidas:
+            metricas.SQL_N1.inc(endpoint)
+            detalle = '\n'.join(
+                f"  {veces}x {segundos * 1000:.1f} ms  {_resumen(sql)}\n    en {pila or '?'}"
+                for sql, (veces, segundos, pila) in repetidas[:3]
+            )
+            logger.warning(
+                f"[SQL] Posible N+1 en {endpoint}: {perfil.consultas} consultas, "
+                f"{db_ms:.1f} ms de {total_ms:.1f} ms\n{detalle}"
+            )
+        elif perfil.consultas >= config.get('SQL_ALERTA_CONSULTAS', 50):
+            logger.warning(f"[SQL] {endpoint}: {perfil.consultas} consultas, {db_ms:.1f} ms de {total_ms:.1f} ms")
+    except Exception as e:
+        logger.warning(f"[SQL] No se pudo cerrar el perfil del request: {e}")
+    return response
+
+
+def registrar_perfil(app):
+    """Activa el perfil por request (SQL_PERFIL=0 lo desactiva)"""
+    global _registrado
+    if not app.config.get('SQL_PERFIL', True):
+        return
+    app.before_request(_iniciar)
+    app.after_request(_finalizar)
+    if not _registrado:
+        event.listen(Engine, 'before_cursor_execute', _antes)
+        event.listen(Engine, 'after_cursor_execute', _despues)
+        event.listen(Engine, 'handle_error', _error)
+        _registrado = True
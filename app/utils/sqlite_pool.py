@@ -0,0 +1,206 @@
+"""
+Pool de conexiones SQLite compartido
+Una conexión por request (flask.g), reutilizada desde un pool con WAL y pragmas
+ajustados. Si SQLAlchemy apunta al mismo archivo data.db se usa el pool del
+engine de `db`, de modo que SQL crudo y ORM comparten conexiones.
+"""
+import os
+import time
+import sqlite3
+import logging
+
+from flask import current_app, g
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+
+from app.utils import metricas, sql_perfil
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "data.db"
+
+
+def sqlite_path(app=None):
+    """Ruta del archivo SQLite usado por los módulos de SQL crudo"""
+    app = app or current_app
+    # Detectar entorno Railway para usar /tmp
+    if os.environ.get('RAILWAY_ENVIRONMENT'):
+        return os.path.join('/tmp', DB_NAME)
+    return os.path.join(app.root_path, '..', DB_NAME)
+
+
+def _pragmas(config):
+    return (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+        # Valor negativo = tamaño en KiB (no en páginas)
+        f"PRAGMA cache_size=-{int(config.get('SQLITE_CACHE_SIZE_KB', 16000))}",
+    )
+
+
+@event.listens_for(Pool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    """Aplica los pragmas a toda conexión SQLite nueva (pool propio o engine de db)"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    try:
+        config = current_app.config
+    except RuntimeError:
+        config = {}
+    cur = dbapi_connection.cursor()
+    try:
+        for pragma in _pragmas(config):
+            cur.execute(pragma)
+    except Exception as e:
+        logger.warning(f"[SQLITE] No se pudieron aplicar pragmas: {e}")
+    finally:
+        cur.close()
+
+
+@event.listens_for(Pool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    """Restaura row_factory para que SQLAlchemy reciba tuplas planas"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.row_factory = None
+
+
+def _shares_engine(app, path):
+    """True si el engine de SQLAlchemy usa el mismo archivo SQLite"""
+    from app import db
+    try:
+        engine = db.engine
+    except Exception:
+        return None
+    if engine.dialect.name != 'sqlite' or not engine.url.database:
+        return None
+    if os.path.realpath(engine.url.database) != os.path.realpath(path):
+        return None
+    return engine
+
+
+def _get_pool(app):
+    """Devuelve (y crea una sola vez) el origen de conexiones de la app"""
+    pool = app.extensions.get('sqlite_pool')
+    if pool is not None:
+        return pool
+
+    path = sqlite_path(app)
+    engine = _shares_engine(app, path)
+    if engine is not None:
+        pool = engine.raw_connection
+        logger.info("[SQLITE] Usando el pool del engine de SQLAlchemy")
+    else:
+        timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000.0
+        pool = QueuePool(
+            lambda: sqlite3.connect(path, timeout=timeout, check_same_thread=False),
+            pool_size=int(app.config.get('SQLITE_POOL_SIZE', 5)),
+            max_overflow=int(app.config.get('SQLITE_POOL_MAX_OVERFLOW', 10)),
+        ).connect
+        logger.info(f"[SQLITE] Pool propio inicializado en {path}")
+    app.extensions['sqlite_pool'] = pool
+    return pool
+
+
+def _medido(funcion, args):
+    """Ejecuta SQL crudo registrando su tiempo en las métricas y en el perfil del request"""
+    inicio = time.perf_counter()
+    error = False
+    try:
+        return funcion(*args)
+    except BaseException:
+        error = True
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        metricas.observar('db', segundos, error=error)
+        if args:
+            sql_perfil.registrar(args[0], segundos)
+
+
+class _Cursor:
+    """Cursor de sqlite3 con execute/executemany medidos"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, *args):
+        _medido(self._raw.execute, args)
+        return self
+
+    def executemany(self, *args):
+        _medido(self._raw.executemany, args)
+        return self
+
+
+class RequestConnection:
+    """
+    Conexión del pool ligada al request actual.
+    close() conserva la semántica de sqlite3 (descarta lo no confirmado) pero no
+    devuelve la conexión; eso ocurre en el teardown del app context.
+    """
+
+    def __init__(self, proxied):
+        self._proxied = proxied
+        self._raw = getattr(proxied, 'dbapi_connection', None) or proxied.connection
+        self._raw.row_factory = sqlite3.Row
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args):
+        return _Cursor(self._raw.cursor(*args))
+
+    def execute(self, *args):
+        return _medido(self._raw.execute, args)
+
+    def executemany(self, *args):
+        return _medido(self._raw.executemany, args)
+
+    def __enter__(self):
+        return self._raw.__enter__()
+
+    def __exit__(self, *exc):
+        return self._raw.__exit__(*exc)
+
+    def close(self):
+        if self._raw.in_transaction:
+            self._raw.rollback()
+
+    def release(self):
+        try:
+            self.close()
+        finally:
+            self._proxied.close()
+
+
+def get_connection():
+    """Conexión SQLite del request actual (se crea en el primer uso)"""
+    conn = g.get('_sqlite_conn')
+    if conn is None:
+        conn = g._sqlite_conn = RequestConnection(_get_pool(current_app)())
+    return conn
+
+
+def release_connection(exc=None):
+    conn = g.pop('_sqlite_conn', None)
+    if conn is not None:
+        try:
+            conn.release()
+        except Exception as e:
+            logger.warning(f"[SQLITE] Error devolviendo conexión al pool: {e}")
+
+
+def init_sqlite_pool(app):
+    """Registra la devolución automática de conexiones al final de cada request"""
+    app.config.setdefault('SQLITE_POOL_SIZE', 5)
+    app.config.setdefault('SQLITE_POOL_MAX_OVERFLOW', 10)
+    app.teardown_appcontext(release_connection)
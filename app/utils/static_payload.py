@@ -0,0 +1,178 @@
+"""
+Entrega de JSON estático grande (GeoJSON) pre-serializado y pre-comprimido
+El archivo fuente se serializa una sola vez; las variantes identity/gzip/br se
+guardan en CACHE_DIR y se sirven desde mmap (la página de caché del sistema
+operativo se comparte entre workers). Cada variante tiene su propio ETag
+(`"…-gz"`, `"…-br"`) y responde 304 con If-None-Match.
+"""
+import os
+import gzip
+import json
+import mmap
+import logging
+import threading
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+_lock = threading.Lock()
+_payloads = {}
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _map(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PreparedPayload:
+    """Variantes de un JSON fuente, ligadas a su (mtime, tamaño)"""
+
+    def __init__(self, source, cache_dir):
+        st = os.stat(source)
+        self.key = (st.st_mtime_ns, st.st_size)
+        version = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+        self.etags = {'identity': f'"{version}"', 'gzip': f'"{version}-gz"', 'br': f'"{version}-br"'}
+        self._lock = threading.Lock()
+        self._en_uso = 0          # respuestas que todavía leen los mmaps
+        self._reemplazado = False
+        stem = os.path.splitext(os.path.basename(source))[0]
+        base = os.path.join(cache_dir, f"{stem}-{st.st_size:x}-{st.st_mtime_ns:x}.json")
+
+        rutas = {'identity': base, 'gzip': base + '.gz'}
+        if brotli is not None:
+            rutas['br'] = base + '.br'
+
+        if not all(os.path.exists(p) for p in rutas.values()):
+            self._build(source, rutas)
+            self._purge_stale(cache_dir, stem, rutas.values())
+        self.variants = {enc: _map(path) for enc, path in rutas.items()}
+
+    @staticmethod
+    def _build(source, rutas):
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        _write_atomic(rutas['identity'], raw)
+        _write_atomic(rutas['gzip'], gzip.compress(raw, compresslevel=6, mtime=0))
+        if 'br' in rutas:
+            _write_atomic(rutas['br'], brotli.compress(raw, quality=9))
+        logger.info(f"[PAYLOAD] {os.path.basename(source)} serializado: {len(raw)} bytes")
+
+    @staticmethod
+    def _purge_stale(cache_dir, stem, vigentes):
+        """Elimina variantes de versiones anteriores del mismo archivo"""
+        vigentes = {os.path.basename(p) for p in vigentes}
+        for name in os.listdir(cache_dir):
+            if name.startswith(f"{stem}-") and name not in vigentes:
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+
+    def encoding_for(self, accept_encodings):
+        for enc in ('br', 'gzip'):
+            if enc in self.variants and accept_encodings[enc]:
+                return enc
+        return 'identity'
+
+    def response(self, mimetype='application/json'):
+        enc = self.encoding_for(request.accept_encodings)
+        headers = {
+            'ETag': self.etags[enc],
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': 'no-cache',
+        }
+        if self.etags[enc] in request.headers.get('If-None-Match', ''):
+            return Response(status=304, headers=headers)
+
+        body = self.variants[enc]
+        if enc != 'identity':
+            headers['Content-Encoding'] = enc
+        headers['Content-Length'] = str(len(body))
+        return Response(_Cuerpo(self, body), mimetype=mimetype, headers=headers, direct_passthrough=True)
+
+    def _tomar(self):
+        with self._lock:
+            self._en_uso += 1
+
+    def _soltar(self):
+        with self._lock:
+            self._en_uso -= 1
+            cerrar = self._reemplazado and self._en_uso == 0
+        if cerrar:
+            self._cerrar_mmaps()
+
+    def close(self):
+        """Libera los mmaps al reemplazarse (después de la última respuesta en curso)"""
+        with self._lock:
+            self._reemplazado = True
+            cerrar = self._en_uso == 0
+        if cerrar:
+            self._cerrar_mmaps()
+
+    def _cerrar_mmaps(self):
+        for body in self.variants.values():
+            if isinstance(body, mmap.mmap):
+                body.close()
+
+
+class _Cuerpo:
+    """Cuerpo en bloques de CHUNK_SIZE; mantiene vivo el mmap hasta que el servidor cierra la respuesta"""
+
+    def __init__(self, payload, body):
+        self._payload = payload
+        self._body = body
+        self._abierto = True
+        payload._tomar()
+
+    def __iter__(self):
+        body = self._body
+        for i in range(0, len(body), CHUNK_SIZE):
+            yield body[i:i + CHUNK_SIZE]
+
+    def close(self):
+        if self._abierto:
+            self._abierto = False
+            self._payload._soltar()
+
+
+def cache_dir(app=None):
+    app = app or current_app
+    path = str(app.config.get('CACHE_DIR') or os.path.join(str(app.config['DOCUMENTOS_DIR']), 'cache'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_payload(source):
+    """PreparedPayload vigente para `source` (se reconstruye si cambia el archivo)"""
+    source = os.path.realpath(source)
+    st = os.stat(source)
+    key = (st.st_mtime_ns, st.st_size)
+    payload = _payloads.get(source)
+    if payload is not None and payload.key == key:
+        return payload
+    with _lock:
+        payload = _payloads.get(source)
+        if payload is None or payload.key != key:
+            anterior = payload
+            payload = _payloads[source] = PreparedPayload(source, cache_dir())
+            if anterior is not None:
+                anterior.close()
+    return payload
@@ -0,0 +1,110 @@
+"""
+Índice de texto en memoria para coincidencias exactas y parciales
+Pensado para catálogos pequeños (usos del suelo, normatividad): los valores se
+normalizan una sola vez al construir el índice y las consultas no recorren el
+DataFrame.
+"""
+import bisect
+
+# Tipos de coincidencia en orden de preferencia
+EXACTA = 0
+PREFIJO = 1        # el valor empieza por la consulta
+CONTIENE = 2       # la consulta aparece dentro del valor
+CONTENIDO = 3      # el valor aparece dentro de la consulta
+
+
+class TextIndex:
+    """
+    Índice de valores normalizados -> filas.
+    Cada entrada se registra con (prioridad_campo, fila). Las coincidencias se
+    ordenan por (tipo, -longitud del valor si es CONTENIDO, prioridad, fila),
+    de modo que el resultado es determinista.
+    """
+
+    def __init__(self):
+        self._exactos = {}
+        self._sufijos = []  # (sufijo, valor) ordenado, para prefijos y subcadenas
+        self._max_len = 0
+
+    def add(self, valor, prioridad, fila):
+        if not valor:
+            return
+        entradas = self._exactos.get(valor)
+        if entradas is None:
+            entradas = self._exactos[valor] = []
+            self._sufijos.extend((valor[i:], valor) for i in range(len(valor)))
+            self._max_len = max(self._max_len, len(valor))
+        entradas.append((prioridad, fila))
+
+    def freeze(self):
+        """Ordena las estructuras; llamar una vez después de agregar todo"""
+        for entradas in self._exactos.values():
+            entradas.sort()
+        self._sufijos.sort()
+        return self
+
+    def __len__(self):
+        return len(self._exactos)
+
+    def _contienen(self, consulta):
+        """Valores que contienen `consulta` (búsqueda binaria sobre sufijos)"""
+        valores = set()
+        i = bisect.bisect_left(self._sufijos, (consulta,))
+        while i < len(self._sufijos) and self._sufijos[i][0].startswith(consulta):
+            valores.add(self._sufijos[i][1])
+            i += 1
+        return valores
+
+    def _contenidos_en(self, consulta):
+        """Valores indexados que aparecen dentro de `consulta`"""
+        valores = set()
+        n = len(consulta)
+        for inicio in range(n):
+            for fin in range(inicio + 1, min(n, inicio + self._max_len) + 1):
+                if consulta[inicio:fin] in self._exactos:
+                    valores.add(consulta[inicio:fin])
+        return valores
+
+    def exact(self, consulta):
+        """Primera fila (por prioridad) con valor idéntico, o None"""
+        entradas = self._exactos.get(consulta)
+        return entradas[0][1] if entradas else None
+
+    def search(self, consulta, parcial=True):
+        """
+        Lista ordenada de (tipo, valor, prioridad, fila) sin filas repetidas.
+        Con parcial=False solo se consideran coincidencias exactas.
+        """
+        if not consulta:
+            return []
+        candidatos = []
+        for valor in self._contienen(consulta) if parcial else ([consulta] if consulta in self._exactos else []):
+            if valor == consulta:
+                tipo = EXACTA
+            elif valor.startswith(consulta):
+                tipo = PREFIJO
+            else:
+                tipo = CONTIENE
+            for prioridad, fila in self._exactos[valor]:
+                candidatos.append(((tipo, 0, prioridad, fila), valor))
+        if parcial:
+            for valor in self._contenidos_en(consulta):
+                if valor == consulta:
+                    continue
+                for prioridad, fila in self._exactos[valor]:
+                    candidatos.append(((CONTENIDO, -len(valor), prioridad, fila), valor))
+
+        candidatos.sort()
+        vistos = set()
+        resultado = []
+        for (tipo, _, prioridad, fila), valor in candidatos:
+            if fila in vistos:
+                continue
+            vistos.add(fila)
+            resultado.append((tipo, valor, prioridad, fila))
+        return resultado
+
+    def best(self, consulta, parcial=True):
+        """Fila de la mejor coincidencia, o None"""
+        resultado = self.search(consulta, parcial)
+        return resultado[0][3] if resultado else None
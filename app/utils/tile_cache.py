@@ -0,0 +1,267 @@
+"""
+Caché de vector tiles (MVT) en archivos MBTiles
+Cada capa se arma desde un GeoJSON del proyecto; los tiles se generan bajo
+demanda (o con seed_layer) y se guardan comprimidos en un SQLite con el
+esquema MBTiles (CACHE_DIR/<capa>.mbtiles). Si el archivo fuente cambia, la
+caché se vacía y se regenera.
+"""
+import os
+import gzip
+import json
+import sqlite3
+import logging
+import threading
+
+from flask import current_app
+
+from app.utils import mvt
+from app.utils.spatial_index import STRTree, point_in_polygons
+
+logger = logging.getLogger(__name__)
+
+MINZOOM = 10
+MAXZOOM = 16
+
+# Atributos del registro catastral que se publican en los tiles (sin datos
+# personales de los interesados)
+CAMPOS_CATASTRO = (
+    'codigo_predial_nacional', 'codigo_homologado', 'matricula_inmobiliaria',
+    'direccion', 'area_terreno', 'area_construida', 'destino_economico',
+    'condicion_predio', 'tipo_predio',
+)
+
+_lock = threading.Lock()
+_layers = {}
+
+
+def _static_path(*parts):
+    return os.path.join(current_app.root_path, '..', 'static', *parts)
+
+
+def _usos_path():
+    candidatos = [
+        os.path.join(current_app.root_path, 'static', 'geojson', 'usos_predial.geojson'),
+        _static_path('geojson', 'usos_predial.geojson'),
+    ]
+    for ruta in candidatos:
+        if os.path.exists(ruta):
+            return ruta
+    return candidatos[-1]
+
+
+def _registro_path():
+    return _static_path('geojson', 'actualiziacion 2026', 'Registro_catastral_25777.json')
+
+
+def categoria_uso(props):
+    """Categoría con la que el visor colorea y filtra un predio"""
+    return props.get('Subcategor') or props.get('Uso') or props.get('Categoria') or 'Sin categoría'
+
+
+def _norm_codigo(v):
+    return ''.join(ch for ch in str(v or '') if ch.isalnum()).upper()
+
+
+def _registro_por_codigo(path):
+    """codigo_predial_nacional normalizado -> atributos publicables"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    predios = (data.get('registro_catastral') or {}).get('predio') or []
+    index = {}
+    for predio in predios:
+        attrs = {k: predio.get(k) for k in CAMPOS_CATASTRO if predio.get(k) is not None}
+        avaluo = ((predio.get('avaluos_catastrales') or {}).get('avaluo_catastral') or {})
+        if isinstance(avaluo, dict) and avaluo.get('avaluo'):
+            attrs['avaluo'] = avaluo.get('avaluo')
+        for clave in (predio.get('codigo_predial_nacional'), predio.get('codigo_homologado')):
+            if clave:
+                index.setdefault(_norm_codigo(clave), attrs)
+    return index
+
+
+def _features_predios(usos_path, registro_path=None):
+    """Features del GeoJSON de usos; con registro_path se agregan atributos catastrales"""
+    with open(usos_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    registro = _registro_por_codigo(registro_path) if registro_path else None
+    for i, feat in enumerate(data.get('features') or []):
+        props = dict(feat.get('properties') or {})
+        if registro is not None:
+            attrs = registro.get(_norm_codigo(props.get('COD_PRED') or props.get('cod_pred')))
+            if not attrs:
+                continue
+            props = {'COD_PRED': props.get('COD_PRED') or props.get('cod_pred'),
+                     'OBJECTID': props.get('OBJECTID'), **attrs}
+        yield i, props, feat.get('geometry')
+
+
+# Capas publicadas: nombre -> (fuentes, generador de features)
+LAYERS = {
+    'predios': (lambda: [_usos_path()],
+                lambda fuentes: _features_predios(fuentes[0])),
+    'catastro': (lambda: [_usos_path(), _registro_path()],
+                 lambda fuentes: _features_predios(fuentes[0], fuentes[1])),
+}
+
+
+def _source_key(fuentes):
+    partes = []
+    for ruta in fuentes:
+        try:
+            st = os.stat(ruta)
+            partes.append(f"{st.st_size:x}-{st.st_mtime_ns:x}")
+        except OSError:
+            partes.append('0')
+    return '.'.join(partes)
+
+
+class TileLayer:
+    """Capa en memoria (geometrías proyectadas + bbox) y su archivo MBTiles"""
+
+    def __init__(self, name, fuentes, generador, cache_dir):
+        self.name = name
+        self.key = _source_key(fuentes)
+        self.features = []
+        for fid, props, geometry in generador(fuentes):
+            gtype, parts = mvt.project_geometry(geometry)
+            bbox = mvt.bbox_of(gtype, parts) if gtype else None
+            if bbox:
+                self.features.append((fid, props, gtype, parts, bbox))
+
+        if self.features:
+            self.bounds = (
+                min(f[4][0] for f in self.features), min(f[4][1] for f in self.features),
+                max(f[4][2] for f in self.features), max(f[4][3] for f in self.features),
+            )
+        else:
+            self.bounds = None
+
+        self._tree = None
+        self.path = os.path.join(cache_dir, f"{name}.mbtiles")
+        self._init_mbtiles()
+        logger.info(f"[TILES] Capa '{name}' cargada: {len(self.features)} features")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_mbtiles(self):
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+                PRIMARY KEY (zoom_level, tile_column, tile_row))""")
+            row = conn.execute("SELECT value FROM metadata WHERE name = 'source_key'").fetchone()
+            if row is None or row[0] != self.key:
+                # La fuente cambió: se descartan los tiles anteriores
+                conn.execute("DELETE FROM tiles")
+                meta = {
+                    'name': self.name, 'format': 'pbf', 'type': 'overlay',
+                    'minzoom': str(MINZOOM), 'maxzoom': str(MAXZOOM),
+                    'source_key': self.key,
+                    'json': json.dumps({'vector_layers': [{'id': self.name}]}),
+                }
+                if self.bounds:
+                    meta['bounds'] = ','.join(f"{v:.6f}" for v in self.lonlat_bounds())
+                conn.executemany("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)", meta.items())
+                if row is not None:
+                    logger.info(f"[TILES] Fuente de '{self.name}' modificada; caché reiniciada")
+
+    def lonlat_bounds(self):
+        minx, miny, maxx, maxy = self.bounds
+        west, north = mvt.world_to_lonlat(minx, miny)
+        east, south = mvt.world_to_lonlat(maxx, maxy)
+        return west, south, east, north
+
+    @property
+    def tree(self):
+        """Índice espacial STR sobre los bbox (se construye en la primera consulta)"""
+        if self._tree is None:
+            self._tree = STRTree([(f[4], f) for f in self.features])
+        return self._tree
+
+    def features_at(self, lon, lat):
+        """Features cuyo polígono contiene el punto (lon, lat)"""
+        wx, wy = mvt.lonlat_to_world(lon, lat)
+        return [
+            f for f in self.tree.query_point(wx, wy)
+            if f[2] != mvt.GEOM_POLYGON or point_in_polygons(wx, wy, f[3])
+        ]
+
+    def features_in(self, west, south, east, north):
+        """Features cuyo bbox intersecta el rectángulo geográfico"""
+        minx, miny = mvt.lonlat_to_world(west, north)
+        maxx, maxy = mvt.lonlat_to_world(east, south)
+        return self.tree.query(minx, miny, maxx, maxy)
+
+    def _render(self, z, x, y):
+        tminx, tminy, tmaxx, tmaxy = mvt.tile_bounds(z, x, y)
+        margen = (tmaxx - tminx) * mvt.BUFFER / mvt.EXTENT
+        tminx, tminy, tmaxx, tmaxy = tminx - margen, tminy - margen, tmaxx + margen, tmaxy + margen
+        seleccion = []
+        for fid, props, gtype, parts, _ in sorted(self.tree.query(tminx, tminy, tmaxx, tmaxy), key=lambda f: f[0]):
+            geom = mvt.tile_geometry(gtype, parts, z, x, y)
+            if geom:
+                seleccion.append((fid, props, gtype, geom))
+        return mvt.encode_layer(self.name, seleccion)
+
+    def get_tile(self, z, x, y):
+        """Tile comprimido con gzip (b'' si está vacío); None fuera de rango"""
+        if z < MINZOOM or z > MAXZOOM or not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+            return None
+        tms_y = (1 << z) - 1 - y
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, tms_y)
+            ).fetchone()
+            if row is not None:
+                return bytes(row[0])
+            raw = self._render(z, x, y)
+            data = gzip.compress(raw, mtime=0) if raw else b''
+            conn.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (z, x, tms_y, data))
+        return data
+
+    def seed(self, minzoom=MINZOOM, maxzoom=MAXZOOM):
+        """Precalcula todos los tiles que tocan la extensión de la capa"""
+        if not self.bounds:
+            return 0
+        total = 0
+        for z in range(minzoom, maxzoom + 1):
+            n = 1 << z
+            x0, y0 = int(self.bounds[0] * n), int(self.bounds[1] * n)
+            x1, y1 = int(self.bounds[2] * n), int(self.bounds[3] * n)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    self.get_tile(z, x, y)
+                    total += 1
+        logger.info(f"[TILES] Capa '{self.name}': {total} tiles precalculados")
+        return total
+
+
+def get_layer(name):
+    """TileLayer vigente (se recarga si cambian sus fuentes); None si no existe"""
+    spec = LAYERS.get(name)
+    if spec is None:
+        return None
+    fuentes = spec[0]()
+    if not os.path.exists(fuentes[0]):
+        return None
+    key = _source_key(fuentes)
+    layer = _layers.get(name)
+    if layer is not None and layer.key == key:
+        return layer
+    with _lock:
+        layer = _layers.get(name)
+        if layer is None or layer.key != key:
+            from app.utils.static_payload import cache_dir
+            layer = _layers[name] = TileLayer(name, fuentes, spec[1], cache_dir())
+    return layer
+
+
+def seed_layer(name, minzoom=MINZOOM, maxzoom=MAXZOOM):
+    layer = get_layer(name)
+    return layer.seed(minzoom, maxzoom) if layer is not None else 0
@@ -0,0 +1,113 @@
+"""
+Usuario de la sesión, cargado una sola vez por request
+Las plantillas (preferencias, foto de perfil) y varias rutas necesitan los
+mismos datos del usuario actual. Se consultan solo las columnas necesarias, el
+resultado queda en flask.g durante el request y en una caché corta por worker
+con clave (usuario, token de sesión, versión del perfil). Al guardar el perfil
+se sube la versión en la sesión, así que ningún worker sirve datos viejos a ese
+usuario aunque su caché local siga viva.
+"""
+import json
+import time
+import logging
+import threading
+from collections import namedtuple
+
+from flask import g, has_request_context, session as flask_session
+
+logger = logging.getLogger(__name__)
+
+TTL_SEGUNDOS = 30
+MAX_ENTRADAS = 512
+
+UsuarioActual = namedtuple(
+    'UsuarioActual',
+    ['id', 'usuario', 'role', 'email', 'nombre_completo', 'foto_perfil', 'preferencias'],
+)
+
+_cache = {}
+_lock = threading.Lock()
+_SIN_CARGAR = object()
+
+
+def _clave(session):
+    usuario = session.get('user')
+    if not usuario:
+        return None
+    return (usuario, session.get('token') or '', session.get('perfil_v', 0))
+
+
+def _preferencias(raw):
+    """Preferencias guardadas (dict vacío si no hay o el JSON es inválido)"""
+    if not raw:
+        return {}
+    try:
+        prefs = json.loads(raw)
+    except Exception:
+        return {}
+    return prefs if isinstance(prefs, dict) else {}
+
+
+def _cargar(usuario):
+    from app import db
+    from app.models.usuario import Usuario
+
+    fila = db.session.query(
+        Usuario.id, Usuario.usuario, Usuario.role, Usuario.email,
+        Usuario.nombre_completo, Usuario.foto_perfil, Usuario.preferencias,
+    ).filter(Usuario.usuario == usuario).first()
+    if fila is None:
+        return None
+    return UsuarioActual(*fila[:-1], _preferencias(fila[-1]))
+
+
+def obtener(session=None):
+    """UsuarioActual de la sesión (o None si no hay sesión o el usuario no existe)"""
+    session = flask_session if session is None else session
+    clave = _clave(session)
+    if clave is None:
+        return None
+
+    en_request = has_request_context()
+    if en_request:
+        actual = g.get('_usuario_actual', _SIN_CARGAR)
+        if actual is not _SIN_CARGAR and g.get('_usuario_actual_clave') == clave:
+            return actual
+
+    ahora = time.monotonic()
+    entrada = _cache.get(clave)
+    if entrada is not None and entrada[0] > ahora:
+        actual = entrada[1]
+    else:
+        actual = _cargar(clave[0])
+        with _lock:
+            if len(_cache) >= MAX_ENTRADAS:
+                for k in [k for k, (vence, _) in _cache.items() if vence <= ahora]:
+                    del _cache[k]
+                if len(_cache) >= MAX_ENTRADAS:
+                    _cache.clear()
+            _cache[clave] = (ahora + TTL_SEGUNDOS, actual)
+
+    if en_request:
+        g._usuario_actual = actual
+        g._usuario_actual_clave = clave
+    return actual
+
+
+def invalidar(usuario=None):
+    """
+    Descarta los datos en caché del usuario (por defecto el de la sesión).
+    Llamar después del commit que modifica su perfil o preferencias.
+    """
+    propio = has_request_context() and usuario in (None, flask_session.get('user'))
+    usuario = usuario or (flask_session.get('user') if has_request_context() else None)
+    if not usuario:
+        return
+    with _lock:
+        for k in [k for k in _cache if k[0] == usuario]:
+            _cache.pop(k, None)
+    if has_request_context():
+        g.pop('_usuario_actual', None)
+        g.pop('_usuario_actual_clave', None)
+    if propio:
+        flask_session['perfil_v'] = flask_session.get('perfil_v', 0) + 1
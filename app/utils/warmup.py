@@ -0,0 +1,156 @@
+"""
+Precarga de cachés al arrancar el worker
+Después de create_app un hilo en segundo plano carga los datasets que de otro
+modo pagaría el primer usuario tras cada despliegue (predios, normatividad,
+GeoJSON, plan de desarrollo, catálogo de especies, capas de tiles). El estado y
+la duración de cada tarea se publican en /readyz: la instancia está lista
+cuando terminaron todas las tareas críticas.
+"""
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'pendiente'
+CARGANDO = 'cargando'
+LISTO = 'listo'
+OMITIDO = 'omitido'   # la fuente no existe en esta instalación
+ERROR = 'error'
+TERMINADOS = (LISTO, OMITIDO, ERROR)
+
+
+def _predios():
+    from app.routes import usos
+    if usos._file_key(usos._predios_path()) is None:
+        return False
+    if usos.datos_predios() is None:
+        raise RuntimeError("No se pudo cargar tabla_predios.xlsx")
+    return True
+
+
+def _normas():
+    from app.routes import usos
+    return usos.datos_normas() is not None
+
+
+def _normatividad():
+    from app.routes import usos
+    if usos._file_key(usos._normatividad_path()) is None:
+        return False
+    if usos.datos_normatividad() is None:
+        raise RuntimeError("No se pudo cargar el Excel de normatividad")
+    return True
+
+
+def _geojson():
+    from app.routes import usos
+    from app.utils.static_payload import get_payload
+    ruta = usos.geojson_path()
+    if ruta is None:
+        return False
+    get_payload(ruta)
+    return True
+
+
+def _plan():
+    from app.routes import seguimiento
+    if seguimiento._file_key(seguimiento._plan_path()) is None:
+        return False
+    if seguimiento._load_plan_excel() is None:
+        raise RuntimeError("No se pudo cargar el Excel del plan de desarrollo")
+    return True
+
+
+def _especies():
+    from app import db
+    from app.models.riesgo_arborea import ArbolEspecie
+    try:
+        # Deja el catálogo en la caché de páginas de SQLite
+        return len(db.session.query(ArbolEspecie).all()) > 0
+    finally:
+        db.session.remove()
+
+
+def _tiles():
+    from app.utils.tile_cache import LAYERS, get_layer
+    return any([get_layer(nombre) is not None for nombre in LAYERS])
+
+
+# (nombre, función, crítica). Cada función devuelve False si la fuente no existe.
+TAREAS = [
+    ('predios', _predios, True),
+    ('normas', _normas, True),
+    ('normatividad', _normatividad, True),
+    ('geojson', _geojson, True),
+    ('plan_desarrollo', _plan, True),
+    ('especies', _especies, False),
+    ('tiles', _tiles, False),
+]
+
+_lock = threading.Lock()
+_estado = {}
+_inicio = None
+_fin = None
+_hilo = None
+
+
+def _marcar(nombre, **datos):
+    with _lock:
+        _estado[nombre].update(datos)
+
+
+def _ejecutar(app):
+    global _fin
+    with app.app_context():
+        for nombre, funcion, _ in TAREAS:
+            _marcar(nombre, estado=CARGANDO)
+            t0 = time.perf_counter()
+            try:
+                cargado = funcion()
+                ms = round((time.perf_counter() - t0) * 1000, 1)
+                _marcar(nombre, estado=LISTO if cargado else OMITIDO, ms=ms)
+                logger.info(f"[WARMUP] {nombre}: {'listo' if cargado else 'sin fuente'} ({ms} ms)")
+            except Exception as e:
+                ms = round((time.perf_counter() - t0) * 1000, 1)
+                _marcar(nombre, estado=ERROR, ms=ms, error=str(e))
+                logger.error(f"[WARMUP] {nombre}: {e}", exc_info=True)
+    _fin = time.time()
+    logger.info(f"[WARMUP] Precarga terminada en {(_fin - _inicio) * 1000:.0f} ms")
+
+
+def iniciar(app):
+    """Lanza la precarga en segundo plano (una vez por proceso)"""
+    global _hilo, _inicio, _fin
+    with _lock:
+        if _hilo is not None:
+            return
+        _inicio = time.time()
+        _estado.clear()
+        for nombre, _, critica in TAREAS:
+            _estado[nombre] = {'estado': PENDIENTE, 'critica': critica, 'ms': None}
+        if not app.config.get('WARMUP_ENABLED', True):
+            for datos in _estado.values():
+                datos['estado'] = OMITIDO
+            _fin = _inicio
+            _hilo = False
+            return
+        _hilo = threading.Thread(target=_ejecutar, args=(app,), name='warmup', daemon=True)
+        _hilo.start()
+
+
+def estado():
+    """Resumen para /readyz: lista si terminaron todas las tareas críticas"""
+    with _lock:
+        caches = {nombre: dict(datos) for nombre, datos in _estado.items()}
+        inicio, fin = _inicio, _fin
+    criticas = [d for d in caches.values() if d['critica']]
+    listo = inicio is not None and all(d['estado'] in TERMINADOS for d in criticas)
+    return {
+        'ready': listo,
+        # Lista pero con alguna caché crítica que falló (se cargará en el primer uso)
+        'degradado': any(d['estado'] == ERROR for d in criticas),
+        'duracion_ms': round(((fin or time.time()) - inicio) * 1000, 1) if inicio else None,
+        'terminado': fin is not None,
+        'caches': caches,
+    }
@@ -0,0 +1,50 @@
+"""
+ZIP en streaming
+Genera el archivo por bloques a medida que se leen los miembros, sin armar
+el ZIP completo en memoria ni en disco (zipfile usa descriptores de datos
+cuando el destino no admite seek).
+"""
+import os
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Salida:
+    """Destino de solo escritura para zipfile; acumula bloques pendientes"""
+
+    def __init__(self):
+        self._bloques = []
+
+    def write(self, data):
+        self._bloques.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        bloques, self._bloques = self._bloques, []
+        return b''.join(bloques)
+
+
+def stream_zip(archivos, compression=zipfile.ZIP_STORED):
+    """
+    Generador de bytes del ZIP. `archivos` es un iterable de
+    (ruta_en_disco, nombre_en_zip); los que no existan se omiten.
+    Por defecto no se recomprime (los PDF ya vienen comprimidos).
+    """
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', compression=compression) as zf:
+        for ruta, nombre in archivos:
+            if not os.path.exists(ruta):
+                continue
+            with open(ruta, 'rb') as origen, zf.open(nombre, 'w', force_zip64=True) as destino:
+                while True:
+                    bloque = origen.read(CHUNK_SIZE)
+                    if not bloque:
+                        break
+                    destino.write(bloque)
+                    yield salida.vaciar()
+            yield salida.vaciar()
+    yield salida.vaciar()
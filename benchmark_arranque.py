@@ -0,0 +1,117 @@
+"""
+Benchmark del arranque de un worker (imports + create_app)
+Ejecutar con: python benchmark_arranque.py [--presupuesto-ms 2500] [--repeticiones 3]
+(--presupuesto-ms 0 desactiva el límite de tiempo)
+
+Cada repetición corre en un proceso nuevo con `python -X importtime`, igual
+que un worker de gunicorn recién creado. Muestra los módulos más lentos de
+importar y falla (código de salida 1) si el arranque supera el presupuesto o
+si alguna librería pesada se importó durante el arranque: esas deben cargarse
+en el primer uso (ver app/utils/lazy.py).
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Presupuesto del arranque (imports + create_app). Hoy ronda 1 s; el margen
+# cubre máquinas más lentas sin dejar pasar una librería pesada en el arranque.
+PRESUPUESTO_MS = 2500
+
+# Librerías que no deben importarse al arrancar
+PESADOS = [
+    'pandas', 'numpy', 'geopandas', 'reportlab', 'PyPDF2', 'weasyprint', 'xhtml2pdf',
+    'svglib', 'cairosvg', 'qrcode', 'docx', 'openpyxl', 'requests', 'bs4', 'resend', 'pyotp',
+]
+
+CODIGO = """
+import sys, time, json
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'pesados': sorted(m for m in PESADOS if m in sys.modules),
+}))
+"""
+
+
+def medir():
+    """Un arranque en proceso nuevo; devuelve (resultado, tiempos de import por módulo)"""
+    codigo = f"PESADOS = {PESADOS!r}\n{CODIGO}"
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=BASE_DIR, capture_output=True, text=True,
+        # Sin precarga: importa pandas en segundo plano y no es parte del arranque
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1', 'WARMUP_ENABLED': '0'},
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"El arranque falló (código {proc.returncode})")
+
+    modulos = {}
+    for linea in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        try:
+            _, propio, acumulado, nombre = [p.strip() for p in linea.replace('import time:', '|', 1).split('|')]
+            modulos[nombre] = (int(propio), int(acumulado))
+        except ValueError:
+            continue
+
+    resultado = json.loads(proc.stdout.strip().splitlines()[-1])
+    return resultado, modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque de la aplicación")
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_MS,
+                        help=f"Falla si el mejor arranque (imports + create_app) supera este tiempo "
+                             f"(por defecto {PRESUPUESTO_MS} ms; 0 lo desactiva)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help="Módulos más lentos a mostrar")
+    args = parser.parse_args()
+
+    # Corrida previa sin medir: en una base vacía el primer arranque crea las
+    # tablas y siembra datos, que no es lo que paga un worker nuevo
+    medir()
+    corridas = [medir() for _ in range(max(args.repeticiones, 1))]
+    mejor, modulos = min(corridas, key=lambda c: c[0]['import_ms'] + c[0]['create_app_ms'])
+    total = mejor['import_ms'] + mejor['create_app_ms']
+
+    print("=" * 70)
+    print("ARRANQUE DE UN WORKER")
+    print("=" * 70)
+    print(f"Imports de app:   {mejor['import_ms']:8.1f} ms")
+    print(f"create_app():     {mejor['create_app_ms']:8.1f} ms")
+    print(f"Total (mejor de {len(corridas)}): {total:8.1f} ms")
+
+    print("\nMódulos más lentos (acumulado, ms):")
+    for nombre, (propio, acumulado) in sorted(modulos.items(), key=lambda m: -m[1][1])[:args.top]:
+        print(f"  {acumulado / 1000:8.1f}  {nombre}")
+
+    errores = []
+    if mejor['pesados']:
+        errores.append(f"Librerías pesadas importadas al arrancar: {', '.join(mejor['pesados'])}")
+    if args.presupuesto_ms and total > args.presupuesto_ms:
+        errores.append(f"Arranque de {total:.0f} ms supera el presupuesto de {args.presupuesto_ms:.0f} ms")
+
+    print()
+    if errores:
+        for e in errores:
+            print(f"❌ {e}")
+        return 1
+    print("✅ Arranque dentro del presupuesto y sin librerías pesadas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
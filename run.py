@@ -9,9 +9,12 @@ except ImportError:
     # En Railway, dotenv no está disponible (no es necesario)
     pass
 
-print("🚀 [RAILWAY] Iniciando aplicación desde run.py...")
-app = create_app()
-print("✅ [RAILWAY] Aplicación creada correctamente.")
+# Los procesos del pool de renderizado (spawn) reimportan este módulo como
+# __mp_main__: no deben crear otra app (esquema, imports, backup, precarga)
+if __name__ != '__mp_main__':
+    print("🚀 [RAILWAY] Iniciando aplicación desde run.py...")
+    app = create_app()
+    print("✅ [RAILWAY] Aplicación creada correctamente.")
 
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 5000))
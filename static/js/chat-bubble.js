@@ -388,10 +388,8 @@
       const response = await fetch('/api/chat/last');
       const data = await response.json();
       
-      if (data.count > 0) {
-        unreadCount = data.count;
-        updateBadge(unreadCount);
-      }
+      unreadCount = data.count || 0;
+      updateBadge(unreadCount);
     } catch (error) {
       console.error('Error checking messages:', error);
     }
@@ -410,9 +408,20 @@
   }
 
   function startMessagePolling() {
-    // Check for new messages every 10 seconds
-    messageCheckInterval = setInterval(checkNewMessages, 10000);
+    // Check for new messages every 10 seconds (solo si no hay stream en vivo)
+    messageCheckInterval = setInterval(() => {
+      if (!window.AV_STREAM_ACTIVO) checkNewMessages();
+    }, 10000);
     checkNewMessages(); // Check immediately
+
+    // Con stream en vivo (base.html) cada mensaje llega como evento av:chat
+    document.addEventListener('av:chat', (ev) => {
+      const msg = ev.detail || {};
+      checkNewMessages();
+      if (currentContact && (msg.from === currentContact || msg.to === currentContact)) {
+        loadMessages(currentContact);
+      }
+    });
   }
 
   function formatTime(timestamp) {
@@ -0,0 +1,62 @@
+/**
+ * Descarga de PDFs pesados vía pool de renderizado
+ * Si el servidor responde 202 se consulta /api/jobs/<id> hasta que el
+ * documento esté listo y luego se descarga.
+ */
+
+(function() {
+  'use strict';
+
+  const INTERVALO_MS = 1500;
+
+  function dormir(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+  }
+
+  async function esperarTrabajo(statusUrl) {
+    while (true) {
+      await dormir(INTERVALO_MS);
+      const r = await fetch(statusUrl, { credentials: 'same-origin' });
+      if (!r.ok) throw new Error('No se pudo consultar el trabajo (HTTP ' + r.status + ')');
+      const job = await r.json();
+      if (job.estado === 'terminado') return job;
+      if (job.estado === 'error') throw new Error(job.error || 'Error generando el documento');
+    }
+  }
+
+  function descargarBlob(blob, nombre) {
+    const url = window.URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = nombre || 'documento.pdf';
+    document.body.appendChild(a);
+    a.click();
+    window.URL.revokeObjectURL(url);
+    document.body.removeChild(a);
+  }
+
+  /**
+   * descargarPdfAsync(url, { method, headers, body, nombre })
+   * Resuelve cuando la descarga fue disparada.
+   */
+  window.descargarPdfAsync = async function(url, opciones = {}) {
+    const sep = url.includes('?') ? '&' : '?';
+    const resp = await fetch(url + sep + 'async=1', {
+      method: opciones.method || 'GET',
+      headers: opciones.headers || {},
+      body: opciones.body || null,
+      credentials: 'same-origin'
+    });
+
+    if (resp.status === 202) {
+      const pendiente = await resp.json();
+      const job = await esperarTrabajo(pendiente.status_url);
+      window.location.href = job.download_url;
+      return;
+    }
+    if (!resp.ok) throw new Error('Error al generar PDF (HTTP ' + resp.status + ')');
+    const disp = resp.headers.get('Content-Disposition') || '';
+    const match = disp.match(/filename\*?=(?:UTF-8'')?"?([^";]+)"?/i);
+    descargarBlob(await resp.blob(), opciones.nombre || (match && decodeURIComponent(match[1])));
+  };
+})();